@@ -0,0 +1,62 @@
+""" Analytics APIs """
+
+from typing import Annotated
+from uuid import UUID
+from fastapi import APIRouter, Path, Query
+from core.dependencies import CurrentActiveUserDep
+from core.logging_conf import Logging
+from core.responses import ModelJSONResponse
+from schemas.analytics import OrganizationDashboard, CohortReport
+from services.analytics_service import get_organization_dashboard, get_organization_cohorts
+from services.organization_service import verify_current_user_role
+
+# Initialize API router for the analytics endpoints
+router = APIRouter(prefix="/api/v1", tags=["analytics"])
+
+log = Logging(__name__).log()
+
+
+@router.get("/organization/{org_id}/analytics/dashboard", response_model=OrganizationDashboard)
+async def get_dashboard_of_organization(current_user: CurrentActiveUserDep,
+                                        org_id: Annotated[str, Path(...)],
+                                        days: Annotated[int, Query(ge=1, le=366)] = 30):
+    """
+    Retrieve the member, team and login analytics of an organization.
+
+    Args:
+        current_user (CurrentActiveUserDep): Dependency to fetch the currently authenticated user.
+        org_id (str): ID of the organization.
+        days (int): Number of days of the daily series, ending today.
+
+    Returns:
+        OrganizationDashboard: The current counts and the daily series.
+    """
+    log.info("%s %s", current_user.id, org_id)
+    organization_id = UUID(org_id)
+    await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
+                                   permission_names=["reports:view"])
+    dashboard = await get_organization_dashboard(organization_id=organization_id, days=days)
+    return ModelJSONResponse(dashboard, OrganizationDashboard)
+
+
+@router.get("/organization/{org_id}/analytics/cohorts", response_model=CohortReport)
+async def get_cohorts_of_organization(current_user: CurrentActiveUserDep,
+                                      org_id: Annotated[str, Path(...)],
+                                      weeks: Annotated[int, Query(ge=1, le=104)] = 12):
+    """
+    Retrieve the weekly join cohorts and member retention of an organization.
+
+    Args:
+        current_user (CurrentActiveUserDep): Dependency to fetch the currently authenticated user.
+        org_id (str): ID of the organization.
+        weeks (int): Number of weekly cohorts, ending with the current week.
+
+    Returns:
+        CohortReport: The cohorts and the retention curve.
+    """
+    log.info("%s %s", current_user.id, org_id)
+    organization_id = UUID(org_id)
+    await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
+                                   permission_names=["reports:view"])
+    report = await get_organization_cohorts(organization_id=organization_id, weeks=weeks)
+    return ModelJSONResponse(report, CohortReport)
@@ -1,8 +1,10 @@
 """ Auth APIs """
 
+import asyncio
+import math
 from datetime import timedelta
 from typing import Annotated
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from core.config import ACCESS_TOKEN_EXPIRE_MINUTES
 from core.dependencies import CurrentActiveUserDep
@@ -12,6 +14,8 @@ from schemas.token import Token
 from schemas.user import User, UserMessageResponse, CreateUser
 from services.auth_service import authenticate_user, create_access_token
 from services.user_service import create_new_user
+from utils.login_throttle import login_throttle
+from utils.rate_limiter import get_client_ip
 
 
 # Initialize logger for the module
@@ -28,25 +32,43 @@ router = APIRouter(
 
 
 @router.post("/token")
-async def get_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]) -> Token:
+async def get_token(request: Request,
+                    form_data: Annotated[OAuth2PasswordRequestForm, Depends()]) -> Token:
     """
     Generate an access token for a user.
 
+    Usernames and client addresses with repeated failures are locked out before the
+    user lookup and password verification, attempts in progress count as failures.
+
     Args:
+        request (Request): The request, for the client address.
         form_data (OAuth2PasswordRequestForm): Form data containing username and password.
 
     Returns:
         Token: Access token details including token type and expiration time.
 
     Raises:
-        HTTPException: If authentication fails due to invalid username or password.
+        HTTPException: If the attempt is locked out, or authentication fails due to invalid
+            username or password.
     """
-    user = authenticate_user(form_data.username, form_data.password)
-    if not user:
-        raise http_exceptions.INVALID_USERNAME_OR_PASSWORD
+    client_ip = get_client_ip(request.scope)
+    retry_after = login_throttle.start_attempt(form_data.username, client_ip)
+    if retry_after:
+        log.warning("Login of %s from %s locked out", form_data.username, client_ip)
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Too many failed login attempts, try again later.",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+    try:
+        user = await asyncio.to_thread(authenticate_user, form_data.username, form_data.password)
+        if not user:
+            login_throttle.record_failure(form_data.username, client_ip)
+            raise http_exceptions.INVALID_USERNAME_OR_PASSWORD
+        login_throttle.record_success(form_data.username)
+    finally:
+        login_throttle.end_attempt(form_data.username, client_ip)
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user.username},
+    access_token = create_access_token(data={"sub": user.username, "uid": str(user.id)},
                                        expire_delta=access_token_expires)
     return Token(access_token=access_token, token_type="bearer", expires_in=60)
 
@@ -2,19 +2,29 @@
 
 from uuid import UUID
 from typing import Annotated
-from fastapi import APIRouter, Path, Query, status
+from fastapi import APIRouter, Path, Query, Request, Response, status
+from fastapi.responses import FileResponse
 
-from core.dependencies import CurrentActiveUserDep
+from core.dependencies import CurrentActiveUserDep, CurrentActiveUserIDDep
 from core.logging_conf import Logging
+from core.responses import ModelJSONResponse
 from schemas.organization import CreateOrganization, OrganizationResponse, Organization, \
     AddOrganizationMembersRequest, OrganizationMemberResponse, OrganizationByIDResponse, \
     UpdateOrganization, OrganizationMembersResponse, UpdateOrganizationMemberRole
+from schemas.export import ExportJobResponse
 from schemas.role import RoleResponse, CreateCustomRole, AllRoleResponse, PermissionsResponse
+from schemas.search import UserSearchResult
 from services.organization_service import crate_new_organization, get_organization_details, \
     add_new_members_to_organization, verify_current_user_role, get_organization_details_by_id, \
     update_organization_details, delete_organizations, get_organization_members_by_id, \
     update_organization_member_role_by_id, delete_member_from_organization, create_new_role, \
-    get_organization_roles, get_all_permissions
+    get_organization_roles, get_all_permissions, get_organization_cache_validators, \
+    export_organization_members, send_member_invitations
+from services.export_service import start_organization_export, get_organization_export, \
+    get_organization_export_file
+from services.search_service import autocomplete_organization_members
+from utils.exporters import ExportFormatQuery, export_response
+from utils.http_cache import is_not_modified, not_modified_response
 
 # Initialize API router for organization-related endpoints
 router = APIRouter(prefix="/api/v1", tags=["organizations"])
@@ -39,7 +49,8 @@ async def get_organization(current_user: CurrentActiveUserDep,
     Returns:
         OrganizationResponse: Paginated list of organizations.
     """
-    return await get_organization_details(current_user.id, page, size, sort_by)
+    organizations = await get_organization_details(current_user.id, page, size, sort_by)
+    return ModelJSONResponse(organizations, OrganizationResponse)
 
 
 @router.post("/organization", response_model=Organization, status_code=status.HTTP_201_CREATED)
@@ -59,13 +70,19 @@ async def create_organization(org: CreateOrganization, current_user: CurrentActi
 
 @router.get("/organization/{org_id}", response_model=OrganizationByIDResponse)
 async def get_organizations_by_id(current_user: CurrentActiveUserDep,
-                                  org_id: Annotated[str, Path(...)]):
+                                  org_id: Annotated[str, Path(...)],
+                                  request: Request, response: Response):
     """
     Retrieve organization details by ID.
 
+    Supports conditional requests: 304 Not Modified is returned when If-None-Match or
+    If-Modified-Since match the current version.
+
     Args:
         current_user (CurrentActiveUserDep): Dependency to fetch the currently authenticated user.
         org_id (str): ID of the organization to retrieve.
+        request (Request): The incoming request.
+        response (Response): The response used to set the ETag and Last-Modified headers.
 
     Returns:
         OrganizationByIDResponse: Details of the specified organization.
@@ -74,20 +91,31 @@ async def get_organizations_by_id(current_user: CurrentActiveUserDep,
     await verify_current_user_role(user_id=current_user.id,
                                    org_id=organization_id,
                                    permission_names=["organization:read_details"])
+    validators = await get_organization_cache_validators(org_id=organization_id,
+                                                         user=current_user)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    response.headers.update(validators.headers)
     return await get_organization_details_by_id(org_id=organization_id, user=current_user)
 
 
 @router.put("/organization/{org_id}", response_model=OrganizationByIDResponse)
 async def update_organizations_by_id(current_user: CurrentActiveUserDep,
                                      org_id: Annotated[str, Path(...)],
-                                     org: UpdateOrganization):
+                                     org: UpdateOrganization,
+                                     request: Request, response: Response):
     """
     Update organization details by ID.
 
+    When If-Match is sent, the update only happens if it matches the current ETag,
+    otherwise 412 Precondition Failed is returned.
+
     Args:
         current_user (CurrentActiveUserDep): Dependency to fetch the currently authenticated user.
         org_id (str): ID of the organization to update.
         org (UpdateOrganization): Updated organization details.
+        request (Request): The incoming request.
+        response (Response): The response used to set the new ETag and Last-Modified headers.
 
     Returns:
         OrganizationByIDResponse: Updated organization details.
@@ -96,8 +124,12 @@ async def update_organizations_by_id(current_user: CurrentActiveUserDep,
     await verify_current_user_role(user_id=current_user.id,
                                    org_id=organization_id,
                                    permission_names=["organization:update_settings"])
-    return await \
-        update_organization_details(organization_id=organization_id, org=org, user=current_user)
+    updated_organization = await update_organization_details(
+        organization_id=organization_id, org=org, user=current_user,
+        if_match=request.headers.get("if-match"))
+    validators = await get_organization_cache_validators(org_id=organization_id, user=current_user)
+    response.headers.update(validators.headers)
+    return updated_organization
 
 
 @router.delete("/organization/{org_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -141,8 +173,61 @@ async def get_organization_members(current_user: CurrentActiveUserDep,
     """
     log.info("%s %s", current_user.id, org_id)
     organization_id =UUID(org_id)
-    return await get_organization_members_by_id(organization_id=organization_id,
-                                                page=page, size=size, sort_by=sort_by)
+    members = await get_organization_members_by_id(organization_id=organization_id,
+                                                   page=page, size=size, sort_by=sort_by)
+    return ModelJSONResponse(members, OrganizationMembersResponse)
+
+
+@router.get("/organization/{org_id}/members/export")
+async def export_members_of_organization(current_user: CurrentActiveUserDep,
+                                         org_id: Annotated[str, Path(...)], request: Request,
+                                         export_format: ExportFormatQuery = "ndjson"):
+    """
+    Stream all members of an organization as NDJSON or CSV.
+
+    Args:
+        current_user (CurrentActiveUserDep): Dependency to fetch the currently authenticated user.
+        org_id (str): ID of the organization.
+        request (Request): The incoming request.
+        export_format (ExportFormatQuery): Export format, "ndjson" (default) or "csv".
+
+    Returns:
+        StreamingResponse: The export, gzip encoded if the client accepts it.
+    """
+    log.info("%s %s", current_user.id, org_id)
+    organization_id = UUID(org_id)
+    await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
+                                   permission_names=["organization:read_details"])
+    chunks = await export_organization_members(organization_id=organization_id,
+                                               export_format=export_format)
+    return export_response(request, chunks, export_format,
+                           filename=f"organization-{organization_id}-members")
+
+
+@router.get("/organization/{org_id}/members/autocomplete",
+            response_model=list[UserSearchResult])
+async def autocomplete_members_of_organization(current_user_id: CurrentActiveUserIDDep,
+                                               org_id: Annotated[str, Path(...)],
+                                               q: Annotated[str, Query(max_length=64)],
+                                               limit: Annotated[int, Query(ge=1, le=25)] = 10):
+    """
+    Suggest members of an organization while a username or name is typed.
+
+    The user is authenticated through the user cache, not the database.
+
+    Args:
+        current_user_id (CurrentActiveUserIDDep): The ID of the authenticated user.
+        org_id (str): ID of the organization.
+        q (str): The typed text, typos are tolerated.
+        limit (int): Maximum number of suggestions.
+
+    Returns:
+        list[UserSearchResult]: The suggested members, best first.
+    """
+    members = await autocomplete_organization_members(organization_id=UUID(org_id),
+                                                      user_id=current_user_id, query=q,
+                                                      limit=limit)
+    return ModelJSONResponse(members, list[UserSearchResult])
 
 
 @router.post("/organization/{org_id}/members", response_model=list[OrganizationMemberResponse])
@@ -165,7 +250,9 @@ async def add_member_to_organization(current_user: CurrentActiveUserDep,
                                    org_id=org_id,
                                    permission_names=['organization:manage_members',
                                                      'organization:manage_roles',])
-    return await add_new_members_to_organization(user_roles=user_roles, organization_id=org_id)
+    members = await add_new_members_to_organization(user_roles=user_roles, organization_id=org_id)
+    await send_member_invitations(organization_id=org_id, members=members)
+    return ModelJSONResponse(members, list[OrganizationMemberResponse])
 
 
 @router.put("/organizations/{org_id}/members/{user_id}/role",
@@ -234,7 +321,8 @@ async def get_all_roles_in_organization(current_user: CurrentActiveUserDep,
     organization_id = UUID(org_id)
     await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
                                    permission_names=["organization:read_details"])
-    return await get_organization_roles(organization_id=organization_id)
+    roles = await get_organization_roles(organization_id=organization_id)
+    return ModelJSONResponse(roles, AllRoleResponse)
 
 
 @router.post("/organizations/{org_id}/roles", response_model=RoleResponse)
@@ -275,4 +363,79 @@ async def get_organization_permissions(current_user: CurrentActiveUserDep,
     organization_id = UUID(org_id)
     await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
                                    permission_names=["organization:manage_custom_roles"])
-    return await get_all_permissions(organization_id=organization_id)
+    permissions = await get_all_permissions(organization_id=organization_id)
+    return ModelJSONResponse(permissions, PermissionsResponse)
+
+
+@router.post("/organization/{org_id}/exports", response_model=ExportJobResponse,
+             status_code=status.HTTP_202_ACCEPTED)
+async def create_organization_export(current_user: CurrentActiveUserDep,
+                                     org_id: Annotated[str, Path(...)],
+                                     export_format: ExportFormatQuery = "csv"):
+    """
+    Start a background export of the organization's members, teams, roles and permissions.
+
+    Args:
+        current_user (CurrentActiveUserDep): Dependency to fetch the currently authenticated user.
+        org_id (str): ID of the organization.
+        export_format (ExportFormatQuery): Export format, "csv" (default) or "ndjson".
+
+    Returns:
+        ExportJobResponse: The queued export, poll it until its status is succeeded.
+    """
+    log.info("%s %s", current_user.id, org_id)
+    organization_id = UUID(org_id)
+    await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
+                                   permission_names=["reports:export"])
+    return await start_organization_export(organization_id=organization_id,
+                                           export_format=export_format)
+
+
+@router.get("/organization/{org_id}/exports/{export_id}", response_model=ExportJobResponse)
+async def get_organization_export_status(current_user: CurrentActiveUserDep,
+                                         org_id: Annotated[str, Path(...)],
+                                         export_id: Annotated[str, Path(...)]):
+    """
+    Retrieve the progress of an export and, once it succeeded, its download URLs.
+
+    Args:
+        current_user (CurrentActiveUserDep): Dependency to fetch the currently authenticated user.
+        org_id (str): ID of the organization.
+        export_id (str): ID of the export.
+
+    Returns:
+        ExportJobResponse: The export.
+    """
+    log.info("%s %s", current_user.id, org_id)
+    organization_id = UUID(org_id)
+    await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
+                                   permission_names=["reports:export"])
+    return await get_organization_export(organization_id=organization_id,
+                                         export_id=UUID(export_id))
+
+
+@router.get("/organization/{org_id}/exports/{export_id}/files/{dataset}",
+            response_class=FileResponse)
+async def download_organization_export_file(current_user: CurrentActiveUserDep,
+                                            org_id: Annotated[str, Path(...)],
+                                            export_id: Annotated[str, Path(...)],
+                                            dataset: Annotated[str, Path(...)]):
+    """
+    Download a gzip file of a finished export, HTTP Range requests resume partial downloads.
+
+    Args:
+        current_user (CurrentActiveUserDep): Dependency to fetch the currently authenticated user.
+        org_id (str): ID of the organization.
+        export_id (str): ID of the export.
+        dataset (str): The dataset, members, teams, roles or role_permissions.
+
+    Returns:
+        FileResponse: The file.
+    """
+    log.info("%s %s", current_user.id, org_id)
+    organization_id = UUID(org_id)
+    await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
+                                   permission_names=["reports:export"])
+    path = await get_organization_export_file(organization_id=organization_id,
+                                              export_id=UUID(export_id), dataset=dataset)
+    return FileResponse(path, media_type="application/gzip", filename=path.name)
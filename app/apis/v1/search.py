@@ -0,0 +1,39 @@
+""" Search APIs """
+
+from typing import Annotated
+from uuid import UUID
+from fastapi import APIRouter, Query
+from core.dependencies import CurrentActiveUserDep
+from core.logging_conf import Logging
+from core.responses import ModelJSONResponse
+from schemas.search import SearchResponse
+from services.search_service import search, SearchKind, SEARCH_KINDS
+
+# Initialize API router for the search endpoint
+router = APIRouter(prefix="/api/v1", tags=["search"])
+
+log = Logging(__name__).log()
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_all(current_user: CurrentActiveUserDep,  # pylint: disable=too-many-arguments, too-many-positional-arguments
+                     q: Annotated[str, Query(min_length=1, max_length=128)],
+                     kind: Annotated[list[SearchKind] | None, Query(alias="type")] = None,
+                     organization_id: Annotated[UUID | None, Query()] = None,
+                     limit: Annotated[int, Query(ge=1, le=50)] = 10):
+    """
+    Search users, organizations and teams of the current user's organizations.
+
+    Args:
+        current_user (CurrentActiveUserDep): The current active user.
+        q (str): The search text, every word is matched as a prefix.
+        kind (list[SearchKind] | None): The kinds of results, all if not given.
+        organization_id (UUID | None): Only search within this organization.
+        limit (int): The maximum number of results per kind.
+
+    Returns:
+        SearchResponse: The matches of every kind, best first.
+    """
+    results = await search(user_id=current_user.id, query=q, kinds=kind or list(SEARCH_KINDS),
+                           organization_id=organization_id, limit=limit)
+    return ModelJSONResponse(results, SearchResponse)
@@ -1,16 +1,20 @@
 """ Teams API """
 
 from typing import Annotated
-from fastapi import APIRouter, Query, status
+from fastapi import APIRouter, Query, Request, Response, status
 from core.dependencies import CurrentActiveUserDep, OrganizationIDDep, TeamIDDep, UserIDDep
 from core.logging_conf import Logging
+from core.responses import ModelJSONResponse
 from schemas.role import RoleID
 from schemas.team import CreateTeam, SingleTeamResponse, AllTeamResponse, UpdateTeam, \
     AddTeamMembersRequest, AddMemberResponse
 from services.organization_service import verify_current_user_role
 from services.team_service import add_new_team_in_organization, \
     retrieve_all_team_of_the_organization, get_team_by_team_id, update_team_details, \
-    delete_the_team_by_id, add_team_members, verify_current_team_role, update_team_member_role
+    delete_the_team_by_id, add_team_members, verify_current_team_role, update_team_member_role, \
+    get_team_cache_validators, export_organization_teams
+from utils.exporters import ExportFormatQuery, export_response
+from utils.http_cache import is_not_modified, not_modified_response
 
 log = Logging(__name__).log()
 router = APIRouter(
@@ -67,20 +71,52 @@ async def get_all_teams(current_user: CurrentActiveUserDep, organization_id: Org
                                    permission_names=['team:read'])
 
     log.info("Retrieving all teams in the organization: %s", organization_id)
-    return await retrieve_all_team_of_the_organization(organization_id=organization_id, page=page,
-                                                       size=size, sort_by=sort_by)
+    teams = await retrieve_all_team_of_the_organization(organization_id=organization_id,
+                                                        page=page, size=size, sort_by=sort_by)
+    return ModelJSONResponse(teams, AllTeamResponse)
+
+
+@router.get("/teams/export")
+async def export_all_teams(current_user: CurrentActiveUserDep, organization_id: OrganizationIDDep,
+                           request: Request, export_format: ExportFormatQuery = "ndjson"):
+    """
+    Streams all teams of the specified organization as NDJSON or CSV.
+
+    Args:
+        current_user (CurrentActiveUserDep): The current active user.
+        organization_id (str): ID of the organization.
+        request (Request): The incoming request.
+        export_format (ExportFormatQuery): Export format, "ndjson" (default) or "csv".
+
+    Returns:
+        StreamingResponse: The export, gzip encoded if the client accepts it.
+    """
+    log.info("Verifying current user permission to read team.")
+    await verify_current_user_role(org_id=organization_id, user_id=current_user.id,
+                                   permission_names=['team:read'])
+
+    log.info("Exporting all teams in the organization: %s", organization_id)
+    chunks = await export_organization_teams(organization_id=organization_id,
+                                             export_format=export_format)
+    return export_response(request, chunks, export_format,
+                           filename=f"organization-{organization_id}-teams")
 
 
 @router.get("/teams/{team_id}", response_model=SingleTeamResponse)
 async def get_specific_team(current_user: CurrentActiveUserDep, organization_id: OrganizationIDDep,
-                            team_id: TeamIDDep):
+                            team_id: TeamIDDep, request: Request, response: Response):
     """
     Retrieves detailed information about a specific team.
 
+    Supports conditional requests: 304 Not Modified is returned when If-None-Match or
+    If-Modified-Since match the current version.
+
     Args:
         current_user (CurrentActiveUserDep): The current active user.
         organization_id (UUID): ID of the organization.
         team_id (UUID): The ID of the team.
+        request (Request): The incoming request.
+        response (Response): The response used to set the ETag and Last-Modified headers.
 
     Returns:
         SingleTeamResponse: The response after creating a team.
@@ -89,23 +125,34 @@ async def get_specific_team(current_user: CurrentActiveUserDep, organization_id:
     await verify_current_user_role(org_id=organization_id, user_id=current_user.id,
                                    permission_names=['team:read'])
 
+    validators = await get_team_cache_validators(team_id=team_id)
+    if is_not_modified(request, validators):
+        log.info("Team %s not modified.", team_id)
+        return not_modified_response(validators)
+    response.headers.update(validators.headers)
+
     log.info("Retrieving team details in the organization: %s for team: %s",
              organization_id, team_id)
     return await get_team_by_team_id(team_id=team_id)
 
 
 @router.put("/teams/{team_id}", response_model=SingleTeamResponse)
-async def update_specific_team(current_user: CurrentActiveUserDep,
+async def update_specific_team(current_user: CurrentActiveUserDep,  # pylint: disable=too-many-arguments, too-many-positional-arguments
                                organization_id: OrganizationIDDep, team_id: TeamIDDep,
-                               team: UpdateTeam):
+                               team: UpdateTeam, request: Request, response: Response):
     """
     Updates a team's details. Requires appropriate permissions (e.g., org admin, team lead).
 
+    When If-Match is sent, the update only happens if it matches the current ETag,
+    otherwise 412 Precondition Failed is returned.
+
     Args:
         current_user (CurrentActiveUserDep): The current active user.
         organization_id (OrganizationIDDep): ID of the organization.
         team_id (TeamIDDep): The ID of the team.
         team (UpdateTeam): Team details to be updated.
+        request (Request): The incoming request.
+        response (Response): The response used to set the new ETag and Last-Modified headers.
 
     Returns:
         SingleTeamResponse: The response after creating a team.
@@ -113,10 +160,12 @@ async def update_specific_team(current_user: CurrentActiveUserDep,
     log.info("Verifying current user permission to update team.")
     await verify_current_user_role(user_id=current_user.id, org_id=organization_id,
                                    permission_names=['team:update'])
-
     log.info("Updating team details in the organization: %s for team: %s",
              organization_id, team_id)
-    return await update_team_details(team_id=team_id, team_data=team)
+    updated_team = await update_team_details(team_id=team_id, team_data=team,
+                                             if_match=request.headers.get("if-match"))
+    response.headers.update((await get_team_cache_validators(team_id=team_id)).headers)
+    return updated_team
 
 
 @router.delete("/teams/{team_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -158,8 +207,9 @@ async def add_a_member_to_team(current_user: CurrentActiveUserDep,
     """
     await verify_current_team_role(user_id=current_user.id, team_id=team_id,
                                    permission_names=['team:manage_members'])
-    return await add_team_members(org_id=organization_id,
-                                  team_id=team_id, user_roles=new_users)
+    members = await add_team_members(org_id=organization_id,
+                                     team_id=team_id, user_roles=new_users)
+    return ModelJSONResponse(members, list[AddMemberResponse])
 
 
 @router.get("/teams/{team_id}/members")
@@ -0,0 +1,190 @@
+""" WebSocket APIs """
+
+import asyncio
+from uuid import UUID
+import orjson
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from core.config import WS_HEARTBEAT_SECONDS
+from core.dependencies import CurrentActiveUserDep
+from core.logging_conf import Logging
+from db.crud.crud_organization import get_organization_member_by_organization_user_id
+from db.crud.crud_team import get_team_member_by_team_user_id
+from schemas.user import User
+from services.notification_service import Connection, notification_hub, channel_name, \
+    CHANNEL_KINDS
+from services.user_service import get_current_active_user, get_current_user
+
+# pylint: disable=no-member
+
+# Initialize API router for the WebSocket endpoints
+router = APIRouter(prefix="/api/v1", tags=["websockets"])
+
+log = Logging(__name__).log()
+
+
+async def authenticate_websocket(websocket: WebSocket) -> User | None:
+    """
+    Authenticate a WebSocket handshake with the access token.
+
+    Browsers cannot set headers on a WebSocket handshake, so the token is read from the
+    ``token`` query parameter as well as from the ``Authorization`` header.
+
+    Args:
+        websocket (WebSocket): The WebSocket.
+
+    Returns:
+        User | None: The active user, None if the token is missing or invalid.
+    """
+    token = websocket.query_params.get("token")
+    if not token:
+        scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            return None
+    try:
+        return await get_current_active_user(await get_current_user(token))
+    except HTTPException:
+        return None
+
+
+def is_channel_allowed(user_id: UUID, channel: str) -> bool:
+    """
+    Check if a user may subscribe to a channel.
+
+    Args:
+        user_id (UUID): The ID of the user.
+        channel (str): The channel name, e.g. ``team:<id>``.
+
+    Returns:
+        bool: True if the user is a member of the organization or team, or owns the
+            user channel.
+    """
+    kind, _, object_id = channel.partition(":")
+    if kind not in CHANNEL_KINDS:
+        return False
+    try:
+        object_id = UUID(object_id)
+    except ValueError:
+        return False
+    if kind == "organization":
+        return get_organization_member_by_organization_user_id(org_id=object_id,
+                                                               user_id=user_id) is not None
+    if kind == "team":
+        return get_team_member_by_team_user_id(team_id=object_id, user_id=user_id) is not None
+    return object_id == user_id
+
+
+async def send_events(websocket: WebSocket, connection: Connection) -> None:
+    """
+    Send the queued events of a connection, and a ping while there are none.
+
+    Args:
+        websocket (WebSocket): The WebSocket.
+        connection (Connection): The connection of the WebSocket.
+    """
+    ping = orjson.dumps({"type": "ping"}).decode()
+    while True:
+        message = await connection.get(timeout=WS_HEARTBEAT_SECONDS)
+        await websocket.send_text(message if message is not None else ping)
+
+
+async def receive_commands(websocket: WebSocket, connection: Connection) -> None:
+    """
+    Handle the subscribe and unsubscribe commands of a client.
+
+    Clients send ``{"action": "subscribe" | "unsubscribe", "channel": "<kind>:<id>"}`` and
+    answer pings with ``{"action": "pong"}``. After a reconnect, ``"after": <offset>`` on
+    a subscribe replays the events the client missed; ``"complete": false`` in the answer
+    means some are gone and the client should reload. The connection is closed when
+    nothing is received for two heartbeat intervals.
+
+    Args:
+        websocket (WebSocket): The WebSocket.
+        connection (Connection): The connection of the WebSocket.
+    """
+    while True:
+        try:
+            text = await asyncio.wait_for(websocket.receive_text(),
+                                          timeout=2 * WS_HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            log.info("WebSocket of user %s missed its heartbeats", connection.user_id)
+            await websocket.close(code=status.WS_1001_GOING_AWAY)
+            return
+        try:
+            command = orjson.loads(text)
+            action, channel = command.get("action"), str(command.get("channel", ""))
+            after = int(command["after"]) if command.get("after") is not None else None
+        except (orjson.JSONDecodeError, AttributeError, TypeError, ValueError):
+            await websocket.send_json({"type": "error", "detail": "Invalid command"})
+            continue
+
+        if action == "pong":
+            continue
+        if action == "subscribe":
+            if not is_channel_allowed(connection.user_id, channel):
+                await websocket.send_json({"type": "error", "channel": channel,
+                                           "detail": "Channel not found"})
+                continue
+            # Replay and subscribe without awaiting in between, so no event is missed
+            complete = notification_hub.replay(connection, channel, after) \
+                if after is not None else True
+            notification_hub.subscribe(connection, channel)
+            await websocket.send_json({"type": "subscribed", "channel": channel,
+                                       "offset": notification_hub.offset,
+                                       "complete": complete})
+        elif action == "unsubscribe":
+            notification_hub.unsubscribe(connection, channel)
+            await websocket.send_json({"type": "unsubscribed", "channel": channel})
+        else:
+            await websocket.send_json({"type": "error", "detail": "Unknown action"})
+
+
+@router.websocket("/ws")
+async def notifications_websocket(websocket: WebSocket):
+    """
+    Push organization, team and user events to a client.
+
+    The connection is subscribed to the channel of the user, other channels are
+    subscribed with commands.
+
+    Args:
+        websocket (WebSocket): The WebSocket.
+    """
+    user = await authenticate_websocket(websocket)
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    connection = notification_hub.connect(user.id)
+    notification_hub.subscribe(connection, channel_name("user", user.id))
+    tasks = [asyncio.create_task(send_events(websocket, connection)),
+             asyncio.create_task(receive_commands(websocket, connection))]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        notification_hub.disconnect(connection)
+
+
+@router.get("/ws/stats")
+async def get_websocket_stats(current_user: CurrentActiveUserDep) -> dict[str, int]:
+    """
+    Retrieve the notification hub metrics of this process.
+
+    Args:
+        current_user (CurrentActiveUserDep): The current active user.
+
+    Returns:
+        dict[str, int]: The open connections, subscribed channels, published, queued and
+            dropped events.
+    """
+    log.info("WebSocket stats requested by %s", current_user.username)
+    return notification_hub.stats()
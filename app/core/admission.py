@@ -0,0 +1,24 @@
+""" Admission Policies
+
+The first policy whose pattern and method match a request applies. Requests matching
+none, e.g. WebSockets, are not limited.
+"""
+from utils.admission import AdmissionPolicy, AdmissionController
+
+ADMISSION_POLICIES = (
+    # Each login costs a bcrypt verification
+    AdmissionPolicy("auth", r"/api/v1/auth/", max_concurrency=16, max_queue=64,
+                    queue_timeout=5.0),
+    # Exports, lists and search scan many rows and can be retried, they are shed first
+    AdmissionPolicy("exports", r"/api/v1/organization/[^/]+/(exports|members/export"
+                    r"|teams/export)", max_concurrency=4, low_priority=True),
+    AdmissionPolicy("lists", r"/api/v1/(search|organization/?$|organization/[^/]+/"
+                    r"(members|teams)/?$)", methods=("GET",), max_concurrency=16,
+                    low_priority=True),
+    AdmissionPolicy("writes", r"/api/v1/", methods=("POST", "PUT", "PATCH", "DELETE"),
+                    max_concurrency=32, max_queue=128, queue_timeout=5.0),
+    AdmissionPolicy("reads", r"/api/v1/", max_concurrency=64, max_queue=256,
+                    queue_timeout=2.0),
+)
+
+admission_controller = AdmissionController(ADMISSION_POLICIES)
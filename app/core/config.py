@@ -12,6 +12,116 @@ SQLITE_DATABASE_FILE = os.getenv("SQLITE_DATABASE_FILE", "taskhub.sql")
 SQLITE_DATABASE_URL = f"sqlite:///{PROJECT_PATH / 'data'/ SQLITE_DATABASE_FILE}"
 DATABASE_URL = os.getenv("DATABASE_URL", SQLITE_DATABASE_URL)
 
+# Responses built from database rows skip pydantic validation unless this is enabled
+STRICT_RESPONSE_VALIDATION = os.getenv("STRICT_RESPONSE_VALIDATION", "false").lower() == "true"
+
+# Background jobs
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2.0"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600.0"))
+
+# Reminder scheduler, reminders due within the window are leased and kept in memory
+REMINDER_WINDOW_SECONDS = int(os.getenv("REMINDER_WINDOW_SECONDS", "300"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "1000"))
+REMINDER_LEASE_GRACE_SECONDS = int(os.getenv("REMINDER_LEASE_GRACE_SECONDS", "60"))
+
+# Email, EMAIL_BACKEND=console logs the messages instead of sending them
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "console")
+EMAIL_FROM = os.getenv("EMAIL_FROM", "TaskHub <no-reply@taskhub.local>")
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_DOMAIN_CONCURRENCY = int(os.getenv("EMAIL_DOMAIN_CONCURRENCY", "2"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+# The defaults match a local aiosmtpd stand-in: python -m aiosmtpd -n -l localhost:8025
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "8025"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"
+SMTP_SSL = os.getenv("SMTP_SSL", "false").lower() == "true"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_IDLE_TIMEOUT_SECONDS = int(os.getenv("SMTP_IDLE_TIMEOUT_SECONDS", "60"))
+
+# WebSocket notifications, WS_BACKPRESSURE_POLICY is "coalesce" or "drop_oldest"
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_BACKPRESSURE_POLICY = os.getenv("WS_BACKPRESSURE_POLICY", "coalesce")
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "25"))
+
+# Event broadcast between the API processes, BROADCAST_BACKEND is "sqlite" or "memory"
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "sqlite")
+BROADCAST_POLL_INTERVAL_SECONDS = float(os.getenv("BROADCAST_POLL_INTERVAL_SECONDS", "0.1"))
+BROADCAST_FLUSH_INTERVAL_SECONDS = float(os.getenv("BROADCAST_FLUSH_INTERVAL_SECONDS", "0.01"))
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "500"))
+BROADCAST_RETENTION_SECONDS = int(os.getenv("BROADCAST_RETENTION_SECONDS", "3600"))
+BROADCAST_REPLAY_LIMIT = int(os.getenv("BROADCAST_REPLAY_LIMIT", "1000"))
+
+# Member autocomplete, indexes of the least recently used organizations are evicted
+AUTOCOMPLETE_MAX_ENTRIES = int(os.getenv("AUTOCOMPLETE_MAX_ENTRIES", "200000"))
+AUTOCOMPLETE_MIN_SCORE = float(os.getenv("AUTOCOMPLETE_MIN_SCORE", "0.5"))
+
+# Cohort analytics, reports of the least recently used organizations and days are evicted
+ANALYTICS_COHORT_CACHE_SIZE = int(os.getenv("ANALYTICS_COHORT_CACHE_SIZE", "512"))
+
+# Rate limiting, see core/rate_limits.py for the policies. Only trust X-Forwarded-For,
+# whose last entry is used, behind one proxy that appends the client address to it
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_SHARDS = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+RATE_LIMIT_SWEEP_SECONDS = float(os.getenv("RATE_LIMIT_SWEEP_SECONDS", "60"))
+RATE_LIMIT_TRUST_FORWARDED_FOR = os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR",
+                                           "false").lower() == "true"
+# RATE_LIMIT_BACKEND is "memory" (per process) or "shared" (all processes of the host)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+# Counters shared by the processes of a host, the file should be on a tmpfs
+SHARED_COUNTERS_PATH = Path(os.getenv("SHARED_COUNTERS_PATH", "/dev/shm/taskhub-counters"))
+SHARED_COUNTERS_SLOTS = int(os.getenv("SHARED_COUNTERS_SLOTS", "65536"))
+SHARED_COUNTERS_STRIPES = int(os.getenv("SHARED_COUNTERS_STRIPES", "64"))
+
+# Failed login lockouts, a username or address is locked out from its threshold on, for
+# twice as long after every further failure; failures count half after the half-life
+LOGIN_THROTTLE_USER_THRESHOLD = float(os.getenv("LOGIN_THROTTLE_USER_THRESHOLD", "5"))
+LOGIN_THROTTLE_IP_THRESHOLD = float(os.getenv("LOGIN_THROTTLE_IP_THRESHOLD", "20"))
+LOGIN_THROTTLE_BASE_SECONDS = float(os.getenv("LOGIN_THROTTLE_BASE_SECONDS", "1"))
+LOGIN_THROTTLE_MAX_SECONDS = float(os.getenv("LOGIN_THROTTLE_MAX_SECONDS", "900"))
+LOGIN_THROTTLE_HALF_LIFE_SECONDS = float(os.getenv("LOGIN_THROTTLE_HALF_LIFE_SECONDS", "900"))
+LOGIN_THROTTLE_MAX_ENTRIES = int(os.getenv("LOGIN_THROTTLE_MAX_ENTRIES", "100000"))
+
+# Admission control, see core/admission.py for the concurrency limits
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+
+# Request deadlines, see core/deadlines.py for the timeouts; SQLite checks the deadline of
+# a running statement every DEADLINE_SQLITE_PROGRESS_STEPS virtual machine instructions
+REQUEST_DEADLINES_ENABLED = os.getenv("REQUEST_DEADLINES_ENABLED", "true").lower() == "true"
+DEADLINE_SQLITE_PROGRESS_STEPS = int(os.getenv("DEADLINE_SQLITE_PROGRESS_STEPS", "10000"))
+
+# Retries of transactions failing on a database lock, with exponential backoff and full
+# jitter from DB_RETRY_BASE_DELAY up to DB_RETRY_MAX_DELAY seconds per pause; a SQLite
+# write waits SQLITE_BUSY_TIMEOUT_MS for the lock before it fails and is retried
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "1000"))
+DB_RETRY_MAX_ATTEMPTS = int(os.getenv("DB_RETRY_MAX_ATTEMPTS", "5"))
+DB_RETRY_BASE_DELAY = float(os.getenv("DB_RETRY_BASE_DELAY", "0.02"))
+DB_RETRY_MAX_DELAY = float(os.getenv("DB_RETRY_MAX_DELAY", "0.5"))
+DB_RETRY_MAX_ELAPSED = float(os.getenv("DB_RETRY_MAX_ELAPSED", "5.0"))
+
+# Read-through caches of entities by ID; ENTITY_CACHE_BACKEND is "memory" (an LRU per
+# process) or "shared" (files in ENTITY_CACHE_DIR, seen by all processes of the host)
+ENTITY_CACHE_ENABLED = os.getenv("ENTITY_CACHE_ENABLED", "true").lower() == "true"
+ENTITY_CACHE_BACKEND = os.getenv("ENTITY_CACHE_BACKEND", "memory")
+ENTITY_CACHE_MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "10000"))
+ENTITY_CACHE_DIR = Path(os.getenv("ENTITY_CACHE_DIR", "/dev/shm/taskhub-entity-cache"))
+ENTITY_CACHE_NEGATIVE_TTL = float(os.getenv("ENTITY_CACHE_NEGATIVE_TTL", "5"))
+ENTITY_CACHE_USER_TTL = float(os.getenv("ENTITY_CACHE_USER_TTL", "60"))
+ENTITY_CACHE_ROLE_TTL = float(os.getenv("ENTITY_CACHE_ROLE_TTL", "300"))
+ENTITY_CACHE_PERMISSION_TTL = float(os.getenv("ENTITY_CACHE_PERMISSION_TTL", "3600"))
+ENTITY_CACHE_ORGANIZATION_TTL = float(os.getenv("ENTITY_CACHE_ORGANIZATION_TTL", "60"))
+ENTITY_CACHE_TEAM_TTL = float(os.getenv("ENTITY_CACHE_TEAM_TTL", "30"))
+
+# Organization data exports written by the background workers
+EXPORT_DIR = Path(os.getenv("EXPORT_DIR", str(PROJECT_PATH / "data" / "exports")))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
 # Logger
 EXECUTION_LOG_PATH = f"{PROJECT_PATH / 'execution.log'}"
 
@@ -0,0 +1,15 @@
+""" Request Timeouts
+
+The first pattern matching the start of the path sets the deadline of a request, the
+database queries of a request running past it are interrupted and it is answered with
+504. The deadline ends when the response starts, streamed bodies run without it.
+Requests matching none, e.g. WebSockets, have no deadline.
+"""
+
+REQUEST_TIMEOUTS = (
+    # Exports stream many pages of rows, the deadline only covers their first page
+    (r"/api/v1/organization/[^/]+/(exports|members/export|teams/export)", 120.0),
+    # Reports aggregate the history of an organization
+    (r"/api/v1/organization/[^/]+/analytics/", 30.0),
+    (r"/api/v1/", 10.0),
+)
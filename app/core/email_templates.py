@@ -0,0 +1,18 @@
+""" Email Templates
+
+Templates use ``string.Template`` placeholders, e.g. ``$organization_name``.
+"""
+EMAIL_TEMPLATES = {
+    "organization_invite": {
+        "subject": "You have been added to $organization_name",
+        "body": "Hi $full_name,\n\n"
+                "You have been added to the organization $organization_name on TaskHub "
+                "with the role $role_name.\n",
+    },
+    "reminder": {
+        "subject": "Reminder: $message",
+        "body": "Hi $full_name,\n\n"
+                "This is your reminder: $message\n\n"
+                "Due at $due_at.\n",
+    },
+}
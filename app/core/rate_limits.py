@@ -0,0 +1,26 @@
+""" Rate Limit Policies
+
+The first policy whose path prefix and method match a request applies, so specific
+routes come before the routers they belong to.
+"""
+from utils.rate_limiter import RateLimit, RatePolicy
+
+RATE_LIMIT_POLICIES = (
+    # Each attempt costs a bcrypt verification
+    RatePolicy("/api/v1/auth/token", methods=("POST",), limits=(
+        RateLimit(limit=20, period=60, key="ip", burst=10),
+        RateLimit(limit=600, period=60, key="route"),
+    )),
+    RatePolicy("/api/v1/auth/register", methods=("POST",), limits=(
+        RateLimit(limit=20, period=3600, key="ip", burst=5),
+    )),
+    RatePolicy("/api/v1/auth/request-password-reset", methods=("POST",), limits=(
+        RateLimit(limit=5, period=3600, key="ip"),
+    )),
+    RatePolicy("/api/v1/auth", limits=(
+        RateLimit(limit=60, period=60, key="ip"),
+    )),
+    RatePolicy("/api/v1", limits=(
+        RateLimit(limit=600, period=60, key="user", burst=100),
+    )),
+)
@@ -0,0 +1,60 @@
+""" Response classes """
+from functools import lru_cache
+from typing import Any
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def get_type_adapter(response_type: Any) -> TypeAdapter:
+    """
+    Retrieve the prebuilt TypeAdapter for a response type.
+
+    The adapter (and its compiled pydantic-core serializer) is created once per type
+    and reused for every request.
+
+    Args:
+        response_type (Any): The response schema, e.g. ``AllRoleResponse`` or
+            ``list[OrganizationMemberResponse]``.
+
+    Returns:
+        TypeAdapter: The adapter for the type.
+    """
+    return TypeAdapter(response_type)
+
+
+class ModelJSONResponse(Response):
+    """
+    JSON response rendered straight to bytes by the compiled serializer of a schema.
+
+    Returning it from a route skips FastAPI's ``response_model`` re-validation and the
+    intermediate dict/``jsonable_encoder`` step. Keep ``response_model`` on the route for
+    the OpenAPI documentation.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content: Any, response_type: Any, status_code: int = 200,
+                 headers: dict[str, str] | None = None):
+        """
+        Initialize the response.
+
+        Args:
+            content (Any): The schema instance (or list of instances) to send.
+            response_type (Any): The type used to serialize the content.
+            status_code (int): The HTTP status code.
+            headers (dict[str, str] | None): Additional response headers.
+        """
+        self.response_type = response_type
+        super().__init__(content, status_code=status_code, headers=headers)
+
+    def render(self, content: Any) -> bytes:
+        """
+        Serialize the content to JSON bytes.
+
+        Args:
+            content (Any): The content to serialize.
+
+        Returns:
+            bytes: The JSON encoded content.
+        """
+        return get_type_adapter(self.response_type).dump_json(content)
@@ -1,12 +1,20 @@
 """ Base DB """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, Session
 
-from core.config import DATABASE_URL
+from core.config import DATABASE_URL, DEADLINE_SQLITE_PROGRESS_STEPS, SQLITE_BUSY_TIMEOUT_MS
+from utils.deadline import DeadlineExceeded, remaining_seconds, is_deadline_exceeded, \
+    sqlite_progress_handler
 
 # Define the base class for SQLAlchemy models
 Base = declarative_base()
 
+# Statements limiting the run time of the next statements to the request deadline (ms)
+STATEMENT_TIMEOUT_SQL = {
+    "postgresql": "SET statement_timeout = {}",
+    "mysql": "SET SESSION MAX_EXECUTION_TIME = {}",
+}
+
 # Connection arguments for the SQLite database
 connect_args = {"check_same_thread": False}
 
@@ -20,6 +28,60 @@ engine = create_engine(
     echo=True  # Enable SQL query logging
 )
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+        """
+        Enable WAL on every new SQLite connection.
+
+        WAL lets the API and the job worker processes read while one of them writes,
+        instead of failing with "database is locked". The progress handler interrupts
+        statements running past the deadline of their request.
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+        dbapi_connection.set_progress_handler(sqlite_progress_handler,
+                                              DEADLINE_SQLITE_PROGRESS_STEPS)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _apply_request_deadline(connection, cursor, *_args) -> None:
+    """
+    Refuse statements after the request deadline, and limit their run time to it on
+    backends with a statement timeout.
+
+    Raises:
+        DeadlineExceeded: If the deadline of the request has passed.
+    """
+    remaining = remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded()
+    timeout_sql = STATEMENT_TIMEOUT_SQL.get(engine.dialect.name)
+    if timeout_sql is None:
+        return
+    timeout_ms = 0 if remaining is None else max(int(remaining * 1000), 1)
+    if connection.info.get("statement_timeout_ms", 0) != timeout_ms:
+        cursor.execute(timeout_sql.format(timeout_ms))
+        connection.info["statement_timeout_ms"] = timeout_ms
+
+
+@event.listens_for(engine, "handle_error")
+def _raise_deadline_exceeded(context) -> DeadlineExceeded | None:
+    """
+    Report statements interrupted or cancelled at the request deadline as such.
+
+    Args:
+        context (ExceptionContext): The failed execution.
+
+    Returns:
+        DeadlineExceeded | None: The exception raised instead, None to keep the original.
+    """
+    if context.is_disconnect or not is_deadline_exceeded():
+        return None
+    return DeadlineExceeded()
+
 def get_session():
     """
     Create and return a new SQLAlchemy session.
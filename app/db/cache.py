@@ -0,0 +1,50 @@
+""" Entity Caches
+
+The read-through caches of the entities looked up by ID on most requests. The helpers
+updating or deleting an entity invalidate it after their commit; entities without such
+helpers, e.g. roles removed with their organization, expire with their TTL.
+"""
+from core.config import ENTITY_CACHE_ENABLED, ENTITY_CACHE_BACKEND, ENTITY_CACHE_MAX_ENTRIES, \
+    ENTITY_CACHE_DIR, ENTITY_CACHE_NEGATIVE_TTL, ENTITY_CACHE_USER_TTL, ENTITY_CACHE_ROLE_TTL, \
+    ENTITY_CACHE_PERMISSION_TTL, ENTITY_CACHE_ORGANIZATION_TTL, ENTITY_CACHE_TEAM_TTL
+from utils.entity_cache import CacheBackend, EntityCache, LRUCacheBackend, FileCacheBackend
+
+
+def get_cache_backend(backend: str = ENTITY_CACHE_BACKEND) -> CacheBackend:
+    """
+    Create the configured cache backend.
+
+    Args:
+        backend (str): "memory" for an LRU per process, "shared" for one per host.
+
+    Returns:
+        CacheBackend: The backend.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == "memory":
+        return LRUCacheBackend(ENTITY_CACHE_MAX_ENTRIES)
+    if backend == "shared":
+        return FileCacheBackend(ENTITY_CACHE_DIR)
+    raise ValueError(f"Unknown entity cache backend: {backend}")
+
+
+def _ttl(seconds: float) -> float:
+    """ Return the TTL of an entity type, 0 (not cached) while the caches are disabled. """
+    return seconds if ENTITY_CACHE_ENABLED else 0.0
+
+
+cache_backend = get_cache_backend()
+user_cache = EntityCache("user", cache_backend, _ttl(ENTITY_CACHE_USER_TTL),
+                         ENTITY_CACHE_NEGATIVE_TTL)
+role_cache = EntityCache("role", cache_backend, _ttl(ENTITY_CACHE_ROLE_TTL),
+                         ENTITY_CACHE_NEGATIVE_TTL)
+permission_cache = EntityCache("permission", cache_backend, _ttl(ENTITY_CACHE_PERMISSION_TTL),
+                               ENTITY_CACHE_NEGATIVE_TTL)
+organization_cache = EntityCache("organization", cache_backend,
+                                 _ttl(ENTITY_CACHE_ORGANIZATION_TTL), ENTITY_CACHE_NEGATIVE_TTL)
+team_cache = EntityCache("team", cache_backend, _ttl(ENTITY_CACHE_TEAM_TTL),
+                         ENTITY_CACHE_NEGATIVE_TTL)
+
+ENTITY_CACHES = (user_cache, role_cache, permission_cache, organization_cache, team_cache)
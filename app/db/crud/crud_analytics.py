@@ -0,0 +1,198 @@
+""" Analytics Rollup Crud """
+
+from datetime import date
+from uuid import UUID
+from sqlalchemy import ColumnElement, select, delete, literal, func, cast, Integer
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from db.base import get_session
+from db.retry import retry_transaction
+from db.models.analytics import MemberRollupModel, TeamRollupModel, LoginRollupModel, \
+    ROLLUP_TABLES, get_rollup_backfill_statements
+from db.models.organization import OrganizationMemberModel
+from db.models.role import RoleModel
+from db.models.user import UserModel
+from utils.helpers import utc_now
+
+# pylint: disable=not-callable
+
+# julianday of 1970-01-01, day numbers count days since the Unix epoch
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def bump_member_rollup(session: Session, organization_id: UUID, role_id: UUID,
+                       joined: int = 0, left: int = 0) -> None:
+    """
+    Count members joining or leaving a role today, within the caller's transaction.
+
+    Args:
+        session (Session): The session of the membership change.
+        organization_id (UUID): The ID of the organization.
+        role_id (UUID): The ID of the role.
+        joined (int): The members who got the role.
+        left (int): The members who lost the role.
+    """
+    statement = insert(MemberRollupModel).values(
+        organization_id=organization_id, day=utc_now().date(), role_id=role_id,
+        joined=joined, left=left)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=["organization_id", "day", "role_id"],
+        set_={"joined": MemberRollupModel.joined + statement.excluded.joined,
+              "left": MemberRollupModel.left + statement.excluded.left}))
+
+
+def bump_team_rollup(session: Session, organization_id: UUID, created: int = 0,
+                     deleted: int = 0) -> None:
+    """
+    Count teams created or deleted today, within the caller's transaction.
+
+    Args:
+        session (Session): The session of the team change.
+        organization_id (UUID): The ID of the organization.
+        created (int): The created teams.
+        deleted (int): The deleted teams.
+    """
+    statement = insert(TeamRollupModel).values(
+        organization_id=organization_id, day=utc_now().date(), created=created, deleted=deleted)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=["organization_id", "day"],
+        set_={"created": TeamRollupModel.created + statement.excluded.created,
+              "deleted": TeamRollupModel.deleted + statement.excluded.deleted}))
+
+
+def bump_login_rollup(session: Session, user_id: UUID, first_today: bool) -> None:
+    """
+    Count a login today in every organization of the user, within the caller's transaction.
+
+    Args:
+        session (Session): The session updating the login time.
+        user_id (UUID): The ID of the user.
+        first_today (bool): The user did not log in before today, so is a new active user.
+    """
+    today = utc_now().date()
+    active = int(first_today)
+    statement = insert(LoginRollupModel).from_select(
+        ["organization_id", "day", "logins", "active_users"],
+        select(OrganizationMemberModel.organization_id, literal(today), literal(1),
+               literal(active))
+        .where(OrganizationMemberModel.user_id == user_id))
+    session.execute(statement.on_conflict_do_update(
+        index_elements=["organization_id", "day"],
+        set_={"logins": LoginRollupModel.logins + 1,
+              "active_users": LoginRollupModel.active_users + active}))
+
+
+def get_member_rollups(organization_id: UUID) -> list[tuple[date, UUID, str | None, int]]:
+    """
+    Retrieve the daily net member changes per role of an organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        list[tuple[date, UUID, str | None, int]]: The day, role ID, role name (None if the
+            role was deleted) and joined minus left members, by day.
+    """
+    session = get_session()
+    rows = session.execute(
+        select(MemberRollupModel.day, MemberRollupModel.role_id, RoleModel.name,
+               MemberRollupModel.joined - MemberRollupModel.left)
+        .outerjoin(RoleModel, RoleModel.id == MemberRollupModel.role_id)
+        .where(MemberRollupModel.organization_id == organization_id)
+        .order_by(MemberRollupModel.day)).all()
+    session.commit()
+    return [tuple(row) for row in rows]
+
+
+def get_team_rollups(organization_id: UUID) -> list[tuple[date, int, int]]:
+    """
+    Retrieve the daily created and deleted teams of an organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        list[tuple[date, int, int]]: The day, created and deleted teams, by day.
+    """
+    session = get_session()
+    rows = session.execute(
+        select(TeamRollupModel.day, TeamRollupModel.created, TeamRollupModel.deleted)
+        .where(TeamRollupModel.organization_id == organization_id)
+        .order_by(TeamRollupModel.day)).all()
+    session.commit()
+    return [tuple(row) for row in rows]
+
+
+def get_login_rollups(organization_id: UUID, since: date) -> list[tuple[date, int, int]]:
+    """
+    Retrieve the daily logins of the members of an organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        since (date): The first day.
+
+    Returns:
+        list[tuple[date, int, int]]: The day, logins and active users, by day.
+    """
+    session = get_session()
+    rows = session.execute(
+        select(LoginRollupModel.day, LoginRollupModel.logins, LoginRollupModel.active_users)
+        .where(LoginRollupModel.organization_id == organization_id,
+               LoginRollupModel.day >= since)
+        .order_by(LoginRollupModel.day)).all()
+    session.commit()
+    return [tuple(row) for row in rows]
+
+
+def _epoch_day(column: ColumnElement) -> ColumnElement:
+    """
+    Build the expression of the day number of a timestamp column.
+
+    Args:
+        column (ColumnElement): The timestamp column.
+
+    Returns:
+        ColumnElement: The integer days since the Unix epoch, NULL if the column is.
+    """
+    return cast(func.julianday(column) - UNIX_EPOCH_JULIAN_DAY, Integer)
+
+
+def get_member_activity_days(organization_id: UUID) -> list[tuple[int, int, int | None]]:
+    """
+    Retrieve the signup, join and last login day of every member of an organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        list[tuple[int, int, int | None]]: The days since the Unix epoch the user signed
+            up, joined the organization and last logged in (None if never).
+    """
+    session = get_session()
+    rows = session.execute(
+        select(_epoch_day(UserModel.created_at), _epoch_day(OrganizationMemberModel.joined_at),
+               _epoch_day(UserModel.last_login_at))
+        .join(UserModel, UserModel.id == OrganizationMemberModel.user_id)
+        .where(OrganizationMemberModel.organization_id == organization_id)).all()
+    session.commit()
+    return rows
+
+
+@retry_transaction
+def rebuild_rollups() -> int:
+    """
+    Recompute the member and team rollups from the raw tables in one transaction.
+
+    Deleted members and teams are gone from the raw tables, so the rebuilt history only
+    holds the current ones, and logins before the rebuild only the last login per user.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    session = get_session()
+    for rollup_table in ROLLUP_TABLES:
+        session.execute(delete(rollup_table))
+    written = sum(session.execute(statement).rowcount
+                  for statement in get_rollup_backfill_statements())
+    session.commit()
+    return written
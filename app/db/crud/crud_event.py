@@ -0,0 +1,110 @@
+""" Broadcast Event Crud """
+
+from datetime import datetime
+from sqlalchemy import Select, select, insert, delete, func
+from db.base import get_session
+from db.retry import retry_transaction
+from db.models.event import EventModel
+from db.read_models import EventRow
+
+# pylint: disable=no-member
+
+
+def _select_event_rows() -> Select:
+    """
+    Build the select of the event read model columns.
+
+    Returns:
+        Select: The statement, ordered by offset.
+    """
+    return select(EventModel.id, EventModel.channel, EventModel.message,
+                  EventModel.coalesce_key).order_by(EventModel.id)
+
+
+@retry_transaction
+def append_events(events: list[tuple[str, str, str | None]]) -> None:
+    """
+    Append a batch of events to the broadcast log in one transaction.
+
+    Args:
+        events (list[tuple[str, str, str | None]]): The channel, encoded message and
+            coalesce key of every event, in publish order.
+    """
+    session = get_session()
+    session.execute(insert(EventModel), [
+        {"channel": channel, "message": message, "coalesce_key": coalesce_key}
+        for channel, message, coalesce_key in events])
+    session.commit()
+
+
+def get_events_after(after_id: int, limit: int) -> list[EventRow]:
+    """
+    Retrieve the events of all channels published after an offset.
+
+    Args:
+        after_id (int): The last offset already read.
+        limit (int): The maximum number of events.
+
+    Returns:
+        list[EventRow]: The events in offset order.
+    """
+    session = get_session()
+    rows = session.execute(_select_event_rows().where(EventModel.id > after_id)
+                           .limit(limit)).all()
+    session.commit()
+    return [EventRow(*row) for row in rows]
+
+
+def get_channel_events_between(channel: str, after_id: int, until_id: int,
+                               limit: int) -> list[EventRow]:
+    """
+    Retrieve the events of a channel within an offset range.
+
+    Args:
+        channel (str): The channel name.
+        after_id (int): The last offset the client received, excluded.
+        until_id (int): The last offset to return, included.
+        limit (int): The maximum number of events.
+
+    Returns:
+        list[EventRow]: The events in offset order.
+    """
+    session = get_session()
+    rows = session.execute(_select_event_rows()
+                           .where(EventModel.channel == channel, EventModel.id > after_id,
+                                  EventModel.id <= until_id)
+                           .limit(limit)).all()
+    session.commit()
+    return [EventRow(*row) for row in rows]
+
+
+def get_event_offsets() -> tuple[int, int]:
+    """
+    Retrieve the first and the last offset of the broadcast log.
+
+    Returns:
+        tuple[int, int]: The first and the last offset, both 0 if the log is empty.
+    """
+    session = get_session()
+    first, last = session.execute(select(func.min(EventModel.id),
+                                         func.max(EventModel.id))).one()
+    session.commit()
+    return first or 0, last or 0
+
+
+@retry_transaction
+def delete_events_before(created_before: datetime) -> int:
+    """
+    Delete the events published before a time.
+
+    Args:
+        created_before (datetime): The retention cut-off.
+
+    Returns:
+        int: The number of deleted events.
+    """
+    session = get_session()
+    result = session.execute(delete(EventModel).where(EventModel.created_at < created_before)
+                             .execution_options(synchronize_session=False))
+    session.commit()
+    return result.rowcount
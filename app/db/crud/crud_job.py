@@ -0,0 +1,219 @@
+""" Job Crud """
+
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import UUID
+import orjson
+from sqlalchemy import select, update, or_, and_
+from db.base import get_session
+from db.retry import retry_transaction
+from db.models.job import JobModel, JOB_STATUS_QUEUED, JOB_STATUS_RUNNING, \
+    JOB_STATUS_SUCCEEDED, JOB_STATUS_FAILED
+from db.read_models import JobRow
+from utils.helpers import utc_now
+
+# pylint: disable=no-member
+
+
+@retry_transaction
+def create_job(task_name: str, payload: dict[str, Any], queue: str,  # pylint: disable=too-many-arguments, too-many-positional-arguments
+               priority: int, max_attempts: int, run_at: datetime,
+               job_id: UUID | None = None) -> UUID:
+    """
+    Insert a new queued job.
+
+    Args:
+        task_name (str): The registered name of the task.
+        payload (dict[str, Any]): The keyword arguments of the task, UUIDs and datetimes allowed.
+        queue (str): The name of the queue.
+        priority (int): Jobs with a higher priority are leased first.
+        max_attempts (int): The number of attempts before the job is marked failed.
+        run_at (datetime): The job is not leased before this time.
+        job_id (UUID | None): The ID of the job, generated if None.
+
+    Returns:
+        UUID: The ID of the new job.
+    """
+    job = JobModel(task_name=task_name, payload=orjson.dumps(payload).decode(), queue=queue,
+                   priority=priority, max_attempts=max_attempts, run_at=run_at)
+    if job_id is not None:
+        job.id = job_id
+    session = get_session()
+    session.add(job)
+    session.commit()
+    return job.id
+
+
+@retry_transaction
+def lease_jobs(worker_id: str, queues: list[str], limit: int,
+               visibility_timeout: int) -> list[JobRow]:
+    """
+    Atomically lease the next runnable jobs for a worker.
+
+    Queued jobs whose ``run_at`` has passed and running jobs whose lease expired (their
+    worker died) are leased in priority order by a single ``UPDATE ... RETURNING``
+    statement, so two workers can never lease the same job. A job whose lease expired on
+    its last attempt, e.g. because it crashes its worker, is marked failed instead.
+
+    Args:
+        worker_id (str): The ID of the leasing worker.
+        queues (list[str]): The queues the worker consumes.
+        limit (int): The maximum number of jobs to lease.
+        visibility_timeout (int): Seconds before an unfinished lease expires.
+
+    Returns:
+        list[JobRow]: The leased jobs.
+    """
+    now = utc_now()
+    session = get_session()
+    session.execute(
+        update(JobModel)
+        .where(JobModel.queue.in_(queues), JobModel.status == JOB_STATUS_RUNNING,
+               JobModel.lease_expires_at < now, JobModel.attempts >= JobModel.max_attempts)
+        .values(status=JOB_STATUS_FAILED, lease_expires_at=None, finished_at=now,
+                last_error="The lease of the last attempt expired")
+        .execution_options(synchronize_session=False))
+    runnable = (
+        select(JobModel.id)
+        .where(JobModel.queue.in_(queues),
+               or_(and_(JobModel.status == JOB_STATUS_QUEUED, JobModel.run_at <= now),
+                   and_(JobModel.status == JOB_STATUS_RUNNING, JobModel.lease_expires_at < now,
+                        JobModel.attempts < JobModel.max_attempts)))
+        .order_by(JobModel.priority.desc(), JobModel.run_at)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    statement = (
+        update(JobModel)
+        .where(JobModel.id.in_(runnable))
+        .values(status=JOB_STATUS_RUNNING, worker_id=worker_id, attempts=JobModel.attempts + 1,
+                lease_expires_at=now + timedelta(seconds=visibility_timeout))
+        .returning(JobModel.id, JobModel.queue, JobModel.task_name, JobModel.payload,
+                   JobModel.attempts, JobModel.max_attempts)
+        .execution_options(synchronize_session=False)
+    )
+    rows = session.execute(statement).all()
+    session.commit()
+    return [JobRow(id=row.id, queue=row.queue, task_name=row.task_name,
+                   payload=orjson.loads(row.payload), attempts=row.attempts,
+                   max_attempts=row.max_attempts) for row in rows]
+
+
+@retry_transaction
+def _update_leased_job(job_id: UUID, worker_id: str, values: dict[str, Any]) -> bool:
+    """
+    Update a job only while the given worker still holds its lease.
+
+    Args:
+        job_id (UUID): The ID of the job.
+        worker_id (str): The ID of the worker holding the lease.
+        values (dict[str, Any]): The column values to set.
+
+    Returns:
+        bool: False if the lease was lost to another worker.
+    """
+    session = get_session()
+    result = session.execute(
+        update(JobModel)
+        .where(JobModel.id == job_id, JobModel.worker_id == worker_id,
+               JobModel.status == JOB_STATUS_RUNNING)
+        .values(values)
+        .execution_options(synchronize_session=False))
+    session.commit()
+    return result.rowcount == 1
+
+
+def extend_job_lease(job_id: UUID, worker_id: str, visibility_timeout: int) -> bool:
+    """
+    Extend the lease of a running job.
+
+    Args:
+        job_id (UUID): The ID of the job.
+        worker_id (str): The ID of the worker holding the lease.
+        visibility_timeout (int): Seconds from now before the lease expires.
+
+    Returns:
+        bool: False if the lease was lost to another worker.
+    """
+    return _update_leased_job(job_id, worker_id, {
+        "lease_expires_at": utc_now() + timedelta(seconds=visibility_timeout)})
+
+
+def complete_job(job_id: UUID, worker_id: str) -> bool:
+    """
+    Mark a leased job as succeeded.
+
+    Args:
+        job_id (UUID): The ID of the job.
+        worker_id (str): The ID of the worker holding the lease.
+
+    Returns:
+        bool: False if the lease was lost to another worker.
+    """
+    return _update_leased_job(job_id, worker_id, {
+        "status": JOB_STATUS_SUCCEEDED, "progress": 100, "lease_expires_at": None,
+        "finished_at": utc_now(), "last_error": None})
+
+
+def retry_job(job_id: UUID, worker_id: str, error: str, run_at: datetime) -> bool:
+    """
+    Put a failed job back in the queue for another attempt.
+
+    Args:
+        job_id (UUID): The ID of the job.
+        worker_id (str): The ID of the worker holding the lease.
+        error (str): The error of the failed attempt.
+        run_at (datetime): The time of the next attempt.
+
+    Returns:
+        bool: False if the lease was lost to another worker.
+    """
+    return _update_leased_job(job_id, worker_id, {
+        "status": JOB_STATUS_QUEUED, "run_at": run_at, "lease_expires_at": None,
+        "worker_id": None, "last_error": error})
+
+
+def fail_job(job_id: UUID, worker_id: str, error: str) -> bool:
+    """
+    Mark a leased job as finally failed.
+
+    Args:
+        job_id (UUID): The ID of the job.
+        worker_id (str): The ID of the worker holding the lease.
+        error (str): The error of the last attempt.
+
+    Returns:
+        bool: False if the lease was lost to another worker.
+    """
+    return _update_leased_job(job_id, worker_id, {
+        "status": JOB_STATUS_FAILED, "lease_expires_at": None, "finished_at": utc_now(),
+        "last_error": error})
+
+
+@retry_transaction
+def update_job_progress(job_id: UUID, progress: int) -> None:
+    """
+    Store the progress reported by a running job.
+
+    Args:
+        job_id (UUID): The ID of the job.
+        progress (int): The progress in percent.
+    """
+    session = get_session()
+    session.execute(update(JobModel).where(JobModel.id == job_id)
+                    .values(progress=progress).execution_options(synchronize_session=False))
+    session.commit()
+
+
+def get_job_by_id(job_id: UUID) -> JobModel | None:
+    """
+    Retrieve a job by ID.
+
+    Args:
+        job_id (UUID): The ID of the job.
+
+    Returns:
+        JobModel | None: The job if found, otherwise None.
+    """
+    session = get_session()
+    return session.get(JobModel, job_id)
@@ -1,13 +1,38 @@
 """ Org CRUD """
 
+from datetime import datetime
+from typing import Iterator
 from uuid import UUID
+from sqlalchemy import Select, select, func, update, table, column, literal_column
+from sqlalchemy.orm import Session
 from db.base import get_session
+from db.cache import organization_cache
+from db.retry import retry_transaction
+from db.crud.crud_analytics import bump_member_rollup
 from db.models.organization import OrganizationModel, OrganizationMemberModel, OrganizationTeamModel
+from db.models.role import RoleModel
+from db.models.user import UserModel
+from db.read_models import OrganizationRow, OrganizationMemberRow
+from utils.helpers import utc_now
+
+# Columns selected into OrganizationRow, in field order
+ORGANIZATION_ROW_COLUMNS = (OrganizationModel.id, OrganizationModel.name,
+                            OrganizationModel.description, OrganizationModel.owner_id,
+                            OrganizationModel.created_at)
+
+# bm25 weights of name and description in organizations_fts
+ORGANIZATION_SEARCH_WEIGHTS = (10.0, 1.0)
+
+# Columns selected into OrganizationMemberRow, in field order
+ORGANIZATION_MEMBER_ROW_COLUMNS = (OrganizationMemberModel.user_id, UserModel.email,
+                                   UserModel.first_name, UserModel.last_name,
+                                   OrganizationMemberModel.role_id, RoleModel.name,
+                                   OrganizationMemberModel.joined_at)
 
 
 def get_organizations_by_member_id(user_id: UUID, page: int, size: int,
                                    sort_by: str = "joined_at"
-                                   ) -> tuple[list[OrganizationModel], int, int]:
+                                   ) -> tuple[list[OrganizationRow], int, int]:
     """
     Retrieve organizations associated with a specific member ID.
 
@@ -19,22 +44,52 @@ def get_organizations_by_member_id(user_id: UUID, page: int, size: int,
 
     Returns:
         tuple: A tuple containing:
-            - list[OrganizationModel]: List of organizations.
+            - list[OrganizationRow]: List of organizations.
             - int: Total number of organizations.
             - int: Total number of pages.
     """
     session = get_session()
-    items = (session.query(OrganizationModel)
-            .join(
-        OrganizationMemberModel, OrganizationMemberModel.organization_id == OrganizationModel.id)
-             .filter(OrganizationMemberModel.user_id == user_id)
-             )
-    sorted_items = items.order_by(getattr(OrganizationMemberModel, sort_by))
-    total = sorted_items.count()
-    response_items = sorted_items.offset((page - 1) * size).limit(size).all()
+    total = session.scalar(select(func.count()).select_from(OrganizationMemberModel)
+                           .where(OrganizationMemberModel.user_id == user_id))
+    statement = (select(*ORGANIZATION_ROW_COLUMNS)
+                 .join(OrganizationMemberModel,
+                       OrganizationMemberModel.organization_id == OrganizationModel.id)
+                 .where(OrganizationMemberModel.user_id == user_id)
+                 .order_by(getattr(OrganizationMemberModel, sort_by))
+                 .offset((page - 1) * size).limit(size))
+    response_items = [OrganizationRow(*row) for row in session.execute(statement)]
     pages = (total + size - 1) // size
     return response_items, total, pages
 
+def bump_organization_member_version(session: Session, organization_id: UUID) -> None:
+    """
+    Increment the membership version of an organization within the caller's transaction.
+
+    Args:
+        session (Session): The session of the membership change.
+        organization_id (UUID): The ID of the organization.
+    """
+    session.execute(update(OrganizationModel)
+                    .where(OrganizationModel.id == organization_id)
+                    .values(member_version=OrganizationModel.member_version + 1))
+
+def get_organization_version(organization_id: UUID) -> tuple[datetime, int] | None:
+    """
+    Retrieve the columns identifying the current version of an organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        tuple[datetime, int] | None: The updated_at and member_version if found, otherwise None.
+    """
+    session = get_session()
+    row = session.execute(select(OrganizationModel.updated_at, OrganizationModel.member_version)
+                          .where(OrganizationModel.id == organization_id)).first()
+    if not row:
+        return None
+    return row.updated_at, row.member_version
+
 def get_organization_by_name(org_name: str):
     """
     Retrieve an organization by its name.
@@ -51,7 +106,8 @@ def get_organization_by_name(org_name: str):
         return None
     return organization
 
-def get_organization_by_id(organization_id: UUID):
+@organization_cache.cached
+def get_organization_by_id(organization_id: UUID) -> OrganizationRow | None:
     """
     Retrieve an organization by its ID.
 
@@ -59,14 +115,16 @@ def get_organization_by_id(organization_id: UUID):
         organization_id (UUID): The ID of the organization.
 
     Returns:
-        OrganizationModel | None: The organization if found, otherwise None.
+        OrganizationRow | None: The organization if found, otherwise None.
     """
     session = get_session()
-    organization = session.query(OrganizationModel).filter_by(id=organization_id).first()
-    if not organization:
+    row = session.execute(select(*ORGANIZATION_ROW_COLUMNS)
+                          .where(OrganizationModel.id == organization_id)).first()
+    if not row:
         return None
-    return organization
+    return OrganizationRow(*row)
 
+@retry_transaction
 def create_organization(org: dict) -> OrganizationModel:
     """
     Create a new organization.
@@ -84,28 +142,42 @@ def create_organization(org: dict) -> OrganizationModel:
     session.refresh(organization)
     return organization
 
-def update_organization(organization_id: UUID, org: dict) -> type[OrganizationModel] | None:
+@retry_transaction
+def update_organization(organization_id: UUID, org: dict,
+                        expected_version: tuple[datetime, int] | None = None
+                        ) -> type[OrganizationModel] | None:
     """
     Update an organization's details.
 
+    With an expected version the update is a single conditional ``UPDATE``, so of two
+    writers holding the same version only the first one changes the organization.
+
     Args:
         organization_id (UUID): The ID of the organization to update.
         org (dict): A dictionary containing updated organization details.
+        expected_version (tuple[datetime, int] | None): The updated_at and member_version
+            the organization must still have, None to update it unconditionally.
 
     Returns:
-        OrganizationModel | None: The updated organization if found, otherwise None.
+        OrganizationModel | None: The updated organization, None if it is not found or no
+            longer has the expected version.
     """
+    statement = update(OrganizationModel).where(OrganizationModel.id == organization_id)
+    if expected_version is not None:
+        updated_at, member_version = expected_version
+        statement = statement.where(OrganizationModel.updated_at == updated_at,
+                                    OrganizationModel.member_version == member_version)
     session = get_session()
-    organization = session.query(OrganizationModel).filter_by(id=organization_id).first()
-    if not organization:
+    result = session.execute(statement.values(**org, updated_at=utc_now())
+                             .execution_options(synchronize_session=False))
+    if result.rowcount != 1:
+        session.rollback()
         return None
-
-    for key, val in org.items():
-        setattr(organization, key, val)
     session.commit()
-    session.refresh(organization)
-    return organization
+    organization_cache.invalidate(organization_id)
+    return session.get(OrganizationModel, organization_id)
 
+@retry_transaction
 def delete_organizations_by_id(organization_id: UUID) -> bool:
     """
     Delete an organization by its ID.
@@ -123,8 +195,10 @@ def delete_organizations_by_id(organization_id: UUID) -> bool:
     session.query(OrganizationMemberModel).filter_by(organization_id=organization_id).delete()
     session.delete(organization)
     session.commit()
+    organization_cache.invalidate(organization_id)
     return True
 
+@retry_transaction
 def update_organization_member(organization_member_datar: dict) -> OrganizationMemberModel:
     """
     Update an organization member's details.
@@ -138,16 +212,18 @@ def update_organization_member(organization_member_datar: dict) -> OrganizationM
     organization_member = OrganizationMemberModel(**organization_member_datar)
     session = get_session()
     session.add(organization_member)
+    bump_organization_member_version(session, organization_member.organization_id)
+    bump_member_rollup(session, organization_member.organization_id,
+                       organization_member.role_id, joined=1)
     session.commit()
     session.refresh(organization_member)
     return organization_member
 
 def get_organization_members_by_organization_id(organization_id: UUID,
                                                 page: int, size: int, sort_by: str
-                                                ) -> tuple[list[
-                                                    type[OrganizationMemberModel]], int, int]:
+                                                ) -> tuple[list[OrganizationMemberRow], int, int]:
     """
-    Retrieve members of an organization by id.
+    Retrieve members of an organization by id, joined with their user and role.
 
     Args:
         organization_id (UUID): The ID of the organization.
@@ -157,18 +233,126 @@ def get_organization_members_by_organization_id(organization_id: UUID,
 
     Returns:
         tuple: A tuple containing:
-            - list[OrganizationMemberModel]: List of organizations.
-            - int: Total number of organizations.
+            - list[OrganizationMemberRow]: List of organization members.
+            - int: Total number of members.
             - int: Total number of pages.
     """
     session = get_session()
-    items = session.query(OrganizationMemberModel).filter_by(organization_id=organization_id)
-    sorted_members = items.order_by(getattr(OrganizationMemberModel, sort_by))
-    total = sorted_members.count()
-    response_items = sorted_members.offset((page - 1) * size).limit(size).all()
+    total = get_organization_member_count_by_organization_id(org_id=organization_id)
+    statement = (select(*ORGANIZATION_MEMBER_ROW_COLUMNS)
+                 .join(UserModel, UserModel.id == OrganizationMemberModel.user_id)
+                 .join(RoleModel, RoleModel.id == OrganizationMemberModel.role_id)
+                 .where(OrganizationMemberModel.organization_id == organization_id)
+                 .order_by(getattr(OrganizationMemberModel, sort_by))
+                 .offset((page - 1) * size).limit(size))
+    response_items = [OrganizationMemberRow(*row) for row in session.execute(statement)]
     pages = (total + size - 1) // size
     return response_items, total, pages
 
+def iter_organization_members(organization_id: UUID, batch_size: int = 1000
+                              ) -> Iterator[OrganizationMemberRow]:
+    """
+    Stream all members of an organization, joined with their user and role.
+
+    Rows are fetched from a server-side cursor in batches, so memory use does not
+    depend on the size of the organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        batch_size (int): The number of rows fetched from the cursor at a time.
+
+    Yields:
+        OrganizationMemberRow: The members ordered by joined_at.
+    """
+    session = get_session()
+    statement = (select(*ORGANIZATION_MEMBER_ROW_COLUMNS)
+                 .join(UserModel, UserModel.id == OrganizationMemberModel.user_id)
+                 .join(RoleModel, RoleModel.id == OrganizationMemberModel.role_id)
+                 .where(OrganizationMemberModel.organization_id == organization_id)
+                 .order_by(OrganizationMemberModel.joined_at)
+                 .execution_options(yield_per=batch_size))
+    try:
+        for row in session.execute(statement):
+            yield OrganizationMemberRow(*row)
+    finally:
+        session.close()
+
+def get_organization_members_after(organization_id: UUID, after_user_id: UUID | None,
+                                   limit: int) -> list[OrganizationMemberRow]:
+    """
+    Retrieve the next page of members of an organization by keyset pagination.
+
+    Pages are ordered by user ID and start after the last user of the previous page, so
+    every page is a short independent read regardless of how deep the export is.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        after_user_id (UUID | None): The last user ID of the previous page, None for the first.
+        limit (int): The maximum number of members to return.
+
+    Returns:
+        list[OrganizationMemberRow]: The members ordered by user ID.
+    """
+    statement = (select(*ORGANIZATION_MEMBER_ROW_COLUMNS)
+                 .join(UserModel, UserModel.id == OrganizationMemberModel.user_id)
+                 .join(RoleModel, RoleModel.id == OrganizationMemberModel.role_id)
+                 .where(OrganizationMemberModel.organization_id == organization_id)
+                 .order_by(OrganizationMemberModel.user_id)
+                 .limit(limit))
+    if after_user_id is not None:
+        statement = statement.where(OrganizationMemberModel.user_id > after_user_id)
+    session = get_session()
+    try:
+        return [OrganizationMemberRow(*row) for row in session.execute(statement)]
+    finally:
+        session.close()
+
+def select_member_organization_ids(user_id: UUID, organization_id: UUID | None = None
+                                  ) -> Select:
+    """
+    Build the select of the IDs of the organizations a user is a member of.
+
+    Args:
+        user_id (UUID): The ID of the user.
+        organization_id (UUID | None): Only select this organization if given.
+
+    Returns:
+        Select: The statement, usable as IN subquery.
+    """
+    statement = (select(OrganizationMemberModel.organization_id)
+                 .where(OrganizationMemberModel.user_id == user_id))
+    if organization_id is not None:
+        statement = statement.where(OrganizationMemberModel.organization_id == organization_id)
+    return statement
+
+
+def search_organizations(match: str, organization_ids: Select, limit: int
+                         ) -> list[OrganizationRow]:
+    """
+    Full-text search organizations, best matches first.
+
+    Args:
+        match (str): The FTS5 query.
+        organization_ids (Select): The IDs of the organizations to search in.
+        limit (int): The maximum number of organizations.
+
+    Returns:
+        list[OrganizationRow]: The matching organizations.
+    """
+    index = table("organizations_fts", column("rowid"))
+    statement = (select(*ORGANIZATION_ROW_COLUMNS)
+                 .select_from(index)
+                 .join(OrganizationModel, literal_column("organizations.rowid") == index.c.rowid)
+                 .where(literal_column("organizations_fts").op("MATCH")(match),
+                        OrganizationModel.id.in_(organization_ids))
+                 .order_by(func.bm25(literal_column("organizations_fts"),
+                                     *ORGANIZATION_SEARCH_WEIGHTS))
+                 .limit(limit))
+    session = get_session()
+    rows = session.execute(statement).all()
+    return [OrganizationRow(*row) for row in rows]
+
+
 def get_organization_member_by_organization_user_id(org_id: UUID, user_id: UUID
                                                     ) -> type[OrganizationMemberModel] | None:
     """
@@ -203,6 +387,7 @@ def get_organization_member_count_by_organization_id(org_id: UUID) -> int:
     count = session.query(OrganizationMemberModel).filter_by(organization_id=org_id).count()
     return count
 
+@retry_transaction
 def update_organization_member_role(org_id: UUID, user_id: UUID, role_id: UUID
                                     ) -> type[OrganizationMemberModel] | None:
     """
@@ -221,11 +406,16 @@ def update_organization_member_role(org_id: UUID, user_id: UUID, role_id: UUID
         organization_id=org_id, user_id=user_id).first()
     if not member:
         return None
+    if member.role_id != role_id:
+        bump_member_rollup(session, org_id, member.role_id, left=1)
+        bump_member_rollup(session, org_id, role_id, joined=1)
     setattr(member, "role_id", role_id)
+    bump_organization_member_version(session, org_id)
     session.commit()
     session.refresh(member)
     return member
 
+@retry_transaction
 def delete_organization_member_by_id(user_id: UUID, organization_id: UUID) -> bool:
     """
     Remove the user from organization by member ID.
@@ -244,10 +434,13 @@ def delete_organization_member_by_id(user_id: UUID, organization_id: UUID) -> bo
     if not organization_member:
         return False
     session.delete(organization_member)
+    bump_organization_member_version(session, organization_id)
+    bump_member_rollup(session, organization_id, organization_member.role_id, left=1)
     session.commit()
     return True
 
 
+@retry_transaction
 def create_organization_team(organization_team: dict[str, UUID]) -> OrganizationTeamModel:
     """
     Create Organization team.
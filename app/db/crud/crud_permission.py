@@ -1,9 +1,14 @@
 """ Doc """
 from uuid import UUID
+from sqlalchemy import select
 from db.base import get_session
+from db.cache import permission_cache
+from db.retry import retry_transaction
 from db.models.permission import PermissionModel
+from db.read_models import PermissionRow
 
 
+@retry_transaction
 def create_permissions(permission_data: dict) -> PermissionModel:
     """
     Create a new permission in the database.
@@ -38,18 +43,21 @@ def get_permission_by_name(permission_name: str) -> type[PermissionModel] | None
         return None
     return permission
 
-def get_permission_by_id(permission_id: UUID) -> type[PermissionModel] | None:
+@permission_cache.cached
+def get_permission_by_id(permission_id: UUID) -> PermissionRow | None:
     """
-    Retrieve a permission by its name.
+    Retrieve a permission by its ID.
 
     Args:
-        permission_id (str): The name of the permission to retrieve.
+        permission_id (UUID): The ID of the permission to retrieve.
 
     Returns:
-        type[PermissionModel] | None: The permission if found, otherwise None.
+        PermissionRow | None: The permission if found, otherwise None.
     """
     session = get_session()
-    permission = session.query(PermissionModel).filter_by(id=permission_id).first()
-    if not permission:
+    row = session.execute(select(PermissionModel.id, PermissionModel.name,
+                                 PermissionModel.description)
+                          .where(PermissionModel.id == permission_id)).first()
+    if not row:
         return None
-    return permission
+    return PermissionRow(*row)
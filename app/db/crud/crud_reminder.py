@@ -0,0 +1,150 @@
+""" Reminder Crud """
+
+from datetime import datetime, timezone
+from uuid import UUID
+import orjson
+from sqlalchemy import select, update, or_, and_
+from db.base import get_session
+from db.retry import retry_transaction
+from db.models.notification import NotificationModel
+from db.models.reminder import ReminderModel, REMINDER_STATUS_PENDING, REMINDER_STATUS_LEASED, \
+    REMINDER_STATUS_SENT
+from db.read_models import ReminderRow
+from utils.helpers import utc_now
+
+# pylint: disable=no-member
+
+REMINDER_NOTIFICATION_TYPE = "reminder"
+
+
+def _as_utc(value: datetime) -> datetime:
+    """
+    Attach UTC to the naive datetimes returned by SQLite.
+
+    Args:
+        value (datetime): The stored datetime.
+
+    Returns:
+        datetime: The aware UTC datetime.
+    """
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+@retry_transaction
+def create_reminder(reminder_data: dict) -> ReminderModel:
+    """
+    Create a new reminder in the database.
+
+    Args:
+        reminder_data (dict): The reminder details.
+
+    Returns:
+        ReminderModel: The newly created reminder.
+    """
+    reminder = ReminderModel(**reminder_data)
+    session = get_session()
+    session.add(reminder)
+    session.commit()
+    session.refresh(reminder)
+    return reminder
+
+
+@retry_transaction
+def lease_due_reminders(worker_id: str, due_before: datetime, lease_expires_at: datetime,
+                        limit: int) -> list[ReminderRow]:
+    """
+    Atomically lease the pending reminders due before a time.
+
+    Reminders leased by a scheduler whose lease expired (the process died) are leased
+    again. The ``status, due_at`` index keeps this a range scan over the window only.
+
+    Args:
+        worker_id (str): The ID of the leasing scheduler.
+        due_before (datetime): The end of the look-ahead window.
+        lease_expires_at (datetime): The end of the lease.
+        limit (int): The maximum number of reminders to lease.
+
+    Returns:
+        list[ReminderRow]: The leased reminders.
+    """
+    now = utc_now()
+    due = (
+        select(ReminderModel.id)
+        .where(ReminderModel.due_at <= due_before,
+               or_(ReminderModel.status == REMINDER_STATUS_PENDING,
+                   and_(ReminderModel.status == REMINDER_STATUS_LEASED,
+                        ReminderModel.lease_expires_at < now)))
+        .order_by(ReminderModel.due_at)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    statement = (
+        update(ReminderModel)
+        .where(ReminderModel.id.in_(due))
+        .values(status=REMINDER_STATUS_LEASED, worker_id=worker_id,
+                lease_expires_at=lease_expires_at)
+        .returning(ReminderModel.id, ReminderModel.due_at)
+        .execution_options(synchronize_session=False)
+    )
+    session = get_session()
+    rows = session.execute(statement).all()
+    session.commit()
+    return [ReminderRow(id=row.id, due_at=_as_utc(row.due_at)) for row in rows]
+
+
+@retry_transaction
+def fire_reminder(reminder_id: UUID, worker_id: str) -> NotificationModel | None:
+    """
+    Mark a leased reminder as sent and create its notification in one transaction.
+
+    Args:
+        reminder_id (UUID): The ID of the reminder.
+        worker_id (str): The ID of the scheduler holding the lease.
+
+    Returns:
+        NotificationModel | None: The notification, None if the lease was lost and another
+            scheduler fires the reminder.
+    """
+    session = get_session()
+    result = session.execute(
+        update(ReminderModel)
+        .where(ReminderModel.id == reminder_id, ReminderModel.worker_id == worker_id,
+               ReminderModel.status == REMINDER_STATUS_LEASED)
+        .values(status=REMINDER_STATUS_SENT, sent_at=utc_now(), lease_expires_at=None)
+        .execution_options(synchronize_session=False))
+    if result.rowcount != 1:
+        session.rollback()
+        return None
+    reminder = session.get(ReminderModel, reminder_id)
+    notification = NotificationModel(
+        user_id=reminder.user_id, organization_id=reminder.organization_id,
+        type=REMINDER_NOTIFICATION_TYPE, message=reminder.message,
+        payload=orjson.dumps({"reminder_id": reminder.id, "subject_type": reminder.subject_type,
+                              "subject_id": reminder.subject_id,
+                              "due_at": _as_utc(reminder.due_at)}).decode())
+    session.add(notification)
+    session.commit()
+    session.refresh(notification)
+    return notification
+
+
+@retry_transaction
+def release_reminders(worker_id: str) -> int:
+    """
+    Return the unfired reminders leased by a scheduler to the pending state.
+
+    Args:
+        worker_id (str): The ID of the scheduler.
+
+    Returns:
+        int: The number of released reminders.
+    """
+    session = get_session()
+    result = session.execute(
+        update(ReminderModel)
+        .where(ReminderModel.worker_id == worker_id,
+               ReminderModel.status == REMINDER_STATUS_LEASED)
+        .values(status=REMINDER_STATUS_PENDING, worker_id=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False))
+    session.commit()
+    return result.rowcount
@@ -1,11 +1,49 @@
 """ Team Crud """
 
+from datetime import datetime
+from typing import Iterator
 from uuid import UUID
+from sqlalchemy import Select, select, update, func, table, column, literal_column
+from sqlalchemy.orm import Session
 from db.base import get_session
+from db.cache import team_cache
+from db.retry import retry_transaction
+from db.crud.crud_analytics import bump_team_rollup
 from db.models import OrganizationTeamModel
 from db.models.team import TeamModel, TeamMemberModel
+from db.read_models import TeamRow
+from utils.helpers import utc_now
 
 
+# bm25 weights of name and description in teams_fts
+TEAM_SEARCH_WEIGHTS = (10.0, 1.0)
+
+
+def _select_team_rows(organization_id: UUID | Select | None) -> Select:
+    """
+    Build the select of the TeamRow columns of an organization's teams.
+
+    Args:
+        organization_id (UUID | Select | None): ID of the organization, a select of the IDs
+            of several organizations, or None for the teams of all organizations.
+
+    Returns:
+        Select: The statement, without ordering.
+    """
+    member_count = (select(func.count()).select_from(TeamMemberModel)
+                    .where(TeamMemberModel.team_id == TeamModel.id)
+                    .correlate(TeamModel).scalar_subquery())
+    statement = select(TeamModel.id, TeamModel.name, TeamModel.description,
+                       TeamModel.organization_id, TeamModel.owner_id, TeamModel.created_at,
+                       TeamModel.updated_at, member_count)
+    if organization_id is None:
+        return statement
+    return statement.where(TeamModel.organization_id.in_(organization_id)
+                           if isinstance(organization_id, Select)
+                           else TeamModel.organization_id == organization_id)
+
+
+@retry_transaction
 def create_team(team_data: dict[str, UUID]) -> TeamModel:
     """
     Create a new team in the database.
@@ -19,11 +57,43 @@ def create_team(team_data: dict[str, UUID]) -> TeamModel:
     team = TeamModel(**team_data)
     session = get_session()
     session.add(team)
+    bump_team_rollup(session, team.organization_id, created=1)
     session.commit()
     session.refresh(team)
     return team
 
 
+def bump_team_member_version(session: Session, team_id: UUID) -> None:
+    """
+    Increment the membership version of a team within the caller's transaction.
+
+    Args:
+        session (Session): The session of the membership change.
+        team_id (UUID): The ID of the team.
+    """
+    session.execute(update(TeamModel).where(TeamModel.id == team_id)
+                    .values(member_version=TeamModel.member_version + 1))
+
+
+def get_team_version(team_id: UUID) -> tuple[datetime, int] | None:
+    """
+    Retrieve the columns identifying the current version of a team.
+
+    Args:
+        team_id (UUID): The ID of the team.
+
+    Returns:
+        tuple[datetime, int] | None: The updated_at and member_version if found, otherwise None.
+    """
+    session = get_session()
+    row = session.execute(select(TeamModel.updated_at, TeamModel.member_version)
+                          .where(TeamModel.id == team_id)).first()
+    if not row:
+        return None
+    return row.updated_at, row.member_version
+
+
+@retry_transaction
 def create_team_member(team_member: dict[str, UUID]) -> TeamMemberModel:
     """
     Create a new team in the database.
@@ -37,11 +107,14 @@ def create_team_member(team_member: dict[str, UUID]) -> TeamMemberModel:
     team_member = TeamMemberModel(**team_member)
     session = get_session()
     session.add(team_member)
+    bump_team_member_version(session, team_member.team_id)
     session.commit()
+    team_cache.invalidate(team_member.team_id)
     session.refresh(team_member)
     return team_member
 
 
+@retry_transaction
 def update_member_role(team_id:UUID, user_id: UUID, role_id: UUID) -> type[TeamMemberModel] | None:
     """
     Update the role of the member in the team.
@@ -60,12 +133,15 @@ def update_member_role(team_id:UUID, user_id: UUID, role_id: UUID) -> type[TeamM
     if not team_member:
         return None
     setattr(team_member, "role_id", role_id)
+    bump_team_member_version(session, team_id)
     session.commit()
+    team_cache.invalidate(team_id)
     session.refresh(team_member)
     return team_member
 
 
-def get_team_by_id(team_id: UUID) -> TeamModel | None:
+@team_cache.cached
+def get_team_by_id(team_id: UUID) -> TeamRow | None:
     """
     Retrieve the team by team ID from DB.
 
@@ -73,13 +149,13 @@ def get_team_by_id(team_id: UUID) -> TeamModel | None:
         team_id (UUID): The ID of team to retrieve the team from db.
 
     Returns:
-        TeamModel | None: The TeamModel instance if found, else None.
+        TeamRow | None: The team with its member count if found, else None.
     """
     session = get_session()
-    team = session.query(TeamModel).get(team_id)
-    if not team:
+    row = session.execute(_select_team_rows(None).where(TeamModel.id == team_id)).first()
+    if not row:
         return None
-    return team
+    return TeamRow(*row)
 
 
 def get_team_by_name(team_name: str, org_id: UUID) -> type[TeamModel] | None:
@@ -141,28 +217,104 @@ def get_organization_teams(organization_id: UUID, page: int, size: int,
     return sorted_teams, total, pages
 
 
-def update_team(team_id: UUID, team_data: dict) -> TeamModel | None:
+def iter_organization_teams(organization_id: UUID, batch_size: int = 1000) -> Iterator[TeamRow]:
+    """
+    Stream all teams of an organization with their member counts.
+
+    Rows are fetched from a server-side cursor in batches, so memory use does not
+    depend on the number of teams.
+
+    Args:
+        organization_id (UUID): ID of the organization.
+        batch_size (int): The number of rows fetched from the cursor at a time.
+
+    Yields:
+        TeamRow: The teams ordered by name.
+    """
+    session = get_session()
+    statement = (_select_team_rows(organization_id)
+                 .order_by(TeamModel.name)
+                 .execution_options(yield_per=batch_size))
+    try:
+        for row in session.execute(statement):
+            yield TeamRow(*row)
+    finally:
+        session.close()
+
+
+def get_organization_teams_after(organization_id: UUID, after_team_id: UUID | None,
+                                 limit: int) -> list[TeamRow]:
+    """
+    Retrieve the next page of teams of an organization by keyset pagination.
+
+    Args:
+        organization_id (UUID): ID of the organization.
+        after_team_id (UUID | None): The last team ID of the previous page, None for the first.
+        limit (int): The maximum number of teams to return.
+
+    Returns:
+        list[TeamRow]: The teams ordered by ID.
+    """
+    statement = _select_team_rows(organization_id).order_by(TeamModel.id).limit(limit)
+    if after_team_id is not None:
+        statement = statement.where(TeamModel.id > after_team_id)
+    session = get_session()
+    try:
+        return [TeamRow(*row) for row in session.execute(statement)]
+    finally:
+        session.close()
+
+
+def get_team_count_by_organization_id(organization_id: UUID) -> int:
+    """
+    Count the teams of an organization.
+
+    Args:
+        organization_id (UUID): ID of the organization.
+
+    Returns:
+        int: The number of teams.
+    """
+    session = get_session()
+    return session.query(TeamModel).filter_by(organization_id=organization_id).count()
+
+
+@retry_transaction
+def update_team(team_id: UUID, team_data: dict,
+                expected_version: tuple[datetime, int] | None = None) -> TeamModel | None:
     """
     Update the team in database.
 
+    With an expected version the update is a single conditional ``UPDATE``, so of two
+    writers holding the same version only the first one changes the team.
+
     Args:
         team_id (UUID): The ID of the team to be updated.
         team_data (UpdateTeam): The new details of the team.
+        expected_version (tuple[datetime, int] | None): The updated_at and member_version
+            the team must still have, None to update it unconditionally.
 
     Returns:
-        TeamModel | None: TeamModel if updated successful, else None.
+        TeamModel | None: TeamModel if updated successful, None if the team is not found or
+            no longer has the expected version.
     """
+    statement = update(TeamModel).where(TeamModel.id == team_id)
+    if expected_version is not None:
+        updated_at, member_version = expected_version
+        statement = statement.where(TeamModel.updated_at == updated_at,
+                                    TeamModel.member_version == member_version)
     session = get_session()
-    team = session.query(TeamModel).get(team_id)
-    if not team:
+    updated = session.execute(statement.values(**team_data, updated_at=utc_now())
+                              .execution_options(synchronize_session=False)).rowcount
+    if not updated:
+        session.rollback()
         return None
-    for key, val in team_data.items():
-        setattr(team, key, val)
     session.commit()
-    session.refresh(team)
-    return team
+    team_cache.invalidate(team_id)
+    return session.get(TeamModel, team_id)
 
 
+@retry_transaction
 def delete_team(team_id: UUID) -> bool:
     """
     Delete a team from the database.
@@ -178,7 +330,9 @@ def delete_team(team_id: UUID) -> bool:
     if not team:
         return False
     session.delete(team)
+    bump_team_rollup(session, team.organization_id, deleted=1)
     session.commit()
+    team_cache.invalidate(team_id)
     return True
 
 def get_team_member_by_team_user_id(team_id: UUID, user_id: UUID) -> type[TeamMemberModel] | None:
@@ -198,3 +352,26 @@ def get_team_member_by_team_user_id(team_id: UUID, user_id: UUID) -> type[TeamMe
     if not team_member:
         return None
     return team_member
+
+
+def search_teams(match: str, organization_ids: Select, limit: int) -> list[TeamRow]:
+    """
+    Full-text search the teams of organizations, best matches first.
+
+    Args:
+        match (str): The FTS5 query.
+        organization_ids (Select): The IDs of the organizations to search in.
+        limit (int): The maximum number of teams.
+
+    Returns:
+        list[TeamRow]: The matching teams.
+    """
+    index = table("teams_fts", column("rowid"))
+    statement = (_select_team_rows(organization_ids)
+                 .join(index, index.c.rowid == literal_column("teams.rowid"))
+                 .where(literal_column("teams_fts").op("MATCH")(match))
+                 .order_by(func.bm25(literal_column("teams_fts"), *TEAM_SEARCH_WEIGHTS))
+                 .limit(limit))
+    session = get_session()
+    rows = session.execute(statement).all()
+    return [TeamRow(*row) for row in rows]
@@ -1,13 +1,27 @@
 """ User model """
 from datetime import datetime, timezone
 from uuid import UUID
+from sqlalchemy import Select, select, func, table, column, literal_column
 from core.logging_conf import Logging
 from db.base import get_session
+from db.cache import user_cache
+from db.retry import retry_transaction
+from db.crud.crud_analytics import bump_login_rollup
+from db.models.organization import OrganizationMemberModel
 from db.models.user import UserModel
+from db.read_models import UserRow
 
 log = Logging(__name__).log()
 
+# Columns selected into UserRow, in field order
+USER_ROW_COLUMNS = (UserModel.id, UserModel.username, UserModel.email, UserModel.first_name,
+                    UserModel.last_name, UserModel.is_active, UserModel.created_at)
 
+# bm25 weights of first_name, last_name, username and email in users_fts
+USER_SEARCH_WEIGHTS = (5.0, 5.0, 10.0, 2.0)
+
+
+@retry_transaction
 def create_user(user_data: dict) -> UserModel:
     """
     Create a new user in the database.
@@ -60,23 +74,88 @@ def get_user_by_email(email: str) -> type[UserModel] | None:
     return user
 
 
-def get_user_by_id(user_id: UUID) -> type[UserModel] | None:
+@user_cache.cached
+def get_user_by_id(user_id: UUID) -> UserRow | None:
     """
-    Retrieve a user by their unique ID.
+    Retrieve the profile columns of a user by their unique ID.
 
     Args:
         user_id (UUID): The unique identifier of the user.
 
     Returns:
-        UserModel | None: The user if found, otherwise None.
+        UserRow | None: The user if found, otherwise None.
     """
     session = get_session()
-    user = session.query(UserModel).get(user_id)
-    if not user:
+    row = session.execute(select(*USER_ROW_COLUMNS).where(UserModel.id == user_id)).first()
+    if not row:
         return None
-    return user
+    return UserRow(*row)
+
+
+def get_users_by_ids(user_ids: list[UUID]) -> list[UserRow]:
+    """
+    Retrieve the profile columns of several users in one query.
+
+    Args:
+        user_ids (list[UUID]): The unique identifiers of the users.
+
+    Returns:
+        list[UserRow]: The users found, in no particular order.
+    """
+    if not user_ids:
+        return []
+    session = get_session()
+    rows = session.execute(select(*USER_ROW_COLUMNS).where(UserModel.id.in_(set(user_ids)))).all()
+    return [UserRow(*row) for row in rows]
+
+
+def get_organization_users(organization_id: UUID) -> list[UserRow]:
+    """
+    Retrieve the active members of an organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        list[UserRow]: The members, in no particular order.
+    """
+    session = get_session()
+    rows = session.execute(
+        select(*USER_ROW_COLUMNS)
+        .join(OrganizationMemberModel, OrganizationMemberModel.user_id == UserModel.id)
+        .where(OrganizationMemberModel.organization_id == organization_id,
+               UserModel.is_active.is_(True))).all()
+    return [UserRow(*row) for row in rows]
+
+
+def search_users(match: str, organization_ids: Select, limit: int) -> list[UserRow]:
+    """
+    Full-text search the active members of organizations, best matches first.
+
+    Args:
+        match (str): The FTS5 query.
+        organization_ids (Select): The IDs of the organizations to search in.
+        limit (int): The maximum number of users.
+
+    Returns:
+        list[UserRow]: The matching users.
+    """
+    index = table("users_fts", column("rowid"))
+    members = (select(OrganizationMemberModel.user_id)
+               .where(OrganizationMemberModel.organization_id.in_(organization_ids)))
+    statement = (select(*USER_ROW_COLUMNS)
+                 .select_from(index)
+                 .join(UserModel, literal_column("users.rowid") == index.c.rowid)
+                 .where(literal_column("users_fts").op("MATCH")(match),
+                        UserModel.id.in_(members), UserModel.is_active.is_(True))
+                 .order_by(func.bm25(literal_column("users_fts"), *USER_SEARCH_WEIGHTS))
+                 .limit(limit))
+    session = get_session()
+    rows = session.execute(statement).all()
+    return [UserRow(*row) for row in rows]
 
 
+@retry_transaction
 def update_user(user_id: UUID, user_data: dict) -> type[UserModel] | None:
     """
     Update a user's details.
@@ -96,10 +175,12 @@ def update_user(user_id: UUID, user_data: dict) -> type[UserModel] | None:
         setattr(user, key, value)
     user.updated_at = datetime.now(timezone.utc)
     session.commit()
+    user_cache.invalidate(user_id)
     session.refresh(user)
     return user
 
 
+@retry_transaction
 def update_user_password(hashed_password_update,
                          user_id: UUID | None = None, username: str | None = None
                          ) -> type[UserModel] | None:
@@ -127,6 +208,7 @@ def update_user_password(hashed_password_update,
     return user
 
 
+@retry_transaction
 def update_login_time(user_id: UUID):
     """
     Update the last login time of a user.
@@ -139,7 +221,10 @@ def update_login_time(user_id: UUID):
     """
     session = get_session()
     user = session.query(UserModel).filter_by(id=user_id).first()
-    user.last_login_at = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    first_today = user.last_login_at is None or user.last_login_at.date() != now.date()
+    user.last_login_at = now
+    bump_login_rollup(session, user_id, first_today)
     session.commit()
     session.refresh(user)
     return user
@@ -1,13 +1,25 @@
 """ CRUD User """
 
 from uuid import UUID
+from sqlalchemy import select, or_, tuple_, func
 from core.logging_conf import Logging
 from db.base import get_session
+from db.cache import role_cache
+from db.retry import retry_transaction
+from db.models.permission import PermissionModel
 from db.models.role import RoleModel, RolePermissionModel
+from db.models.team import TeamModel
+from db.types import BinaryUUID
+from db.read_models import RoleRow, RolePermissionRow
 
 log = Logging(__name__).log()
 
+# Columns selected into RoleRow, in field order
+ROLE_ROW_COLUMNS = (RoleModel.id, RoleModel.name, RoleModel.description, RoleModel.is_system_role,
+                    RoleModel.organization_id, RoleModel.team_id)
 
+
+@retry_transaction
 def create_role(role: dict) -> RoleModel:
     """
     Create a new role in the database.
@@ -92,7 +104,8 @@ def get_roles_by_org_id(org_id: UUID) -> list[type[RoleModel]] | None:
     return roles
 
 
-def get_role_by_id(role_id: UUID) -> RoleModel | None:
+@role_cache.cached
+def get_role_by_id(role_id: UUID) -> RoleRow | None:
     """
     Retrieve a role by its id.
 
@@ -100,32 +113,34 @@ def get_role_by_id(role_id: UUID) -> RoleModel | None:
         role_id (UUID): The id of the role to retrieve.
 
     Returns:
-        RoleModel | None: The role if found, otherwise None.
+        RoleRow | None: The role if found, otherwise None.
     """
     session = get_session()
-    role = session.query(RoleModel).get(role_id)
-    if not role:
+    row = session.execute(select(*ROLE_ROW_COLUMNS).where(RoleModel.id == role_id)).first()
+    if not row:
         return None
-    return role
+    return RoleRow(*row)
 
 
-def get_all_organization_roles(organization_id: UUID) -> list[type[RoleModel]] | None:
+def get_all_organization_roles(organization_id: UUID) -> list[RoleRow] | None:
     """
-    Retrieve a role by its id.
+    Retrieve all the roles of an organization.
 
     Args:
         organization_id (UUID): The ID of the organization.
 
     Returns:
-        list[RoleModel] | None: The roles if found, otherwise None.
+        list[RoleRow] | None: The roles if found, otherwise None.
     """
     session = get_session()
-    roles = session.query(RoleModel).filter_by(organization_id=organization_id).all()
-    if not roles:
+    rows = session.execute(
+        select(*ROLE_ROW_COLUMNS).where(RoleModel.organization_id == organization_id)).all()
+    if not rows:
         return None
-    return roles
+    return [RoleRow(*row) for row in rows]
 
 
+@retry_transaction
 def update_role_permission(role_id: UUID, permission_id: UUID) -> RolePermissionModel:
     """
     Add a permission to a role.
@@ -179,3 +194,105 @@ def get_permission_ids_for_role(role_id: UUID) -> list[UUID] | None:
     if not results:
         return None
     return [row.permission_id for row in results]
+
+
+def _organization_role_filter(organization_id: UUID):
+    """
+    Build the filter matching the roles of an organization and of its teams.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        ColumnElement: The filter expression.
+    """
+    team_ids = select(TeamModel.id).where(TeamModel.organization_id == organization_id)
+    return or_(RoleModel.organization_id == organization_id, RoleModel.team_id.in_(team_ids))
+
+
+def get_role_count_by_organization_id(organization_id: UUID) -> int:
+    """
+    Count the roles of an organization and of its teams.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        int: The number of roles.
+    """
+    session = get_session()
+    return session.scalar(select(func.count()).select_from(RoleModel)
+                          .where(_organization_role_filter(organization_id)))
+
+
+def get_organization_roles_after(organization_id: UUID, after_role_id: UUID | None,
+                                 limit: int) -> list[RoleRow]:
+    """
+    Retrieve the next page of roles of an organization and its teams by keyset pagination.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        after_role_id (UUID | None): The last role ID of the previous page, None for the first.
+        limit (int): The maximum number of roles to return.
+
+    Returns:
+        list[RoleRow]: The roles ordered by ID.
+    """
+    statement = (select(*ROLE_ROW_COLUMNS).where(_organization_role_filter(organization_id))
+                 .order_by(RoleModel.id).limit(limit))
+    if after_role_id is not None:
+        statement = statement.where(RoleModel.id > after_role_id)
+    session = get_session()
+    try:
+        return [RoleRow(*row) for row in session.execute(statement)]
+    finally:
+        session.close()
+
+
+def get_role_permission_count_by_organization_id(organization_id: UUID) -> int:
+    """
+    Count the permissions granted to the roles of an organization and of its teams.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        int: The number of role permissions.
+    """
+    session = get_session()
+    return session.scalar(select(func.count()).select_from(RolePermissionModel)
+                          .join(RoleModel, RoleModel.id == RolePermissionModel.role_id)
+                          .where(_organization_role_filter(organization_id)))
+
+
+def get_organization_role_permissions_after(organization_id: UUID,
+                                            after_key: tuple[UUID, UUID] | None,
+                                            limit: int) -> list[RolePermissionRow]:
+    """
+    Retrieve the next page of role permissions of an organization by keyset pagination.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        after_key (tuple[UUID, UUID] | None): The last (role ID, permission ID) of the
+            previous page, None for the first.
+        limit (int): The maximum number of role permissions to return.
+
+    Returns:
+        list[RolePermissionRow]: The role permissions ordered by role and permission ID.
+    """
+    statement = (select(RolePermissionModel.role_id, RoleModel.name,
+                        RolePermissionModel.permission_id, PermissionModel.name)
+                 .join(RoleModel, RoleModel.id == RolePermissionModel.role_id)
+                 .join(PermissionModel, PermissionModel.id == RolePermissionModel.permission_id)
+                 .where(_organization_role_filter(organization_id))
+                 .order_by(RolePermissionModel.role_id, RolePermissionModel.permission_id)
+                 .limit(limit))
+    if after_key is not None:
+        statement = statement.where(
+            tuple_(RolePermissionModel.role_id, RolePermissionModel.permission_id)
+            > tuple_(*after_key, types=[BinaryUUID(), BinaryUUID()]))
+    session = get_session()
+    try:
+        return [RolePermissionRow(*row) for row in session.execute(statement)]
+    finally:
+        session.close()
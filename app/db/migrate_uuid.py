@@ -0,0 +1,155 @@
+""" Convert UUID columns of an existing SQLite database to 16-byte BLOBs.
+
+The application binds UUIDs as BLOBs, rows still holding text UUIDs are invisible to its
+lookups and joins, so the migration must run while the application is stopped. Every
+primary key is converted in one transaction together with the foreign keys referencing
+it, an interrupted run leaves each key and its references in the same storage and can be
+resumed.
+
+Usage:
+    PYTHONPATH=app python -m db.migrate_uuid [--batch-size 5000] [--vacuum]
+"""
+import argparse
+from uuid import UUID
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from core.logging_conf import Logging
+from db.base import Base, engine
+from db.models.search import SEARCH_INDEXES
+from db.types import BinaryUUID
+import db.models  # pylint: disable=unused-import  # registers all tables on Base.metadata
+
+
+log = Logging(__name__).log()
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def get_uuid_column_groups() -> list[list[tuple[str, str]]]:
+    """
+    Collect the columns declared with BinaryUUID, grouped by the key they hold.
+
+    Returns:
+        list[list[tuple[str, str]]]: The (table, column) names of every referenced
+            column, first, followed by the foreign keys referencing it, directly or
+            through another foreign key.
+    """
+    groups: dict[tuple[str, str], list[tuple[str, str]]] = {}
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if not isinstance(column.type, BinaryUUID):
+                continue
+            root = column
+            while root.foreign_keys:
+                root = next(iter(root.foreign_keys)).column
+            groups.setdefault((root.table.name, root.name), []).append((table.name, column.name))
+    return list(groups.values())
+
+
+def convert_column(connection: Connection, table_name: str, column_name: str,
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Rewrite the text UUIDs of a single column as 16-byte BLOBs in the caller's transaction.
+
+    Only rows still holding text are selected, in batches, so a rolled back conversion
+    can be run again.
+
+    Args:
+        connection (Connection): The connection of the transaction.
+        table_name (str): The table holding the column.
+        column_name (str): The UUID column to convert.
+        batch_size (int): The number of rows converted per statement.
+
+    Returns:
+        int: The number of converted rows.
+    """
+    select_batch = text(f'SELECT rowid, "{column_name}" FROM "{table_name}" '
+                        f'WHERE typeof("{column_name}") = \'text\' LIMIT :limit')
+    update_row = text(f'UPDATE "{table_name}" SET "{column_name}" = :value WHERE rowid = :row_id')
+    converted = 0
+    while True:
+        rows = connection.execute(select_batch, {"limit": batch_size}).all()
+        if not rows:
+            return converted
+        connection.execute(update_row, [
+            {"row_id": row_id, "value": UUID(value).bytes} for row_id, value in rows
+        ])
+        converted += len(rows)
+        log.info("%s.%s: converted %s rows", table_name, column_name, converted)
+
+
+def convert_column_group(db_engine: Engine, columns: list[tuple[str, str]],
+                         batch_size: int = DEFAULT_BATCH_SIZE) -> dict[str, int]:
+    """
+    Convert a key and the foreign keys referencing it in one transaction.
+
+    Args:
+        db_engine (Engine): The SQLite engine to migrate.
+        columns (list[tuple[str, str]]): The (table, column) names of the group.
+        batch_size (int): The number of rows converted per statement.
+
+    Returns:
+        dict[str, int]: The number of converted rows keyed by "table.column".
+    """
+    with db_engine.begin() as connection:
+        # The references are checked at the commit, once all columns are converted
+        connection.execute(text("PRAGMA defer_foreign_keys = ON"))
+        return {f"{table_name}.{column_name}":
+                convert_column(connection, table_name, column_name, batch_size=batch_size)
+                for table_name, column_name in columns}
+
+
+def migrate_uuid_storage(db_engine: Engine = engine, batch_size: int = DEFAULT_BATCH_SIZE,
+                         vacuum: bool = False) -> dict[str, int]:
+    """
+    Convert all UUID columns of the database to the compact BLOB storage in place.
+
+    Args:
+        db_engine (Engine): The engine of the database to migrate.
+        batch_size (int): The number of rows converted per statement.
+        vacuum (bool): Run VACUUM afterwards to return the freed pages to the filesystem,
+            and rebuild the search indexes, VACUUM may renumber the rowids they point to.
+
+    Returns:
+        dict[str, int]: The number of converted rows keyed by "table.column".
+    """
+    if db_engine.dialect.name != "sqlite":
+        log.info("UUID storage migration only applies to SQLite, skipping %s",
+                 db_engine.dialect.name)
+        return {}
+
+    # Tables added after the database was created hold no text UUIDs
+    existing = set(inspect(db_engine).get_table_names())
+    results = {}
+    for columns in get_uuid_column_groups():
+        columns = [(table_name, column_name) for table_name, column_name in columns
+                   if table_name in existing]
+        results.update(convert_column_group(db_engine, columns, batch_size=batch_size))
+
+    if vacuum:
+        log.info("Running VACUUM")
+        with db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM"))
+        with db_engine.begin() as connection:
+            for index in SEARCH_INDEXES:
+                if index in existing:
+                    log.info("Rebuilding %s", index)
+                    connection.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+    return results
+
+
+def main():
+    """ Command line entry point for the UUID storage migration. """
+    parser = argparse.ArgumentParser(description="Convert text UUID columns to 16-byte BLOBs, "
+                                                 "with the application stopped.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows converted per statement.")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Run VACUUM after the conversion to reclaim space.")
+    args = parser.parse_args()
+    results = migrate_uuid_storage(batch_size=args.batch_size, vacuum=args.vacuum)
+    log.info("Converted %s rows in %s columns", sum(results.values()), len(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,3 +4,9 @@ from .user import UserModel
 from .organization import OrganizationModel, OrganizationMemberModel, OrganizationTeamModel
 from .role import RoleModel, RolePermissionModel
 from .team import TeamModel, TeamMemberModel
+from .job import JobModel
+from .notification import NotificationModel
+from .reminder import ReminderModel
+from .event import EventModel
+from .search import SEARCH_INDEXES
+from .analytics import MemberRollupModel, TeamRollupModel, LoginRollupModel
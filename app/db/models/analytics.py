@@ -0,0 +1,169 @@
+""" Models for Analytics Rollups
+
+Daily counters per organization, incremented in the transaction of every membership,
+team and login change, so dashboards read a few rows per day instead of aggregating the
+raw tables. Rollup tables created on an existing database are filled from the raw tables
+once.
+"""
+from sqlalchemy import Column, Date, ForeignKey, Integer, event, func, select, literal
+from db.base import Base
+from db.types import BinaryUUID
+from db.models.organization import OrganizationMemberModel
+from db.models.team import TeamModel
+from db.models.user import UserModel
+
+# pylint: disable=too-few-public-methods
+# pylint: disable=not-callable
+
+
+class MemberRollupModel(Base):
+    """
+    Members joining and leaving a role of an organization per day.
+
+    A role change counts as leaving the old and joining the new role. The members of a
+    role on a day are the sum of joined minus left up to that day.
+
+    Attributes:
+        organization_id (UUID): The ID of the organization.
+        day (date): The UTC day.
+        role_id (UUID): The ID of the role.
+        joined (int): Members who got the role on the day.
+        left (int): Members who lost the role on the day.
+    """
+    __tablename__ = "analytics_member_daily"
+
+    organization_id = Column(BinaryUUID(), ForeignKey("organizations.id", ondelete="CASCADE"),
+                             primary_key=True)
+    day = Column(Date, primary_key=True)
+    role_id = Column(BinaryUUID(), primary_key=True)
+    joined = Column(Integer, nullable=False, default=0)
+    left = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        """
+        Returns the string representation of the MemberRollupModel class.
+
+        Returns:
+            str: The table name associated with the MemberRollupModel class.
+        """
+        return MemberRollupModel.__tablename__
+
+
+class TeamRollupModel(Base):
+    """
+    Teams created and deleted in an organization per day.
+
+    Attributes:
+        organization_id (UUID): The ID of the organization.
+        day (date): The UTC day.
+        created (int): Teams created on the day.
+        deleted (int): Teams deleted on the day.
+    """
+    __tablename__ = "analytics_team_daily"
+
+    organization_id = Column(BinaryUUID(), ForeignKey("organizations.id", ondelete="CASCADE"),
+                             primary_key=True)
+    day = Column(Date, primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    deleted = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        """
+        Returns the string representation of the TeamRollupModel class.
+
+        Returns:
+            str: The table name associated with the TeamRollupModel class.
+        """
+        return TeamRollupModel.__tablename__
+
+
+class LoginRollupModel(Base):
+    """
+    Logins of the members of an organization per day.
+
+    Attributes:
+        organization_id (UUID): The ID of the organization.
+        day (date): The UTC day.
+        logins (int): Logins of members on the day.
+        active_users (int): Distinct members who logged in on the day.
+    """
+    __tablename__ = "analytics_login_daily"
+
+    organization_id = Column(BinaryUUID(), ForeignKey("organizations.id", ondelete="CASCADE"),
+                             primary_key=True)
+    day = Column(Date, primary_key=True)
+    logins = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        """
+        Returns the string representation of the LoginRollupModel class.
+
+        Returns:
+            str: The table name associated with the LoginRollupModel class.
+        """
+        return LoginRollupModel.__tablename__
+
+
+def get_rollup_backfill_statements() -> list:
+    """
+    Build the statements filling empty rollup tables from the raw tables.
+
+    Logins before the rollups existed are only known from ``users.last_login_at``.
+
+    Returns:
+        list: The INSERT ... SELECT statements.
+    """
+    members = (select(OrganizationMemberModel.organization_id,
+                      func.date(OrganizationMemberModel.joined_at),
+                      OrganizationMemberModel.role_id, func.count(), literal(0))
+               .group_by(OrganizationMemberModel.organization_id,
+                         func.date(OrganizationMemberModel.joined_at),
+                         OrganizationMemberModel.role_id))
+    teams = (select(TeamModel.organization_id, func.date(TeamModel.created_at), func.count(),
+                    literal(0))
+             .group_by(TeamModel.organization_id, func.date(TeamModel.created_at)))
+    logins = (select(OrganizationMemberModel.organization_id, func.date(UserModel.last_login_at),
+                     func.count(), func.count())
+              .join(UserModel, UserModel.id == OrganizationMemberModel.user_id)
+              .where(UserModel.last_login_at.is_not(None))
+              .group_by(OrganizationMemberModel.organization_id,
+                        func.date(UserModel.last_login_at)))
+    return [
+        MemberRollupModel.__table__.insert().from_select(
+            ["organization_id", "day", "role_id", "joined", "left"], members),
+        TeamRollupModel.__table__.insert().from_select(
+            ["organization_id", "day", "created", "deleted"], teams),
+        LoginRollupModel.__table__.insert().from_select(
+            ["organization_id", "day", "logins", "active_users"], logins),
+    ]
+
+
+ROLLUP_TABLES = (MemberRollupModel.__table__, TeamRollupModel.__table__,
+                 LoginRollupModel.__table__)
+
+
+@event.listens_for(MemberRollupModel.__table__, "after_create")
+def _mark_rollups_created(_target, connection, **_kwargs) -> None:
+    """
+    Remember that the rollup tables are new, the raw tables may not exist yet.
+
+    Args:
+        _target (Table): The created table.
+        connection (Connection): The connection running the DDL.
+    """
+    connection.info["rollups_created"] = True
+
+
+@event.listens_for(Base.metadata, "after_create")
+def backfill_rollups(_target, connection, **_kwargs) -> None:
+    """
+    Fill newly created rollup tables from the existing rows.
+
+    Args:
+        _target (MetaData): The created metadata.
+        connection (Connection): The connection running the DDL.
+    """
+    if connection.info.pop("rollups_created", False):
+        for statement in get_rollup_backfill_statements():
+            connection.execute(statement)
@@ -0,0 +1,43 @@
+""" Models for Broadcast Events """
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from db.base import Base
+from utils.helpers import utc_now
+
+# pylint: disable=too-few-public-methods
+
+
+class EventModel(Base):
+    """
+    Represents an event in the broadcast log shared by the API processes.
+
+    The autoincrement ID is the offset of the event. It is never reused, so clients can
+    resume from the last offset they received.
+
+    Attributes:
+        id (int): The offset of the event.
+        channel (str): The channel the event was published to.
+        message (str): The JSON encoded event.
+        coalesce_key (str): Queued events of the channel with an equal key replace each other.
+        created_at (DateTime): Timestamp when the event was published.
+    """
+    __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_channel_id", "channel", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    channel = Column(String(64), nullable=False)
+    message = Column(Text, nullable=False)
+    coalesce_key = Column(String(128), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utc_now, index=True)
+
+    def __repr__(self):
+        """
+        Returns the string representation of the EventModel class.
+
+        Returns:
+            str: The table name associated with the EventModel class.
+        """
+        return EventModel.__tablename__
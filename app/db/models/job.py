@@ -0,0 +1,68 @@
+""" Models for Background Jobs """
+
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index
+from db.base import Base
+from db.types import BinaryUUID
+from utils.helpers import generate_uuid7, utc_now
+
+# pylint: disable=too-few-public-methods
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+
+
+class JobModel(Base):
+    """
+    Represents a background job persisted in the database queue.
+
+    A job is leased by a worker for a visibility timeout. If the worker dies before
+    finishing, the lease expires and another worker picks the job up again.
+
+    Attributes:
+        id (UUID): The ID of the job.
+        queue (str): The name of the queue the job belongs to.
+        task_name (str): The registered name of the task to run.
+        payload (str): The JSON encoded keyword arguments of the task.
+        priority (int): Jobs with a higher priority are leased first.
+        status (str): One of queued, running, succeeded or failed.
+        attempts (int): The number of times the job was leased.
+        max_attempts (int): The number of attempts before the job is marked failed.
+        run_at (DateTime): The job is not leased before this time.
+        lease_expires_at (DateTime): End of the current lease of a running job.
+        worker_id (str): The worker holding the current lease.
+        progress (int): Progress of the job in percent, reported by the task.
+        last_error (str): The error of the last failed attempt.
+        created_at (DateTime): Timestamp when the job was enqueued.
+        finished_at (DateTime): Timestamp when the job succeeded or finally failed.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_lease", "status", "queue", "priority", "run_at"),
+    )
+
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
+    queue = Column(String(64), nullable=False, default="default")
+    task_name = Column(String(128), nullable=False)
+    payload = Column(Text, nullable=False, default="{}")
+    priority = Column(Integer, nullable=False, default=0)
+    status = Column(String(16), nullable=False, default=JOB_STATUS_QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime(timezone=True), nullable=False, default=utc_now)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    worker_id = Column(String(128), nullable=True)
+    progress = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utc_now)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        """
+        Returns the string representation of the JobModel class.
+
+        Returns:
+            str: The table name associated with the JobModel class.
+        """
+        return JobModel.__tablename__
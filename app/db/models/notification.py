@@ -0,0 +1,47 @@
+""" Models for Notifications """
+
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
+from db.base import Base
+from db.types import BinaryUUID
+from utils.helpers import generate_uuid7, utc_now
+
+# pylint: disable=too-few-public-methods
+
+
+class NotificationModel(Base):
+    """
+    Represents a notification delivered to a user.
+
+    Attributes:
+        id (UUID): The ID of the notification.
+        user_id (UUID): The ID of the notified user.
+        organization_id (UUID): The ID of the organization the notification belongs to.
+        type (str): The kind of notification, e.g. reminder.
+        message (str): The human readable message.
+        payload (str): JSON encoded details of the notification.
+        created_at (DateTime): Timestamp when the notification was created.
+        read_at (DateTime): Timestamp when the user read the notification.
+    """
+    __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
+    user_id = Column(BinaryUUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    organization_id = Column(BinaryUUID(),
+                             ForeignKey("organizations.id", ondelete="CASCADE"), nullable=True)
+    type = Column(String(32), nullable=False)
+    message = Column(Text, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utc_now)
+    read_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        """
+        Returns the string representation of the NotificationModel class.
+
+        Returns:
+            str: The table name associated with the NotificationModel class.
+        """
+        return NotificationModel.__tablename__
@@ -1,9 +1,10 @@
 """ ORG Model """
-import uuid
 
-from sqlalchemy import Column, UUID, String, Text, ForeignKey, func, DateTime
+from sqlalchemy import Column, String, Text, ForeignKey, func, DateTime, Integer
 from sqlalchemy.orm import relationship
 from db.base import Base
+from db.types import BinaryUUID
+from utils.helpers import generate_uuid7, utc_now
 
 # pylint: disable=too-few-public-methods
 # pylint: disable=not-callable
@@ -20,19 +21,21 @@ class OrganizationModel(Base):
         owner_id (UUID): ID of the user who owns the organization.
         created_at (DateTime): Timestamp when the organization was created.
         updated_at (DateTime): Timestamp when the organization was last updated.
+        member_version (int): Incremented on every membership change, used in the ETag.
         members (relationship): Relationship to the organization members.
         organization_teams (relationship): Relationship to the organization teams.
         teams (relationship): Relationship to the teams.
     """
     __tablename__ = "organizations"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
     name = Column(String(64), unique=True, nullable=False, index=True)
     description = Column(Text, nullable=True)
-    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    owner_id = Column(BinaryUUID(), ForeignKey("users.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # pylint: disable=not-callable
     updated_at = Column(DateTime(timezone=True), server_default=func.now(),
-                        onupdate=func.now(), nullable=False)  # pylint: disable=not-callable
+                        onupdate=utc_now, nullable=False)  # pylint: disable=not-callable
+    member_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship to members
     members = relationship("OrganizationMemberModel", back_populates="organization")
@@ -57,13 +60,13 @@ class OrganizationMemberModel(Base):
     """
     __tablename__ = "organization_members"
 
-    user_id = Column(UUID(as_uuid=True),
+    user_id = Column(BinaryUUID(),
                      ForeignKey("users.id", ondelete="CASCADE"),
                      primary_key=True)
-    organization_id = Column(UUID(as_uuid=True),
+    organization_id = Column(BinaryUUID(),
                              ForeignKey("organizations.id", ondelete="CASCADE"),
                              primary_key=True)
-    role_id = Column(UUID(as_uuid=True),
+    role_id = Column(BinaryUUID(),
                      ForeignKey("roles.id", ondelete="CASCADE"),
                      nullable=False)
     joined_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -86,10 +89,10 @@ class OrganizationTeamModel(Base):
     """
     __tablename__ = "organization_teams"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    organization_id = Column(UUID(as_uuid=True),
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
+    organization_id = Column(BinaryUUID(),
                              ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
-    team_id = Column(UUID(as_uuid=True),
+    team_id = Column(BinaryUUID(),
                      ForeignKey("teams.id", ondelete="CASCADE"), nullable=False)
 
     organization = relationship("OrganizationModel",
@@ -1,8 +1,9 @@
 """ Permission Model """
-import uuid
-from sqlalchemy import Column, UUID, String
+from sqlalchemy import Column, String
 from sqlalchemy.orm import relationship
 from db.base import Base
+from db.types import BinaryUUID
+from utils.helpers import generate_uuid7
 
 # pylint: disable=too-few-public-methods
 
@@ -19,7 +20,7 @@ class PermissionModel(Base):
     """
     __tablename__ = "permissions"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
     name = Column(String(32), unique=True, nullable=False)
     description = Column(String)
 
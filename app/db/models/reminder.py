@@ -0,0 +1,63 @@
+""" Models for Reminders """
+
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
+from db.base import Base
+from db.types import BinaryUUID
+from utils.helpers import generate_uuid7, utc_now
+
+# pylint: disable=too-few-public-methods
+
+REMINDER_STATUS_PENDING = "pending"
+REMINDER_STATUS_LEASED = "leased"
+REMINDER_STATUS_SENT = "sent"
+
+
+class ReminderModel(Base):
+    """
+    Represents a reminder fired to a user when it is due.
+
+    Scheduler processes lease the reminders due within their look-ahead window, so each
+    reminder is held by one process; a reminder is marked sent in the same transaction
+    that creates its notification, so it never fires twice.
+
+    Attributes:
+        id (UUID): The ID of the reminder.
+        user_id (UUID): The ID of the user to remind.
+        organization_id (UUID): The ID of the organization of the subject.
+        subject_type (str): The kind of the subject, e.g. task or project.
+        subject_id (UUID): The ID of the subject the reminder is about.
+        message (str): The reminder message.
+        due_at (DateTime): When the reminder fires.
+        status (str): One of pending, leased or sent.
+        lease_expires_at (DateTime): End of the lease of a leased reminder.
+        worker_id (str): The scheduler process holding the lease.
+        sent_at (DateTime): Timestamp when the reminder fired.
+        created_at (DateTime): Timestamp when the reminder was created.
+    """
+    __tablename__ = "reminders"
+    __table_args__ = (
+        Index("ix_reminders_status_due_at", "status", "due_at"),
+    )
+
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
+    user_id = Column(BinaryUUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    organization_id = Column(BinaryUUID(),
+                             ForeignKey("organizations.id", ondelete="CASCADE"), nullable=True)
+    subject_type = Column(String(32), nullable=False)
+    subject_id = Column(BinaryUUID(), nullable=True)
+    message = Column(Text, nullable=False)
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String(16), nullable=False, default=REMINDER_STATUS_PENDING)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    worker_id = Column(String(128), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utc_now)
+
+    def __repr__(self):
+        """
+        Returns the string representation of the ReminderModel class.
+
+        Returns:
+            str: The table name associated with the ReminderModel class.
+        """
+        return ReminderModel.__tablename__
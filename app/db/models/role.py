@@ -1,8 +1,9 @@
 """ Role Model """
-import uuid
-from sqlalchemy import Column, UUID, String, ForeignKey, Boolean, CheckConstraint, Index
+from sqlalchemy import Column, String, ForeignKey, Boolean, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from db.base import Base
+from db.types import BinaryUUID
+from utils.helpers import generate_uuid7
 
 # pylint: disable=too-few-public-methods
 
@@ -17,9 +18,9 @@ class RolePermissionModel(Base):
     """
     __tablename__ = "role_permission"
 
-    role_id = Column(UUID(as_uuid=True),
+    role_id = Column(BinaryUUID(),
                      ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True)
-    permission_id = Column(UUID(as_uuid=True),
+    permission_id = Column(BinaryUUID(),
                            ForeignKey("permissions.id", ondelete="CASCADE"), primary_key=True)
 
 
@@ -38,12 +39,12 @@ class RoleModel(Base):
     """
     __tablename__ = "roles"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
     name = Column(String(64), index=True, nullable=False)
     description = Column(String, nullable=True)
     is_system_role = Column(Boolean, default=False, nullable=False)
-    organization_id = Column(UUID, ForeignKey("organizations.id"), nullable=True)
-    team_id = Column(UUID, ForeignKey("teams.id"), nullable=True)
+    organization_id = Column(BinaryUUID(), ForeignKey("organizations.id"), nullable=True)
+    team_id = Column(BinaryUUID(), ForeignKey("teams.id"), nullable=True)
 
     organization_members = relationship("OrganizationMemberModel", back_populates="role")
     team_members = relationship("TeamMemberModel", back_populates="role")
@@ -0,0 +1,71 @@
+""" Full-text search indexes
+
+SQLite FTS5 tables indexing the searchable columns of users, organizations and teams.
+They are external content tables: the text is read from the indexed table by rowid and
+triggers keep the index in sync on every insert, update and delete.
+
+VACUUM may renumber the rowids of these tables, rebuild the indexes afterwards with
+``INSERT INTO <index>(<index>) VALUES('rebuild')``, as ``db.migrate_uuid --vacuum`` does.
+"""
+from sqlalchemy import event
+from db.base import Base
+
+# Index name: (indexed table, indexed columns)
+SEARCH_INDEXES = {
+    "users_fts": ("users", ("first_name", "last_name", "username", "email")),
+    "organizations_fts": ("organizations", ("name", "description")),
+    "teams_fts": ("teams", ("name", "description")),
+}
+
+# Prefix indexes make the short prefix queries of a search box cheap
+SEARCH_INDEX_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def get_search_index_ddl(index: str, table: str, columns: tuple[str, ...]) -> list[str]:
+    """
+    Build the statements creating a search index and its sync triggers.
+
+    Args:
+        index (str): The name of the FTS5 table.
+        table (str): The indexed table.
+        columns (tuple[str, ...]): The indexed columns.
+
+    Returns:
+        list[str]: The idempotent DDL statements.
+    """
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete_old = (f"INSERT INTO {index}({index}, rowid, {names}) "
+                  f"VALUES ('delete', old.rowid, {old_values});")
+    insert_new = f"INSERT INTO {index}(rowid, {names}) VALUES (new.rowid, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({names}, "
+        f"content = '{table}', content_rowid = 'rowid', {SEARCH_INDEX_OPTIONS})",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+        f"{insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+        f"{delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"{delete_old} {insert_new} END",
+    ]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_search_indexes(_target, connection, **_kwargs) -> None:
+    """
+    Create the search indexes after the tables, indexing the existing rows once.
+
+    Args:
+        _target (MetaData): The created metadata.
+        connection (Connection): The connection running the DDL.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    for index, (table, columns) in SEARCH_INDEXES.items():
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index,)).first()
+        for statement in get_search_index_ddl(index, table, columns):
+            connection.exec_driver_sql(statement)
+        if not exists:
+            connection.exec_driver_sql(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
@@ -1,9 +1,10 @@
 """ Models for Teams """
 
-import uuid
-from sqlalchemy import Column, UUID, String, DateTime, func, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, DateTime, func, ForeignKey, UniqueConstraint, Integer
 from sqlalchemy.orm import relationship
 from db.base import Base
+from db.types import BinaryUUID
+from utils.helpers import generate_uuid7, utc_now
 
 # pylint: disable=too-few-public-methods
 # pylint: disable=not-callable
@@ -20,7 +21,8 @@ class TeamModel(Base):
         organization_id (UUID): The ID of the organization.
         owner_id (UUID): The ID of the user who created the team.
         created_at (DateTime): Timestamp when the team was created.
-        updated_at (DateTime): Timestamp when the organization was created.
+        updated_at (DateTime): Timestamp when the team was last updated.
+        member_version (int): Incremented on every membership change, used in the ETag.
         members (relationship): Relationship to the team members.
         organization_teams (relationship): Relationship to the organization teams.
         organizations (relationship): Relationship to the organizations.
@@ -30,17 +32,18 @@ class TeamModel(Base):
         UniqueConstraint("organization_id", "name", name="uq_team_org_name"),
     )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
     name = Column(String(64), index=True, nullable=False)
     description = Column(String, nullable=True)
-    organization_id = Column(UUID(as_uuid=True),
+    organization_id = Column(BinaryUUID(),
                              ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
-    owner_id = Column(UUID(as_uuid=True),
+    owner_id = Column(BinaryUUID(),
                       ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(),
-                        server_onupdate=func.now())
+                        onupdate=utc_now)
+    member_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     members = relationship("TeamMemberModel", back_populates="team",
                            cascade="all, delete-orphan")
@@ -75,11 +78,11 @@ class TeamMemberModel(Base):
     """
     __tablename__ = "team_members"
 
-    team_id = Column(UUID(as_uuid=True),
+    team_id = Column(BinaryUUID(),
                      ForeignKey("teams.id", ondelete="CASCADE"), primary_key=True)
-    user_id = Column(UUID(as_uuid=True),
+    user_id = Column(BinaryUUID(),
                      ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
-    role_id = Column(UUID(as_uuid=True),
+    role_id = Column(BinaryUUID(),
                      ForeignKey("roles.id", ondelete="CASCADE"))
     joined_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
@@ -1,9 +1,10 @@
 """ User Model """
 
-import uuid
 from sqlalchemy.orm import relationship
-from sqlalchemy import Boolean, String, Column, UUID, DateTime, func
+from sqlalchemy import Boolean, String, Column, DateTime, func
 from db.base import Base
+from db.types import BinaryUUID
+from utils.helpers import generate_uuid7
 
 # pylint: disable=too-few-public-methods
 # pylint: disable=not-callable
@@ -32,7 +33,7 @@ class UserModel(Base):
     """
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(BinaryUUID(), primary_key=True, default=generate_uuid7)
     first_name = Column(String(128), nullable=False)
     last_name = Column(String(128), nullable=False)
     username = Column(String(64), unique=True, nullable=False, index=True)
@@ -0,0 +1,223 @@
+""" Read Models
+
+Lightweight, slotted row types returned by the read helpers in ``db.crud``. They are
+filled from SQLAlchemy Core ``select()`` statements over only the needed columns, so
+reads skip the ORM identity map and never load columns such as ``hashed_password``.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from uuid import UUID
+
+
+@dataclass(slots=True, frozen=True)
+class UserRow:
+    """
+    Public profile columns of a user.
+
+    Attributes:
+        id (UUID): Unique identifier for the user.
+        username (str): Username of the user.
+        email (str): Email address of the user.
+        first_name (str): First name of the user.
+        last_name (str): Last name of the user.
+        is_active (bool): Indicates if the user is active.
+        created_at (datetime): Timestamp when the user was created.
+    """
+    id: UUID
+    username: str
+    email: str
+    first_name: str
+    last_name: str
+    is_active: bool
+    created_at: datetime
+
+    @property
+    def full_name(self) -> str:
+        """
+        Full name of the user.
+
+        Returns:
+            str: The first and last name separated by a space.
+        """
+        return f"{self.first_name} {self.last_name}"
+
+
+@dataclass(slots=True, frozen=True)
+class RoleRow:
+    """
+    Columns of a role.
+
+    Attributes:
+        id (UUID): Unique identifier for the role.
+        name (str): Name of the role.
+        description (str | None): Description of the role.
+        is_system_role (bool): Indicates if the role is a system role.
+        organization_id (UUID | None): ID of the organization of the role.
+        team_id (UUID | None): ID of the team of the role.
+    """
+    id: UUID
+    name: str
+    description: str | None
+    is_system_role: bool
+    organization_id: UUID | None
+    team_id: UUID | None
+
+
+@dataclass(slots=True, frozen=True)
+class PermissionRow:
+    """
+    Columns of a permission.
+
+    Attributes:
+        id (UUID): Unique identifier for the permission.
+        name (str): Name of the permission.
+        description (str | None): Description of the permission.
+    """
+    id: UUID
+    name: str
+    description: str | None
+
+
+@dataclass(slots=True, frozen=True)
+class OrganizationRow:
+    """
+    Columns of an organization.
+
+    Attributes:
+        id (UUID): Unique identifier for the organization.
+        name (str): Name of the organization.
+        description (str | None): Description of the organization.
+        owner_id (UUID): ID of the owner of the organization.
+        created_at (datetime): Timestamp when the organization was created.
+    """
+    id: UUID
+    name: str
+    description: str | None
+    owner_id: UUID
+    created_at: datetime
+
+
+@dataclass(slots=True, frozen=True)
+class OrganizationMemberRow:
+    """
+    A member of an organization joined with its user and role.
+
+    Attributes:
+        user_id (UUID): ID of the user.
+        email (str): Email address of the user.
+        first_name (str): First name of the user.
+        last_name (str): Last name of the user.
+        role_id (UUID): ID of the role of the member.
+        role_name (str): Name of the role of the member.
+        joined_at (datetime): Timestamp when the user joined the organization.
+    """
+    user_id: UUID
+    email: str
+    first_name: str
+    last_name: str
+    role_id: UUID
+    role_name: str
+    joined_at: datetime
+
+    @property
+    def full_name(self) -> str:
+        """
+        Full name of the member.
+
+        Returns:
+            str: The first and last name separated by a space.
+        """
+        return f"{self.first_name} {self.last_name}"
+
+
+@dataclass(slots=True, frozen=True)
+class TeamRow:  # pylint: disable=too-many-instance-attributes
+    """
+    Columns of a team with its member count.
+
+    Attributes:
+        id (UUID): Unique identifier for the team.
+        name (str): Name of the team.
+        description (str | None): Description of the team.
+        organization_id (UUID): ID of the organization of the team.
+        owner_id (UUID): ID of the user who created the team.
+        created_at (datetime): Timestamp when the team was created.
+        updated_at (datetime): Timestamp when the team was last updated.
+        member_count (int): Number of members in the team.
+    """
+    id: UUID
+    name: str
+    description: str | None
+    organization_id: UUID
+    owner_id: UUID
+    created_at: datetime
+    updated_at: datetime
+    member_count: int
+
+
+@dataclass(slots=True, frozen=True)
+class RolePermissionRow:
+    """
+    A permission granted to a role.
+
+    Attributes:
+        role_id (UUID): ID of the role.
+        role_name (str): Name of the role.
+        permission_id (UUID): ID of the permission.
+        permission_name (str): Name of the permission.
+    """
+    role_id: UUID
+    role_name: str
+    permission_id: UUID
+    permission_name: str
+
+
+@dataclass(slots=True, frozen=True)
+class JobRow:
+    """
+    A leased background job.
+
+    Attributes:
+        id (UUID): Unique identifier for the job.
+        queue (str): Name of the queue of the job.
+        task_name (str): Registered name of the task to run.
+        payload (dict): Keyword arguments of the task.
+        attempts (int): Number of times the job was leased, including this lease.
+        max_attempts (int): Number of attempts before the job is marked failed.
+    """
+    id: UUID
+    queue: str
+    task_name: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+
+@dataclass(slots=True, frozen=True)
+class ReminderRow:
+    """
+    A leased reminder waiting in the scheduler.
+
+    Attributes:
+        id (UUID): Unique identifier for the reminder.
+        due_at (datetime): When the reminder fires.
+    """
+    id: UUID
+    due_at: datetime
+
+
+@dataclass(slots=True, frozen=True)
+class EventRow:
+    """
+    An event read from the broadcast log.
+
+    Attributes:
+        id (int): The offset of the event.
+        channel (str): The channel of the event.
+        message (str): The JSON encoded event.
+        coalesce_key (str | None): The coalesce key of the event.
+    """
+    id: int
+    channel: str
+    message: str
+    coalesce_key: str | None
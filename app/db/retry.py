@@ -0,0 +1,176 @@
+""" Retries of transactions failing on transient lock errors.
+
+SQLite answers a write with "database is locked" once the busy timeout passes, and at
+once when a transaction that read an older snapshot tries to write in WAL mode. Such a
+transaction was rolled back, so the unit of work that ran it is replayed from the start
+with a fresh session, after an exponential backoff with full jitter, until the retry
+budget is spent. A unit of work that committed before failing is never replayed.
+
+The busy timeout and the backoff block the calling thread: async code runs the units of
+work with ``asyncio.to_thread``, never on the event loop.
+"""
+import functools
+import random
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, ParamSpec, TypeVar
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, DBAPIError
+from sqlalchemy.orm import Session
+from core.config import DB_RETRY_MAX_ATTEMPTS, DB_RETRY_BASE_DELAY, DB_RETRY_MAX_DELAY, \
+    DB_RETRY_MAX_ELAPSED
+from core.logging_conf import Logging
+from utils.deadline import remaining_seconds
+
+log = Logging(__name__).log()
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# SQLITE_BUSY and SQLITE_LOCKED, extended codes share the low byte
+SQLITE_TRANSIENT_CODES = (5, 6)
+SQLITE_TRANSIENT_MESSAGES = ("database is locked", "database table is locked", "busy")
+# PostgreSQL serialization failure and deadlock
+POSTGRES_TRANSIENT_CODES = ("40001", "40P01")
+
+# The commits of the unit of work being run, None outside of one
+_unit_commits: ContextVar[list[int] | None] = ContextVar("unit_commits", default=None)
+
+
+@event.listens_for(Session, "after_commit")
+def _count_commit(_session: Session) -> None:
+    """ Mark the running unit of work as committed, it must not be replayed anymore. """
+    commits = _unit_commits.get()
+    if commits is not None:
+        commits[0] += 1
+
+
+def is_transient_error(exc: DBAPIError) -> bool:
+    """
+    Check if a database error is a lock or busy error worth retrying.
+
+    Args:
+        exc (DBAPIError): The error.
+
+    Returns:
+        bool: True if the transaction may succeed when replayed.
+    """
+    if getattr(exc.orig, "pgcode", None) in POSTGRES_TRANSIENT_CODES:
+        return True
+    if not isinstance(exc, OperationalError):
+        return False
+    code = getattr(exc.orig, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in SQLITE_TRANSIENT_CODES
+    message = str(exc.orig).lower()
+    return any(text in message for text in SQLITE_TRANSIENT_MESSAGES)
+
+
+class TransactionRetryStats:
+    """
+    Retry counts of the units of work of this process.
+
+    Attributes:
+        counts (defaultdict[str, dict[str, int]]): The retries, recovered and exhausted
+            units of work by function name.
+    """
+
+    def __init__(self):
+        """ Initialize empty counts. """
+        self.counts: defaultdict[str, dict[str, int]] = defaultdict(
+            lambda: {"retries": 0, "recovered": 0, "exhausted": 0})
+        self._lock = threading.Lock()
+
+    def record(self, name: str, outcome: str) -> None:
+        """
+        Count a retry or the outcome of a retried unit of work.
+
+        Args:
+            name (str): The name of the function.
+            outcome (str): "retries", "recovered" or "exhausted".
+        """
+        with self._lock:
+            self.counts[name][outcome] += 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Retrieve the retry counts.
+
+        Returns:
+            dict[str, dict[str, int]]: The retries, recovered and exhausted units of work
+                by function name.
+        """
+        with self._lock:
+            return {name: dict(counts) for name, counts in self.counts.items()}
+
+
+transaction_retries = TransactionRetryStats()
+
+
+def backoff_delay(attempt: int, base: float = DB_RETRY_BASE_DELAY,
+                  cap: float = DB_RETRY_MAX_DELAY) -> float:
+    """
+    Draw the pause before a retry, full jitter keeps retrying writers from colliding again.
+
+    Args:
+        attempt (int): The number of the failed attempt, from 1.
+        base (float): Seconds of the longest pause after the first attempt.
+        cap (float): Seconds of the longest pause.
+
+    Returns:
+        float: Seconds to wait.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def retry_transaction(function: Callable[P, R]) -> Callable[P, R]:
+    """
+    Replay a unit of work, a function running and committing its own session, when it
+    fails on a transient lock error before committing.
+
+    Args:
+        function (Callable[P, R]): The unit of work.
+
+    Returns:
+        Callable[P, R]: The function retrying it.
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            commits = [0]
+            token = _unit_commits.set(commits)
+            try:
+                result = function(*args, **kwargs)
+            except DBAPIError as exc:
+                if not is_transient_error(exc) or commits[0]:
+                    raise
+                delay = backoff_delay(attempt)
+                budget = DB_RETRY_MAX_ELAPSED - (time.monotonic() - started)
+                deadline = remaining_seconds()
+                if deadline is not None:
+                    budget = min(budget, deadline)
+                if attempt >= DB_RETRY_MAX_ATTEMPTS or delay >= budget:
+                    transaction_retries.record(name, "exhausted")
+                    log.error("%s failed on a lock after %s attempts: %s", name, attempt,
+                              exc.orig)
+                    raise
+                transaction_retries.record(name, "retries")
+                log.warning("%s failed on a lock, retry %s in %.3f s: %s", name, attempt,
+                            delay, exc.orig)
+            else:
+                if attempt > 1:
+                    transaction_retries.record(name, "recovered")
+                return result
+            finally:
+                _unit_commits.reset(token)
+            # Out of the except block, the failed session and its connection are released
+            time.sleep(delay)
+
+    return wrapper
@@ -0,0 +1,102 @@
+""" Custom Column Types """
+from uuid import UUID
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator, LargeBinary, BINARY
+
+# pylint: disable=too-many-ancestors
+
+
+class BinaryUUID(TypeDecorator):
+    """
+    UUID column type stored in its compact form for each backend.
+
+    PostgreSQL uses its native ``uuid`` type, SQLite stores the 16 raw bytes as a BLOB
+    and any other backend uses ``BINARY(16)``. Values are always returned as ``uuid.UUID``.
+    Rows still holding the legacy 32-char hex text are read transparently, but lookups
+    and joins bind BLOBs and do not match them: convert a legacy database with
+    ``db.migrate_uuid`` while the application is stopped.
+    """
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        """
+        Select the underlying column type for the given dialect.
+
+        Args:
+            dialect (Dialect): The SQLAlchemy dialect in use.
+
+        Returns:
+            TypeEngine: The dialect specific type.
+        """
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(LargeBinary(16))
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        """
+        Convert a UUID (or UUID string) into the value sent to the database.
+
+        Args:
+            value (UUID | str | None): The value to bind.
+            dialect (Dialect): The SQLAlchemy dialect in use.
+
+        Returns:
+            UUID | bytes | None: Native UUID on PostgreSQL, 16 bytes elsewhere.
+        """
+        if value is None:
+            return None
+        if not isinstance(value, UUID):
+            value = UUID(str(value))
+        if dialect.name == "postgresql":
+            return value
+        return value.bytes
+
+    def process_literal_param(self, value, dialect):
+        """
+        Render a UUID as an inline SQL literal.
+
+        Args:
+            value (UUID | str | None): The value to render.
+            dialect (Dialect): The SQLAlchemy dialect in use.
+
+        Returns:
+            str: The SQL literal.
+        """
+        if value is None:
+            return "NULL"
+        if not isinstance(value, UUID):
+            value = UUID(str(value))
+        if dialect.name == "postgresql":
+            return f"'{value}'"
+        return f"X'{value.hex}'"
+
+    def process_result_value(self, value, dialect):
+        """
+        Convert a database value back into a UUID.
+
+        Args:
+            value (UUID | bytes | str | None): The value read from the database.
+            dialect (Dialect): The SQLAlchemy dialect in use.
+
+        Returns:
+            UUID | None: The UUID value.
+        """
+        if value is None or isinstance(value, UUID):
+            return value
+        if isinstance(value, str):
+            # Not yet migrated hex text
+            return UUID(value)
+        return UUID(bytes=bytes(value))
+
+    @property
+    def python_type(self):
+        """
+        The Python type of the values handled by this column type.
+
+        Returns:
+            type: ``uuid.UUID``.
+        """
+        return UUID
@@ -101,3 +101,22 @@ TEAM_ALREADY_EXISTS_EXCEPTION = HTTPException(
     status_code=status.HTTP_409_CONFLICT,
     detail="Team already exists."
 )
+
+
+# Conditional Request Related Exception
+PRECONDITION_FAILED_EXCEPTION = HTTPException(
+    status_code=status.HTTP_412_PRECONDITION_FAILED,
+    detail="The resource has been modified since it was retrieved."
+)
+
+
+# Export Related Exception
+EXPORT_NOT_FOUND_EXCEPTION = HTTPException(
+    status_code=status.HTTP_404_NOT_FOUND,
+    detail="Export not found"
+)
+
+EXPORT_NOT_READY_EXCEPTION = HTTPException(
+    status_code=status.HTTP_409_CONFLICT,
+    detail="Export is not finished yet."
+)
@@ -1,22 +1,78 @@
 """ Entry Point """
 import asyncio
+from contextlib import asynccontextmanager
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+from core.admission import admission_controller
+from core.config import RATE_LIMIT_ENABLED, ADMISSION_CONTROL_ENABLED, REQUEST_DEADLINES_ENABLED
+from core.deadlines import REQUEST_TIMEOUTS
 from core.logging_conf import Logging
-from apis.v1 import auth, users, organizations, teams
+from core.rate_limits import RATE_LIMIT_POLICIES
+from apis import websockets
+from apis.v1 import auth, users, organizations, teams, search, analytics
 from db.base import create_db_and_tables
+from db.cache import ENTITY_CACHES
+from db.retry import transaction_retries
 from db.init_db import db_init
+from services.notification_service import notification_hub
+from services.organization_service import organization_lookups, member_count_lookups
+from services.team_service import team_lookups, team_member_count_lookups
+from utils.admission import AdmissionMiddleware
+from utils.deadline import DeadlineMiddleware, DeadlineExceeded
+from utils.rate_limiter import RateLimitMiddleware
 
 log = Logging(__name__).log()
 
-# Create a FastAPI application instance
-app = FastAPI()
 
-# Include routers for authentication, users, and organizations APIs
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Deliver the notification events of all processes while the application runs.
+
+    Args:
+        _ (FastAPI): The application.
+    """
+    await notification_hub.start()
+    yield
+    await notification_hub.stop()
+
+# Create a FastAPI application instance, orjson encodes UUID and datetime natively
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+# The last added middleware runs first, rate limited requests never take a slot and the
+# deadline includes the time spent waiting for one
+if ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, policies=RATE_LIMIT_POLICIES)
+if REQUEST_DEADLINES_ENABLED:
+    app.add_middleware(DeadlineMiddleware, timeouts=REQUEST_TIMEOUTS)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, _exc: DeadlineExceeded):
+    """
+    Answer a request whose deadline passed while it was waiting for the database with 504.
+
+    Args:
+        request (Request): The request.
+        _exc (DeadlineExceeded): The exception.
+
+    Returns:
+        ORJSONResponse: The 504 response.
+    """
+    log.warning("Deadline of %s %s exceeded", request.method, request.url.path)
+    return ORJSONResponse(status_code=504,
+                          content={"detail": "The request took too long, please retry."})
+
+# Include routers for authentication, users, organizations, search and WebSocket APIs
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(organizations.router)
 app.include_router(teams.router)
+app.include_router(search.router)
+app.include_router(analytics.router)
+app.include_router(websockets.router)
 
 @app.get("/")
 async def root():
@@ -29,6 +85,48 @@ async def root():
     log.info("Home Page Called!!!")
     return {"status": "OK"}
 
+@app.get("/metrics/admission")
+async def admission_metrics():
+    """
+    Retrieve the admission control metrics of this process.
+
+    Returns:
+        dict: The limit, in flight, queued, admitted, rejected and timed out requests of
+            every pool.
+    """
+    return admission_controller.stats()
+
+@app.get("/metrics/db-retries")
+async def db_retry_metrics():
+    """
+    Retrieve the retries of transactions failing on a database lock in this process.
+
+    Returns:
+        dict: The retries, recovered and exhausted units of work by function name.
+    """
+    return transaction_retries.stats()
+
+@app.get("/metrics/entity-cache")
+async def entity_cache_metrics():
+    """
+    Retrieve the hits, misses and invalidations of the entity caches in this process.
+
+    Returns:
+        dict: The metrics by entity type.
+    """
+    return {cache.name: cache.stats() for cache in ENTITY_CACHES}
+
+@app.get("/metrics/single-flight")
+async def single_flight_metrics():
+    """
+    Retrieve how many identical concurrent lookups were collapsed in this process.
+
+    Returns:
+        dict: The calls, executions, collapsed calls and collapse ratio by lookup.
+    """
+    return {flight.name: flight.stats() for flight in (organization_lookups, member_count_lookups,
+                                                       team_lookups, team_member_count_lookups)}
+
 def main():
     """
     Entry point for the application.
@@ -0,0 +1,123 @@
+""" The Analytics Schema """
+
+from datetime import date
+from uuid import UUID
+from pydantic import BaseModel
+
+
+# Response Schema
+class RoleMemberCount(BaseModel):
+    """
+    The members of an organization with a role.
+
+    Attributes:
+        role_id (UUID): The ID of the role.
+        role_name (str | None): The name of the role, None if it was deleted.
+        members (int): The number of members with the role.
+    """
+    role_id: UUID
+    role_name: str | None
+    members: int
+
+
+class MemberDay(BaseModel):
+    """
+    The members of an organization at the end of a day.
+
+    Attributes:
+        day (date): The UTC day.
+        members (int): The number of members.
+        change (int): The members joined minus the members left on the day.
+    """
+    day: date
+    members: int
+    change: int
+
+
+class TeamDay(BaseModel):
+    """
+    The teams of an organization at the end of a day.
+
+    Attributes:
+        day (date): The UTC day.
+        teams (int): The number of teams.
+        created (int): The teams created on the day.
+        deleted (int): The teams deleted on the day.
+    """
+    day: date
+    teams: int
+    created: int
+    deleted: int
+
+
+class LoginDay(BaseModel):
+    """
+    The logins of the members of an organization on a day.
+
+    Attributes:
+        day (date): The UTC day.
+        logins (int): The number of logins.
+        active_users (int): The number of members who logged in.
+    """
+    day: date
+    logins: int
+    active_users: int
+
+
+class OrganizationDashboard(BaseModel):
+    """
+    Response schema for the analytics dashboard of an organization.
+
+    Attributes:
+        organization_id (UUID): The ID of the organization.
+        days (int): The number of days of the series, ending today.
+        members (int): The current number of members.
+        teams (int): The current number of teams.
+        members_by_role (list[RoleMemberCount]): The current members per role.
+        member_series (list[MemberDay]): The members per day.
+        team_series (list[TeamDay]): The teams per day.
+        login_series (list[LoginDay]): The logins per day.
+    """
+    organization_id: UUID
+    days: int
+    members: int
+    teams: int
+    members_by_role: list[RoleMemberCount]
+    member_series: list[MemberDay]
+    team_series: list[TeamDay]
+    login_series: list[LoginDay]
+
+
+class Cohort(BaseModel):
+    """
+    The members of an organization who joined in one week.
+
+    Attributes:
+        week_start (date): The Monday of the week the members joined.
+        members (int): The number of members who joined in the week.
+        retained (list[int | None]): Per week since joining, the members still active
+            then, None for weeks that have not ended yet.
+    """
+    week_start: date
+    members: int
+    retained: list[int | None]
+
+
+class CohortReport(BaseModel):
+    """
+    Response schema for the weekly cohorts and retention of an organization.
+
+    A member counts as active in a week since joining when their last login is in that
+    week or later.
+
+    Attributes:
+        organization_id (UUID): The ID of the organization.
+        weeks (int): The number of cohorts and of weeks since joining.
+        cohorts (list[Cohort]): The cohorts, oldest first.
+        retention (list[float | None]): Per week since joining, the share of the members
+            of the cohorts old enough that were still active, None if there are none.
+    """
+    organization_id: UUID
+    weeks: int
+    cohorts: list[Cohort]
+    retention: list[float | None]
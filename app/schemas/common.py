@@ -0,0 +1,50 @@
+""" Common schema helpers """
+from typing import Any, TypeVar
+from pydantic import BaseModel
+from core.config import STRICT_RESPONSE_VALIDATION
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_MISSING = object()
+
+
+def trusted_construct(model: type[ModelT], **data: Any) -> ModelT:
+    """
+    Build a schema instance from trusted internal data.
+
+    Values that come from the database or from already validated schemas are assigned
+    without running validation again. Nested schemas must therefore be passed as
+    instances, not dicts. Set STRICT_RESPONSE_VALIDATION to validate everything instead.
+
+    Args:
+        model (type[ModelT]): The schema class to build.
+        **data (Any): The field values.
+
+    Returns:
+        ModelT: The schema instance.
+    """
+    if STRICT_RESPONSE_VALIDATION:
+        return model.model_validate(data)
+    return model.model_construct(**data)
+
+
+def trusted_from_attributes(model: type[ModelT], obj: Any, **extra: Any) -> ModelT:
+    """
+    Build a schema instance from the attributes of a trusted object such as a DB row.
+
+    Args:
+        model (type[ModelT]): The schema class to build.
+        obj (Any): The object to read the field values from.
+        **extra (Any): Field values that override or complement the object attributes.
+            Fields missing on the object fall back to their schema defaults.
+
+    Returns:
+        ModelT: The schema instance.
+    """
+    data = {}
+    for name in model.model_fields:
+        value = getattr(obj, name, _MISSING)
+        if value is not _MISSING:
+            data[name] = value
+    data.update(extra)
+    return trusted_construct(model, **data)
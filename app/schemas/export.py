@@ -0,0 +1,47 @@
+""" The Export Schema """
+
+from datetime import datetime
+from typing import Literal
+from uuid import UUID
+from pydantic import BaseModel
+
+
+# Response Schema
+class ExportFile(BaseModel):
+    """
+    A downloadable file of a finished export.
+
+    Attributes:
+        dataset (str): The exported dataset (members, teams, roles or role_permissions).
+        size (int): The size of the compressed file in bytes.
+        url (str): The download URL, supports HTTP Range requests.
+    """
+    dataset: str
+    size: int
+    url: str
+
+
+class ExportJobResponse(BaseModel):
+    """
+    Response schema for an organization export job.
+
+    Attributes:
+        id (UUID): The ID of the export.
+        organization_id (UUID): The ID of the exported organization.
+        format (str): The file format, csv or ndjson.
+        status (str): One of queued, running, succeeded or failed.
+        progress (int): Progress of the export in percent.
+        error (str | None): The error of the last failed attempt.
+        created_at (datetime): Timestamp when the export was requested.
+        finished_at (datetime | None): Timestamp when the export finished.
+        files (list[ExportFile]): The files of a succeeded export.
+    """
+    id: UUID
+    organization_id: UUID
+    format: Literal["ndjson", "csv"]
+    status: str
+    progress: int
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
+    files: list[ExportFile] = []
@@ -0,0 +1,49 @@
+""" The Search Schema """
+
+from uuid import UUID
+from pydantic import BaseModel
+from schemas.organization import Organization
+from schemas.user import UserProfileShort
+
+
+# Response Schema
+class UserSearchResult(UserProfileShort):
+    """
+    A user matching a search.
+
+    Attributes:
+        username (str): The username of the user.
+    """
+    username: str
+
+
+class TeamSearchResult(BaseModel):
+    """
+    A team matching a search.
+
+    Attributes:
+        id (UUID): The ID of the team.
+        name (str): The name of the team.
+        description (str | None): The description of the team.
+        organization_id (UUID): The ID of the organization of the team.
+    """
+    id: UUID
+    name: str
+    description: str | None
+    organization_id: UUID
+
+
+class SearchResponse(BaseModel):
+    """
+    Response schema for a search, every list is ordered by relevance.
+
+    Attributes:
+        query (str): The searched text.
+        users (list[UserSearchResult]): The matching members of the caller's organizations.
+        organizations (list[Organization]): The matching organizations of the caller.
+        teams (list[TeamSearchResult]): The matching teams of the caller's organizations.
+    """
+    query: str
+    users: list[UserSearchResult] = []
+    organizations: list[Organization] = []
+    teams: list[TeamSearchResult] = []
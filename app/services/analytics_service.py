@@ -0,0 +1,230 @@
+""" Analytics Service
+
+Dashboards read the daily rollups maintained by the membership, team and login writes,
+see ``db.models.analytics``, so a dashboard costs a few rows per day of history however
+large the organization is.
+
+Cohort reports load the signup, join and last login days of all members of an
+organization in one query and bin them into weekly cohorts with NumPy.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+from uuid import UUID
+import numpy as np
+from core.config import ANALYTICS_COHORT_CACHE_SIZE
+from core.logging_conf import Logging
+from db.crud.crud_analytics import get_member_rollups, get_team_rollups, get_login_rollups, \
+    rebuild_rollups, get_member_activity_days
+from schemas.analytics import OrganizationDashboard, RoleMemberCount, MemberDay, TeamDay, \
+    LoginDay, Cohort, CohortReport
+from schemas.common import trusted_construct
+from utils.helpers import utc_now
+
+log = Logging(__name__).log()
+
+ANALYTICS_REBUILD_TASK_NAME = "analytics.rebuild_rollups"
+
+# 1970-01-01 was a Thursday, shifting day numbers by 3 starts the weeks on Monday
+WEEK_START_SHIFT = 3
+EPOCH = date(1970, 1, 1)
+
+
+def _day_range(first: date, last: date) -> list[date]:
+    """
+    List the days from one day to another.
+
+    Args:
+        first (date): The first day.
+        last (date): The last day, included.
+
+    Returns:
+        list[date]: The days.
+    """
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def _member_series(organization_id: UUID, days: list[date]
+                   ) -> tuple[list[MemberDay], list[RoleMemberCount]]:
+    """
+    Accumulate the member rollups into daily totals and the current members per role.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        days (list[date]): The days of the series.
+
+    Returns:
+        tuple[list[MemberDay], list[RoleMemberCount]]: The series and the role counts.
+    """
+    changes = defaultdict(int)
+    roles: dict[UUID, list] = {}
+    members = 0
+    for day, role_id, role_name, change in get_member_rollups(organization_id):
+        roles.setdefault(role_id, [role_name, 0])[1] += change
+        if day < days[0]:
+            members += change
+        else:
+            changes[day] += change
+
+    series = []
+    for day in days:
+        members += changes[day]
+        series.append(trusted_construct(MemberDay, day=day, members=members, change=changes[day]))
+    by_role = [trusted_construct(RoleMemberCount, role_id=role_id, role_name=role_name,
+                                 members=count)
+               for role_id, (role_name, count) in roles.items() if count > 0]
+    by_role.sort(key=lambda role: -role.members)
+    return series, by_role
+
+
+def _team_series(organization_id: UUID, days: list[date]) -> list[TeamDay]:
+    """
+    Accumulate the team rollups into daily totals.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        days (list[date]): The days of the series.
+
+    Returns:
+        list[TeamDay]: The series.
+    """
+    changes = {}
+    teams = 0
+    for day, created, deleted in get_team_rollups(organization_id):
+        if day < days[0]:
+            teams += created - deleted
+        else:
+            changes[day] = (created, deleted)
+
+    series = []
+    for day in days:
+        created, deleted = changes.get(day, (0, 0))
+        teams += created - deleted
+        series.append(trusted_construct(TeamDay, day=day, teams=teams, created=created,
+                                        deleted=deleted))
+    return series
+
+
+async def get_organization_dashboard(organization_id: UUID, days: int) -> OrganizationDashboard:
+    """
+    Build the analytics dashboard of an organization from the rollups.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        days (int): The number of days of the series, ending today (UTC).
+
+    Returns:
+        OrganizationDashboard: The current counts and the daily series.
+    """
+    today = utc_now().date()
+    series_days = _day_range(today - timedelta(days=days - 1), today)
+    member_series, members_by_role = _member_series(organization_id, series_days)
+    team_series = _team_series(organization_id, series_days)
+    logins = {day: (count, active) for day, count, active
+              in get_login_rollups(organization_id, since=series_days[0])}
+    login_series = [trusted_construct(LoginDay, day=day, logins=logins.get(day, (0, 0))[0],
+                                      active_users=logins.get(day, (0, 0))[1])
+                    for day in series_days]
+    log.info("Built the %s day dashboard of organization %s", days, organization_id)
+    return trusted_construct(OrganizationDashboard, organization_id=organization_id, days=days,
+                             members=member_series[-1].members, teams=team_series[-1].teams,
+                             members_by_role=members_by_role, member_series=member_series,
+                             team_series=team_series, login_series=login_series)
+
+
+def compute_cohort_matrix(activity_days: np.ndarray, today: int, weeks: int
+                          ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Count the members of weekly join cohorts still active in each week since joining.
+
+    Weeks are calendar weeks, a member joins in the week they signed up or joined the
+    organization, whichever is later, and is active until the week of their last login.
+
+    Args:
+        activity_days (np.ndarray): Float array of shape (members, 3), the signup, join and
+            last login day numbers (NaN if never logged in).
+        today (int): The day number of today.
+        weeks (int): The number of cohorts, ending with the current week.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The (weeks, weeks) matrix of retained members by
+            cohort and week since joining, and the boolean matrix of the cells whose week
+            has started.
+    """
+    current_week = (today + WEEK_START_SHIFT) // 7
+    start_week = (np.fmax(activity_days[:, 0], activity_days[:, 1]) + WEEK_START_SHIFT) // 7
+    last_week = (activity_days[:, 2] + WEEK_START_SHIFT) // 7
+    cohort = start_week - (current_week - weeks + 1)
+    active_weeks = np.clip(np.nan_to_num(last_week - start_week, nan=0.0), 0, weeks - 1)
+    in_range = cohort >= 0
+    cells = (cohort[in_range] * weeks + active_weeks[in_range]).astype(np.int64)
+    last_active = np.bincount(cells, minlength=weeks * weeks).reshape(weeks, weeks)
+    # Members active in week k are those whose last active week is k or later
+    retained = last_active[:, ::-1].cumsum(axis=1)[:, ::-1]
+    started = np.add.outer(np.arange(weeks), np.arange(weeks)) < weeks
+    return retained, started
+
+
+@lru_cache(maxsize=ANALYTICS_COHORT_CACHE_SIZE)
+def build_cohort_report(organization_id: UUID, day: date, weeks: int) -> CohortReport:
+    """
+    Build the cohort report of an organization, cached per organization, day and weeks.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        day (date): The UTC day of the report.
+        weeks (int): The number of cohorts and of weeks since joining.
+
+    Returns:
+        CohortReport: The cohorts and the retention curve.
+    """
+    activity_days = np.array(get_member_activity_days(organization_id), dtype=np.float64)
+    activity_days = activity_days.reshape(-1, 3)
+    retained, started = compute_cohort_matrix(activity_days, (day - EPOCH).days, weeks)
+
+    observed = np.where(started, retained, 0)
+    eligible = np.where(started, retained[:, :1], 0).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        curve = observed.sum(axis=0) / eligible
+    retention = [round(share, 4) if count else None
+                 for share, count in zip(curve.tolist(), eligible.tolist())]
+
+    first_monday = day - timedelta(days=day.weekday(), weeks=weeks - 1)
+    cohorts = [trusted_construct(Cohort, week_start=first_monday + timedelta(weeks=index),
+                                 members=row[0],
+                                 retained=[count if is_started else None
+                                           for count, is_started in zip(row, row_started)])
+               for index, (row, row_started)
+               in enumerate(zip(retained.tolist(), started.tolist()))]
+    log.info("Built the %s week cohorts of organization %s from %s members", weeks,
+             organization_id, len(activity_days))
+    return trusted_construct(CohortReport, organization_id=organization_id, weeks=weeks,
+                             cohorts=cohorts, retention=retention)
+
+
+async def get_organization_cohorts(organization_id: UUID, weeks: int) -> CohortReport:
+    """
+    Retrieve the weekly cohorts and retention of an organization.
+
+    The report is computed once per organization and day.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        weeks (int): The number of cohorts and of weeks since joining.
+
+    Returns:
+        CohortReport: The cohorts and the retention curve.
+    """
+    return build_cohort_report(organization_id, utc_now().date(), weeks)
+
+
+def rebuild_analytics_rollups() -> int:
+    """
+    Recompute the rollups from the raw tables, e.g. after restoring a backup.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    written = rebuild_rollups()
+    log.info("Rebuilt %s analytics rollup rows", written)
+    return written
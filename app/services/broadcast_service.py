@@ -0,0 +1,278 @@
+""" Broadcast Service
+
+Carries notification events between the API processes. The notification hub of every
+process publishes encoded events to a backend, and the backend delivers the events of all
+processes back to each hub in offset order. Offsets let a reconnecting client replay the
+events of a channel it missed.
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Callable
+from sqlalchemy.exc import SQLAlchemyError
+from core.config import BROADCAST_BACKEND, BROADCAST_POLL_INTERVAL_SECONDS, \
+    BROADCAST_FLUSH_INTERVAL_SECONDS, BROADCAST_BATCH_SIZE, BROADCAST_RETENTION_SECONDS, \
+    BROADCAST_REPLAY_LIMIT
+from core.logging_conf import Logging
+from db.crud.crud_event import append_events, get_events_after, get_channel_events_between, \
+    get_event_offsets, delete_events_before
+from db.read_models import EventRow
+from utils.helpers import utc_now
+
+
+log = Logging(__name__).log()
+
+Deliver = Callable[[EventRow], None]
+
+
+class BroadcastBackend:
+    """
+    Interface of the broadcast backends.
+
+    ``publish`` and ``replay`` are called from the event loop and must not wait.
+    """
+
+    async def start(self, deliver: Deliver) -> int:
+        """
+        Start delivering published events.
+
+        Args:
+            deliver (Deliver): Called with every event, in offset order.
+
+        Returns:
+            int: The offset of the last event published before the start.
+        """
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        """ Stop delivering events, pending events are published first. """
+        raise NotImplementedError
+
+    def publish(self, channel: str, message: str, coalesce_key: str | None) -> None:
+        """
+        Publish an encoded event.
+
+        Args:
+            channel (str): The channel name.
+            message (str): The encoded event.
+            coalesce_key (str | None): Queued events of the channel with an equal key
+                replace each other.
+        """
+        raise NotImplementedError
+
+    def replay(self, channel: str, after: int, until: int, limit: int
+               ) -> tuple[list[EventRow], bool]:
+        """
+        Retrieve the events of a channel a client missed.
+
+        Args:
+            channel (str): The channel name.
+            after (int): The last offset the client received.
+            until (int): The last offset delivered to the hub.
+            limit (int): The maximum number of events.
+
+        Returns:
+            tuple[list[EventRow], bool]: The events, and False if events were discarded
+                or left out by the limit.
+        """
+        raise NotImplementedError
+
+
+class MemoryBroadcast(BroadcastBackend):
+    """
+    Delivers events within the process only, for single process deployments.
+
+    Attributes:
+        buffer_size (int): The number of recent events kept for replay.
+    """
+
+    def __init__(self, buffer_size: int = BROADCAST_REPLAY_LIMIT):
+        """
+        Initialize the backend.
+
+        Args:
+            buffer_size (int): The number of recent events kept for replay.
+        """
+        self.buffer_size = buffer_size
+        self._events: deque[EventRow] = deque(maxlen=buffer_size)
+        self._offset = 0
+        self._deliver: Deliver | None = None
+
+    async def start(self, deliver: Deliver) -> int:
+        self._deliver = deliver
+        return self._offset
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    def publish(self, channel: str, message: str, coalesce_key: str | None) -> None:
+        self._offset += 1
+        event = EventRow(id=self._offset, channel=channel, message=message,
+                         coalesce_key=coalesce_key)
+        self._events.append(event)
+        if self._deliver is not None:
+            self._deliver(event)
+
+    def replay(self, channel: str, after: int, until: int, limit: int
+               ) -> tuple[list[EventRow], bool]:
+        first = self._events[0].id if self._events else self._offset + 1
+        events = [event for event in self._events
+                  if event.channel == channel and after < event.id <= until][:limit]
+        return events, after + 1 >= first and len(events) < limit
+
+
+class SQLiteBroadcast(BroadcastBackend):  # pylint: disable=too-many-instance-attributes
+    """
+    Shares events through the ``events`` table of the database.
+
+    Published events are buffered and appended in batches. Every process polls the table
+    for new events and delivers them in offset order, its own events included, so all
+    processes see the events of a channel in the same order. SQLite serializes writers,
+    so an offset is only visible once all lower offsets are.
+
+    Attributes:
+        poll_interval (float): Seconds between polls of the table.
+        flush_interval (float): Seconds published events are buffered for.
+        batch_size (int): The maximum number of events read per query.
+        retention (timedelta): How long events are kept for replay.
+    """
+
+    def __init__(self, poll_interval: float = BROADCAST_POLL_INTERVAL_SECONDS,
+                 flush_interval: float = BROADCAST_FLUSH_INTERVAL_SECONDS,
+                 batch_size: int = BROADCAST_BATCH_SIZE,
+                 retention_seconds: int = BROADCAST_RETENTION_SECONDS):
+        """
+        Initialize the backend.
+
+        Args:
+            poll_interval (float): Seconds between polls of the table.
+            flush_interval (float): Seconds published events are buffered for.
+            batch_size (int): The maximum number of events read per query.
+            retention_seconds (int): How long events are kept for replay.
+        """
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention = timedelta(seconds=retention_seconds)
+        self._pending: list[tuple[str, str, str | None]] = []
+        self._offset = 0
+        self._deliver: Deliver | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._has_pending: asyncio.Event | None = None
+        self._flushed: asyncio.Event | None = None
+
+    async def start(self, deliver: Deliver) -> int:
+        self._deliver = deliver
+        _, self._offset = await asyncio.to_thread(get_event_offsets)
+        self._has_pending = asyncio.Event()
+        self._flushed = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._flush_loop()),
+                       asyncio.create_task(self._poll_loop())]
+        return self._offset
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._flush()
+        self._deliver = None
+
+    def publish(self, channel: str, message: str, coalesce_key: str | None) -> None:
+        if not self._tasks:
+            # Not started, e.g. in the job workers: write through, the API processes
+            # deliver the event
+            append_events([(channel, message, coalesce_key)])
+            return
+        self._pending.append((channel, message, coalesce_key))
+        self._has_pending.set()
+
+    def replay(self, channel: str, after: int, until: int, limit: int
+               ) -> tuple[list[EventRow], bool]:
+        first, _ = get_event_offsets()
+        events = get_channel_events_between(channel=channel, after_id=after, until_id=until,
+                                            limit=limit)
+        return events, after + 1 >= first and len(events) < limit
+
+    async def _flush(self) -> bool:
+        """
+        Append the buffered events in one transaction, keeping them on failure.
+
+        Returns:
+            bool: False if the events could not be written.
+        """
+        batch, self._pending = self._pending, []
+        if not batch:
+            return True
+        try:
+            await asyncio.to_thread(append_events, batch)
+        except SQLAlchemyError:
+            log.exception("Publishing %s events failed, retrying", len(batch))
+            self._pending[:0] = batch
+            return False
+        self._flushed.set()
+        return True
+
+    async def _flush_loop(self) -> None:
+        """ Append buffered events, waiting briefly so bursts are written together. """
+        while True:
+            await self._has_pending.wait()
+            await asyncio.sleep(self.flush_interval)
+            self._has_pending.clear()
+            if not await self._flush():
+                await asyncio.sleep(self.poll_interval)
+            if self._pending:
+                self._has_pending.set()
+
+    async def _poll(self) -> None:
+        """ Deliver the events appended since the last poll. """
+        while True:
+            events = await asyncio.to_thread(get_events_after, after_id=self._offset,
+                                             limit=self.batch_size)
+            for event in events:
+                self._offset = event.id
+                self._deliver(event)
+            if len(events) < self.batch_size:
+                return
+
+    async def _poll_loop(self) -> None:
+        """ Poll for new events, right away after a local flush, and prune old events. """
+        pruned_at = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._flushed.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flushed.clear()
+            try:
+                await self._poll()
+                if time.monotonic() - pruned_at > self.retention.total_seconds() / 10:
+                    pruned_at = time.monotonic()
+                    await asyncio.to_thread(delete_events_before, utc_now() - self.retention)
+            except SQLAlchemyError:
+                log.exception("Reading the broadcast events failed")
+
+
+BROADCAST_BACKENDS: dict[str, type[BroadcastBackend]] = {
+    "memory": MemoryBroadcast,
+    "sqlite": SQLiteBroadcast,
+}
+
+
+def get_broadcast_backend(name: str = BROADCAST_BACKEND) -> BroadcastBackend:
+    """
+    Create the configured broadcast backend.
+
+    Args:
+        name (str): The key of the backend in ``BROADCAST_BACKENDS``.
+
+    Returns:
+        BroadcastBackend: The backend.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if name not in BROADCAST_BACKENDS:
+        raise ValueError(f"Unknown broadcast backend: {name}")
+    return BROADCAST_BACKENDS[name]()
@@ -0,0 +1,235 @@
+""" Email Service
+
+Emails are rendered when they are queued and delivered by the ``email.send_batch``
+background task. Messages to the same recipient domain are grouped into batches that
+are sent over one pooled SMTP connection.
+"""
+import re
+import smtplib
+import threading
+from collections import defaultdict
+from email.message import EmailMessage
+from functools import lru_cache
+from string import Template
+from typing import Any, Iterable
+from uuid import UUID
+import orjson
+from core.config import EMAIL_BACKEND, EMAIL_FROM, EMAIL_BATCH_SIZE, EMAIL_DOMAIN_CONCURRENCY, \
+    EMAIL_MAX_ATTEMPTS, SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_STARTTLS, \
+    SMTP_SSL, SMTP_POOL_SIZE, SMTP_IDLE_TIMEOUT_SECONDS
+from core.email_templates import EMAIL_TEMPLATES
+from core.logging_conf import Logging
+from db.crud.crud_user import get_users_by_ids
+from db.models import NotificationModel
+from utils.smtp_pool import SMTPConnectionPool
+from workers.queue import enqueue, retry_delay
+
+# pylint: disable=no-member
+
+log = Logging(__name__).log()
+
+EMAIL_TASK_NAME = "email.send_batch"
+EMAIL_QUEUE = "email"
+
+# Limits the concurrent deliveries per recipient domain within a worker process
+_DOMAIN_SLOTS: dict[str, threading.BoundedSemaphore] = {}
+_DOMAIN_SLOTS_LOCK = threading.Lock()
+
+# Line breaks, which user supplied values such as an organization name must not bring
+# into a header
+_HEADER_BREAKS = re.compile(r"[\r\n]+")
+
+
+@lru_cache(maxsize=None)
+def get_compiled_template(template_name: str) -> tuple[Template, Template]:
+    """
+    Retrieve the parsed subject and body templates of an email.
+
+    Args:
+        template_name (str): The key of the template in ``EMAIL_TEMPLATES``.
+
+    Returns:
+        tuple[Template, Template]: The subject and body templates.
+
+    Raises:
+        KeyError: If the template does not exist.
+    """
+    template = EMAIL_TEMPLATES[template_name]
+    return Template(template["subject"]), Template(template["body"])
+
+
+def render_email(template_name: str, context: dict[str, Any]) -> tuple[str, str]:
+    """
+    Render the subject and body of an email, line breaks in the subject become spaces.
+
+    Args:
+        template_name (str): The key of the template in ``EMAIL_TEMPLATES``.
+        context (dict[str, Any]): The placeholder values.
+
+    Returns:
+        tuple[str, str]: The subject and body.
+    """
+    subject, body = get_compiled_template(template_name)
+    return _HEADER_BREAKS.sub(" ", subject.substitute(context)), body.substitute(context)
+
+
+def queue_emails(emails: Iterable[tuple[str, str, dict[str, Any]]]) -> list[UUID]:
+    """
+    Render emails and enqueue them for delivery in batches per recipient domain.
+
+    Args:
+        emails (Iterable[tuple[str, str, dict[str, Any]]]): The recipient address, template
+            name and template context of every email.
+
+    Returns:
+        list[UUID]: The IDs of the enqueued delivery jobs.
+    """
+    by_domain = defaultdict(list)
+    for recipient, template_name, context in emails:
+        subject, body = render_email(template_name, context)
+        domain = recipient.rpartition("@")[2].lower()
+        by_domain[domain].append({"to": recipient, "subject": subject, "body": body})
+
+    job_ids = []
+    for domain, messages in by_domain.items():
+        for start in range(0, len(messages), EMAIL_BATCH_SIZE):
+            job_ids.append(enqueue(EMAIL_TASK_NAME, {
+                "domain": domain, "messages": messages[start:start + EMAIL_BATCH_SIZE]
+            }, queue=EMAIL_QUEUE))
+    return job_ids
+
+
+def queue_reminder_emails(notifications: list[NotificationModel]) -> list[UUID]:
+    """
+    Enqueue the emails of fired reminders.
+
+    Args:
+        notifications (list[NotificationModel]): The reminder notifications.
+
+    Returns:
+        list[UUID]: The IDs of the enqueued delivery jobs.
+    """
+    users = {user.id: user for user in
+             get_users_by_ids([notification.user_id for notification in notifications])}
+    return queue_emails(
+        (users[notification.user_id].email, "reminder",
+         {"full_name": users[notification.user_id].full_name,
+          "message": notification.message,
+          "due_at": orjson.loads(notification.payload)["due_at"]})
+        for notification in notifications if notification.user_id in users)
+
+
+@lru_cache(maxsize=1)
+def get_smtp_pool() -> SMTPConnectionPool:
+    """
+    Retrieve the SMTP connection pool of the process.
+
+    Returns:
+        SMTPConnectionPool: The pool.
+    """
+    return SMTPConnectionPool(SMTP_HOST, SMTP_PORT, username=SMTP_USERNAME,
+                              password=SMTP_PASSWORD, starttls=SMTP_STARTTLS, use_ssl=SMTP_SSL,
+                              size=SMTP_POOL_SIZE, idle_timeout=SMTP_IDLE_TIMEOUT_SECONDS)
+
+
+def _get_domain_slot(domain: str) -> threading.BoundedSemaphore:
+    """
+    Retrieve the semaphore limiting concurrent deliveries to a domain.
+
+    Args:
+        domain (str): The recipient domain.
+
+    Returns:
+        threading.BoundedSemaphore: The semaphore.
+    """
+    with _DOMAIN_SLOTS_LOCK:
+        if domain not in _DOMAIN_SLOTS:
+            _DOMAIN_SLOTS[domain] = threading.BoundedSemaphore(EMAIL_DOMAIN_CONCURRENCY)
+        return _DOMAIN_SLOTS[domain]
+
+
+def _build_message(message: dict[str, str]) -> EmailMessage:
+    """
+    Build the MIME message of a rendered email.
+
+    Args:
+        message (dict[str, str]): The recipient, subject and body.
+
+    Returns:
+        EmailMessage: The message.
+    """
+    email = EmailMessage()
+    email["From"] = EMAIL_FROM
+    email["To"] = message["to"]
+    email["Subject"] = message["subject"]
+    email.set_content(message["body"])
+    return email
+
+
+def _send_messages(pending: list[dict[str, str]]) -> None:
+    """
+    Send messages over one pooled connection, removing each from the list once handled.
+
+    Permanently rejected messages (5xx) and messages that cannot be built, e.g. with an
+    invalid header, are logged and dropped.
+
+    Args:
+        pending (list[dict[str, str]]): The messages, consumed from the front.
+
+    Raises:
+        smtplib.SMTPException: On a temporary failure, the unsent messages stay in the list.
+        OSError: If the connection fails.
+    """
+    with get_smtp_pool().connection() as smtp:
+        while pending:
+            message = pending[0]
+            try:
+                email = _build_message(message)
+            except (ValueError, TypeError) as error:
+                log.error("Email to %s dropped, invalid message: %s", message["to"], error)
+                pending.pop(0)
+                continue
+            try:
+                smtp.send_message(email)
+            except smtplib.SMTPRecipientsRefused as error:
+                log.error("Email to %s refused: %s", message["to"], error.recipients)
+            except smtplib.SMTPResponseException as error:
+                if error.smtp_code < 500:
+                    raise
+                log.error("Email to %s rejected: %s %s", message["to"], error.smtp_code,
+                          error.smtp_error)
+            pending.pop(0)
+
+
+def deliver_email_batch(domain: str, messages: list[dict[str, str]], attempt: int = 1) -> None:
+    """
+    Deliver a batch of rendered emails to one recipient domain.
+
+    On a temporary failure the unsent messages are enqueued again with backoff, so the
+    messages already delivered are never sent twice.
+
+    Args:
+        domain (str): The recipient domain of the batch.
+        messages (list[dict[str, str]]): The recipient, subject and body of every email.
+        attempt (int): The delivery attempt of the batch.
+    """
+    if EMAIL_BACKEND == "console":
+        for message in messages:
+            log.info("Email to %s: %s\n%s", message["to"], message["subject"], message["body"])
+        return
+
+    pending = list(messages)
+    with _get_domain_slot(domain):
+        try:
+            _send_messages(pending)
+        except (smtplib.SMTPException, OSError) as error:
+            if attempt >= EMAIL_MAX_ATTEMPTS:
+                log.error("Dropping %s emails to %s after %s attempts: %s",
+                          len(pending), domain, attempt, error)
+                return
+            log.warning("Email delivery to %s failed, retrying %s emails: %s",
+                        domain, len(pending), error)
+            enqueue(EMAIL_TASK_NAME, {"domain": domain, "messages": pending,
+                                      "attempt": attempt + 1},
+                    queue=EMAIL_QUEUE, delay_seconds=retry_delay(attempt))
+    log.info("Delivered %s emails to %s", len(messages) - len(pending), domain)
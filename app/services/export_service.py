@@ -0,0 +1,337 @@
+""" Organization Export Service.
+
+Exports snapshot an organization into one gzip file per dataset. They run as background
+jobs: every page is read by keyset pagination in its own short transaction, compressed
+and appended to the file as a separate gzip member. A checkpoint written after each
+page records the file offset and the last key, so an interrupted export resumes where
+it stopped instead of starting over.
+"""
+import asyncio
+import gzip
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+from uuid import UUID
+import orjson
+from core.config import EXPORT_DIR, EXPORT_PAGE_SIZE
+from core.logging_conf import Logging
+from db.crud.crud_job import get_job_by_id
+from db.crud.crud_organization import get_organization_version, get_organization_members_after, \
+    get_organization_member_count_by_organization_id
+from db.crud.crud_team import get_organization_teams_after, get_team_count_by_organization_id
+from db.crud.curd_role import get_organization_roles_after, get_role_count_by_organization_id, \
+    get_organization_role_permissions_after, get_role_permission_count_by_organization_id
+from db.models.job import JOB_STATUS_SUCCEEDED
+from db.read_models import OrganizationMemberRow, TeamRow, RoleRow, RolePermissionRow
+from exceptions import http_exceptions
+from schemas.common import trusted_construct
+from schemas.export import ExportJobResponse, ExportFile
+from utils.exporters import ExportFormat, encode_rows
+from utils.helpers import generate_uuid7
+from workers.queue import enqueue, report_progress
+
+# pylint: disable=no-member
+
+log = Logging(__name__).log()
+
+EXPORT_TASK_NAME = "export.organization"
+EXPORT_QUEUE = "exports"
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+@dataclass(slots=True, frozen=True)
+class ExportDataset:
+    """
+    A dataset written to its own export file.
+
+    Attributes:
+        name (str): The dataset name, used as file name.
+        row_type (type): The dataclass of the rows.
+        fetch_page (Callable): Returns the rows after a key: (organization_id, after, limit).
+        count (Callable): Returns the number of rows of the organization.
+        key (Callable): Returns the keyset pagination key of a row.
+    """
+    name: str
+    row_type: type
+    fetch_page: Callable[[UUID, Any, int], list]
+    count: Callable[[UUID], int]
+    key: Callable[[Any], Any]
+
+
+EXPORT_DATASETS = (
+    ExportDataset("members", OrganizationMemberRow, get_organization_members_after,
+                  get_organization_member_count_by_organization_id, lambda row: row.user_id),
+    ExportDataset("teams", TeamRow, get_organization_teams_after,
+                  get_team_count_by_organization_id, lambda row: row.id),
+    ExportDataset("roles", RoleRow, get_organization_roles_after,
+                  get_role_count_by_organization_id, lambda row: row.id),
+    ExportDataset("role_permissions", RolePermissionRow, get_organization_role_permissions_after,
+                  get_role_permission_count_by_organization_id,
+                  lambda row: (row.role_id, row.permission_id)),
+)
+
+
+def get_export_directory(export_id: UUID) -> Path:
+    """
+    Retrieve the directory holding the files of an export.
+
+    Args:
+        export_id (UUID): The ID of the export.
+
+    Returns:
+        Path: The export directory.
+    """
+    return EXPORT_DIR / str(export_id)
+
+
+def get_export_file_name(dataset: str, export_format: ExportFormat) -> str:
+    """
+    Build the file name of an exported dataset.
+
+    Args:
+        dataset (str): The dataset name.
+        export_format (ExportFormat): "ndjson" or "csv".
+
+    Returns:
+        str: The file name, e.g. ``members.csv.gz``.
+    """
+    return f"{dataset}.{export_format}.gz"
+
+
+def _decode_key(value: Any) -> Any:
+    """
+    Convert a checkpointed key back to UUIDs.
+
+    Args:
+        value (Any): The JSON value, a UUID string, a list of UUID strings or None.
+
+    Returns:
+        Any: The key as passed to ``fetch_page``.
+    """
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return tuple(UUID(part) for part in value)
+    return UUID(value)
+
+
+def _load_checkpoint(directory: Path, export_format: ExportFormat) -> dict[str, dict]:
+    """
+    Load the checkpoint of an interrupted export.
+
+    Args:
+        directory (Path): The export directory.
+        export_format (ExportFormat): The format of the export.
+
+    Returns:
+        dict[str, dict]: The state per dataset, empty when starting from scratch.
+    """
+    path = directory / CHECKPOINT_FILE
+    if not path.exists():
+        return {}
+    checkpoint = orjson.loads(path.read_bytes())
+    if checkpoint.get("format") != export_format:
+        return {}
+    return checkpoint["datasets"]
+
+
+def _save_checkpoint(directory: Path, export_format: ExportFormat,
+                     datasets: dict[str, dict]) -> None:
+    """
+    Atomically replace the checkpoint of an export.
+
+    Args:
+        directory (Path): The export directory.
+        export_format (ExportFormat): The format of the export.
+        datasets (dict[str, dict]): The state per dataset.
+    """
+    path = directory / CHECKPOINT_FILE
+    temporary = path.with_suffix(".tmp")
+    temporary.write_bytes(orjson.dumps({"format": export_format, "datasets": datasets}))
+    os.replace(temporary, path)
+
+
+def _export_dataset(organization_id: UUID, dataset: ExportDataset,  # pylint: disable=too-many-arguments, too-many-positional-arguments
+                    export_format: ExportFormat, directory: Path, state: dict[str, Any],
+                    on_page: Callable[[int], None]) -> None:
+    """
+    Append the remaining pages of a dataset to its export file.
+
+    Args:
+        organization_id (UUID): The ID of the exported organization.
+        dataset (ExportDataset): The dataset.
+        export_format (ExportFormat): "ndjson" or "csv".
+        directory (Path): The export directory.
+        state (dict[str, Any]): The checkpoint state of the dataset, updated in place.
+        on_page (Callable[[int], None]): Called with the row count of every written page.
+    """
+    path = directory / get_export_file_name(dataset.name, export_format)
+    with open(path, "r+b" if path.exists() else "wb") as file:
+        # Drop whatever was written after the last checkpoint
+        file.truncate(state["offset"])
+        file.seek(state["offset"])
+        while True:
+            after = _decode_key(state["after"])
+            rows = dataset.fetch_page(organization_id, after, EXPORT_PAGE_SIZE)
+            data = b"".join(encode_rows(rows, dataset.row_type, export_format,
+                                        header=after is None))
+            if data:
+                file.write(gzip.compress(data))
+                file.flush()
+                os.fsync(file.fileno())
+                state["offset"] = file.tell()
+            if rows:
+                key = dataset.key(rows[-1])
+                state["after"] = [str(part) for part in key] if isinstance(key, tuple) \
+                    else str(key)
+                state["rows"] += len(rows)
+                on_page(len(rows))
+            if len(rows) < EXPORT_PAGE_SIZE:
+                break
+    state["done"] = True
+
+
+def run_organization_export(export_id: UUID, organization_id: UUID,
+                            export_format: ExportFormat) -> None:
+    """
+    Write all datasets of an organization export, resuming from its checkpoint.
+
+    Args:
+        export_id (UUID): The ID of the export.
+        organization_id (UUID): The ID of the exported organization.
+        export_format (ExportFormat): "ndjson" or "csv".
+    """
+    directory = get_export_directory(export_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    datasets = _load_checkpoint(directory, export_format)
+    for dataset in EXPORT_DATASETS:
+        datasets.setdefault(dataset.name, {"offset": 0, "after": None, "rows": 0, "done": False})
+
+    total = sum(dataset.count(organization_id) for dataset in EXPORT_DATASETS) or 1
+    written = sum(state["rows"] for state in datasets.values())
+    log.info("Export %s of organization %s: %s of %s rows already written",
+             export_id, organization_id, written, total)
+
+    for dataset in EXPORT_DATASETS:
+        state = datasets[dataset.name]
+        if state["done"]:
+            continue
+
+        def on_page(rows: int) -> None:
+            nonlocal written
+            written += rows
+            _save_checkpoint(directory, export_format, datasets)
+            report_progress(min(99, written * 100 // total))
+
+        _export_dataset(organization_id, dataset, export_format, directory, state, on_page)
+        _save_checkpoint(directory, export_format, datasets)
+    log.info("Export %s of organization %s finished", export_id, organization_id)
+
+
+async def start_organization_export(organization_id: UUID,
+                                    export_format: ExportFormat) -> ExportJobResponse:
+    """
+    Enqueue a background export of an organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        export_format (ExportFormat): "ndjson" or "csv".
+
+    Returns:
+        ExportJobResponse: The queued export.
+
+    Raises:
+        HTTPException: If the organization is not found.
+    """
+    if not get_organization_version(organization_id=organization_id):
+        raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
+    export_id = generate_uuid7()
+    await asyncio.to_thread(enqueue, EXPORT_TASK_NAME,
+                            {"export_id": export_id, "organization_id": organization_id,
+                             "export_format": export_format},
+                            queue=EXPORT_QUEUE, job_id=export_id)
+    return await get_organization_export(organization_id=organization_id, export_id=export_id)
+
+
+def _get_export_job(organization_id: UUID, export_id: UUID) -> tuple[Any, dict[str, Any]]:
+    """
+    Retrieve the job of an export of an organization.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        export_id (UUID): The ID of the export.
+
+    Returns:
+        tuple[JobModel, dict[str, Any]]: The job and its payload.
+
+    Raises:
+        HTTPException: If no export with the ID exists for the organization.
+    """
+    job = get_job_by_id(job_id=export_id)
+    if not job or job.task_name != EXPORT_TASK_NAME:
+        raise http_exceptions.EXPORT_NOT_FOUND_EXCEPTION
+    payload = orjson.loads(job.payload)
+    if payload["organization_id"] != str(organization_id):
+        raise http_exceptions.EXPORT_NOT_FOUND_EXCEPTION
+    return job, payload
+
+
+async def get_organization_export(organization_id: UUID, export_id: UUID) -> ExportJobResponse:
+    """
+    Retrieve the status and, once finished, the files of an export.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        export_id (UUID): The ID of the export.
+
+    Returns:
+        ExportJobResponse: The export.
+
+    Raises:
+        HTTPException: If the export is not found.
+    """
+    job, payload = _get_export_job(organization_id, export_id)
+    files = []
+    if job.status == JOB_STATUS_SUCCEEDED:
+        directory = get_export_directory(export_id)
+        for dataset in EXPORT_DATASETS:
+            path = directory / get_export_file_name(dataset.name, payload["export_format"])
+            if path.exists():
+                files.append(trusted_construct(
+                    ExportFile, dataset=dataset.name, size=path.stat().st_size,
+                    url=f"/api/v1/organization/{organization_id}/exports/{export_id}"
+                        f"/files/{dataset.name}"))
+    return trusted_construct(ExportJobResponse, id=job.id, organization_id=organization_id,
+                             format=payload["export_format"], status=job.status,
+                             progress=job.progress, error=job.last_error,
+                             created_at=job.created_at, finished_at=job.finished_at, files=files)
+
+
+async def get_organization_export_file(organization_id: UUID, export_id: UUID,
+                                       dataset: str) -> Path:
+    """
+    Retrieve the path of a file of a finished export.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        export_id (UUID): The ID of the export.
+        dataset (str): The dataset name.
+
+    Returns:
+        Path: The path of the gzip file.
+
+    Raises:
+        HTTPException: If the export or the dataset is not found, or the export is not
+            finished yet.
+    """
+    job, payload = _get_export_job(organization_id, export_id)
+    if dataset not in {item.name for item in EXPORT_DATASETS}:
+        raise http_exceptions.EXPORT_NOT_FOUND_EXCEPTION
+    if job.status != JOB_STATUS_SUCCEEDED:
+        raise http_exceptions.EXPORT_NOT_READY_EXCEPTION
+    path = get_export_directory(export_id) / get_export_file_name(dataset,
+                                                                  payload["export_format"])
+    if not path.exists():
+        raise http_exceptions.EXPORT_NOT_FOUND_EXCEPTION
+    return path
@@ -0,0 +1,495 @@
+""" Notification Service
+
+WebSocket connections subscribe to channels such as ``organization:<id>`` and
+``team:<id>``. A published event is encoded once and sent through the broadcast backend
+to every API process, which puts it on the bounded send queue of each subscribed
+connection, so a slow client only ever delays itself.
+"""
+import asyncio
+from collections import OrderedDict, defaultdict
+from itertools import count
+from typing import Any, Callable, Hashable
+from uuid import UUID
+import orjson
+from core.config import WS_SEND_QUEUE_SIZE, WS_BACKPRESSURE_POLICY, BROADCAST_REPLAY_LIMIT
+from core.logging_conf import Logging
+from db.cache import ENTITY_CACHES
+from db.models import NotificationModel
+from db.read_models import EventRow
+from services.broadcast_service import BroadcastBackend, get_broadcast_backend
+from utils.helpers import utc_now
+
+# pylint: disable=no-member
+
+log = Logging(__name__).log()
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+BACKPRESSURE_POLICIES = (DROP_OLDEST, COALESCE)
+CHANNEL_KINDS = ("organization", "team", "user")
+# Events after which connections lose access to their channel, with the data field of
+# the user who does, None for everyone
+REVOKING_EVENTS = {
+    "organization.deleted": None,
+    "organization.member_removed": "user_id",
+    "team.deleted": None,
+}
+# Channels of the entity cache invalidations, not subscribable by the clients
+CACHE_CHANNEL_KIND = "cache"
+
+
+def channel_name(kind: str, object_id: UUID) -> str:
+    """
+    Build the name of a channel.
+
+    Args:
+        kind (str): One of ``CHANNEL_KINDS``.
+        object_id (UUID): The ID of the organization, team or user.
+
+    Returns:
+        str: The channel name, e.g. ``organization:<id>``.
+    """
+    return f"{kind}:{object_id}"
+
+
+def encode_event(channel: str, event_type: str, data: dict[str, Any]) -> str:
+    """
+    Encode an event as sent to the clients.
+
+    Args:
+        channel (str): The channel of the event.
+        event_type (str): The event type, e.g. ``organization.updated``.
+        data (dict[str, Any]): The event data.
+
+    Returns:
+        str: The JSON message.
+    """
+    return orjson.dumps({"type": event_type, "channel": channel, "data": data,
+                         "sent_at": utc_now()}).decode()
+
+
+def with_offset(event: EventRow) -> str:
+    """
+    Add the offset to an encoded event.
+
+    The offset is spliced into the JSON object, so the message shared by all
+    connections is not decoded again.
+
+    Args:
+        event (EventRow): The delivered event.
+
+    Returns:
+        str: The JSON message starting with the offset.
+    """
+    return f'{{"offset":{event.id},{event.message[1:]}'
+
+
+class Connection:  # pylint: disable=too-many-instance-attributes
+    """
+    The bounded send queue of a WebSocket connection.
+
+    With the ``coalesce`` policy an event with a coalesce key replaces the queued event
+    with the same key, so a burst of updates to one object is sent as its latest state.
+    When the queue is full the oldest event is dropped and the client is told how many
+    events it missed, so it can reload what it shows.
+
+    Attributes:
+        user_id (UUID): The ID of the connected user.
+        channels (set[str]): The subscribed channels.
+        max_queue (int): The maximum number of queued events.
+        policy (str): One of ``BACKPRESSURE_POLICIES``.
+        dropped (int): The number of events dropped since the connection opened.
+    """
+
+    def __init__(self, user_id: UUID, max_queue: int = WS_SEND_QUEUE_SIZE,
+                 policy: str = WS_BACKPRESSURE_POLICY):
+        """
+        Initialize an empty send queue.
+
+        Args:
+            user_id (UUID): The ID of the connected user.
+            max_queue (int): The maximum number of queued events.
+            policy (str): One of ``BACKPRESSURE_POLICIES``.
+
+        Raises:
+            ValueError: If the policy is unknown.
+        """
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.user_id = user_id
+        self.channels: set[str] = set()
+        self.max_queue = max_queue
+        self.policy = policy
+        self.dropped = 0
+        self._missed = 0
+        self._queue: OrderedDict[Hashable, str] = OrderedDict()
+        self._sequence = count()
+        self._ready = asyncio.Event()
+
+    def __len__(self) -> int:
+        """ Return the number of queued events. """
+        return len(self._queue)
+
+    def put(self, message: str, coalesce_key: Hashable | None = None) -> None:
+        """
+        Queue an encoded event without waiting.
+
+        Args:
+            message (str): The encoded event.
+            coalesce_key (Hashable | None): Events with equal keys replace each other.
+        """
+        if self.policy == COALESCE and coalesce_key is not None:
+            if coalesce_key in self._queue:
+                self._queue[coalesce_key] = message
+                return
+            key = coalesce_key
+        else:
+            key = next(self._sequence)
+        if len(self._queue) >= self.max_queue:
+            self._queue.popitem(last=False)
+            self.dropped += 1
+            self._missed += 1
+        self._queue[key] = message
+        self._ready.set()
+
+    def get_nowait(self) -> str | None:
+        """
+        Take the next message to send.
+
+        Returns:
+            str | None: The message, None if the queue is empty.
+        """
+        if not self._queue:
+            self._ready.clear()
+            return None
+        if self._missed:
+            missed, self._missed = self._missed, 0
+            return orjson.dumps({"type": "events.dropped", "count": missed}).decode()
+        return self._queue.popitem(last=False)[1]
+
+    async def get(self, timeout: float | None = None) -> str | None:
+        """
+        Wait for the next message to send.
+
+        Args:
+            timeout (float | None): Seconds to wait, forever if None.
+
+        Returns:
+            str | None: The message, None if the timeout expired.
+        """
+        message = self.get_nowait()
+        if message is not None:
+            return message
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.get_nowait()
+
+
+class NotificationHub:
+    """
+    Publish/subscribe of events to the WebSocket connections of the process.
+
+    All methods but ``publish`` must be called from the event loop of the connections,
+    ``publish`` may be called from the threads running the blocking units of work too.
+    Before ``start`` events are only published, e.g. from the job workers.
+
+    Attributes:
+        backend (BroadcastBackend): Carries the events between the processes.
+        offset (int): The offset of the last delivered event.
+        published (int): The number of events published by the process.
+    """
+
+    def __init__(self, backend: BroadcastBackend):
+        """
+        Initialize a hub without connections.
+
+        Args:
+            backend (BroadcastBackend): Carries the events between the processes.
+        """
+        self.backend = backend
+        self.offset = 0
+        self.published = 0
+        self._connections: set[Connection] = set()
+        self._channels: dict[str, set[Connection]] = defaultdict(set)
+        self._listeners: list[Callable[[EventRow], None]] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def add_listener(self, listener: Callable[[EventRow], None]) -> None:
+        """
+        Register a function called with every delivered event, e.g. to update a cache.
+
+        Args:
+            listener (Callable[[EventRow], None]): The function, must not block.
+        """
+        self._listeners.append(listener)
+
+    async def start(self) -> None:
+        """ Start delivering the events of all processes to the connections. """
+        self._loop = asyncio.get_running_loop()
+        self.offset = await self.backend.start(self.deliver)
+        log.info("Notification hub started at offset %s", self.offset)
+
+    async def stop(self) -> None:
+        """ Publish the pending events and stop delivering. """
+        await self.backend.stop()
+        self._loop = None
+
+    @property
+    def connection_count(self) -> int:
+        """ The number of open connections. """
+        return len(self._connections)
+
+    def connect(self, user_id: UUID) -> Connection:
+        """
+        Register a new connection of a user.
+
+        Args:
+            user_id (UUID): The ID of the connected user.
+
+        Returns:
+            Connection: The connection.
+        """
+        connection = Connection(user_id=user_id)
+        self._connections.add(connection)
+        log.info("User %s connected, %s open connections", user_id, self.connection_count)
+        return connection
+
+    def disconnect(self, connection: Connection) -> None:
+        """
+        Remove a connection and its subscriptions.
+
+        Args:
+            connection (Connection): The connection.
+        """
+        for channel in list(connection.channels):
+            self.unsubscribe(connection, channel)
+        self._connections.discard(connection)
+        log.info("User %s disconnected, %s open connections", connection.user_id,
+                 self.connection_count)
+
+    def subscribe(self, connection: Connection, channel: str) -> None:
+        """
+        Subscribe a connection to a channel.
+
+        Args:
+            connection (Connection): The connection.
+            channel (str): The channel name.
+        """
+        self._channels[channel].add(connection)
+        connection.channels.add(channel)
+
+    def unsubscribe(self, connection: Connection, channel: str) -> None:
+        """
+        Unsubscribe a connection from a channel.
+
+        Args:
+            connection (Connection): The connection.
+            channel (str): The channel name.
+        """
+        connection.channels.discard(channel)
+        subscribers = self._channels.get(channel)
+        if subscribers is None:
+            return
+        subscribers.discard(connection)
+        if not subscribers:
+            del self._channels[channel]
+
+    def unsubscribe_user(self, channel: str, user_id: UUID | None = None) -> None:
+        """
+        Unsubscribe the connections of a user, or of everyone, from a channel.
+
+        Applied in every process when an event in ``REVOKING_EVENTS`` is delivered.
+
+        Args:
+            channel (str): The channel name.
+            user_id (UUID | None): The ID of the user, all users if None.
+        """
+        for connection in list(self._channels.get(channel, ())):
+            if user_id is None or connection.user_id == user_id:
+                self.unsubscribe(connection, channel)
+
+    def deliver(self, event: EventRow) -> int:
+        """
+        Queue an event on every connection subscribed to its channel.
+
+        After an event revoking access to the channel, e.g. the removal of a member, the
+        connections losing access are unsubscribed once it is queued on them.
+
+        Args:
+            event (EventRow): The event delivered by the backend.
+
+        Returns:
+            int: The number of connections the event was queued on.
+        """
+        self.offset = event.id
+        for listener in self._listeners:
+            listener(event)
+        subscribers = self._channels.get(event.channel, ())
+        if not subscribers:
+            return 0
+        message = with_offset(event)
+        key = (event.channel, event.coalesce_key) if event.coalesce_key is not None else None
+        for connection in subscribers:
+            connection.put(message, key)
+        delivered = len(subscribers)
+        self._revoke_access(event)
+        return delivered
+
+    def _revoke_access(self, event: EventRow) -> None:
+        """
+        Unsubscribe the connections that lost access to the channel of an event.
+
+        Args:
+            event (EventRow): The delivered event.
+        """
+        message = orjson.loads(event.message)
+        if message["type"] not in REVOKING_EVENTS:
+            return
+        user_field = REVOKING_EVENTS[message["type"]]
+        user_id = UUID(message["data"][user_field]) if user_field is not None else None
+        self.unsubscribe_user(event.channel, user_id=user_id)
+
+    def replay(self, connection: Connection, channel: str, after: int) -> bool:
+        """
+        Queue the events of a channel published after an offset on a connection.
+
+        Only events already delivered are replayed, later events follow through the
+        subscription, so no event is missed or queued twice when the connection is
+        subscribed right after without awaiting.
+
+        Args:
+            connection (Connection): The connection.
+            channel (str): The channel name.
+            after (int): The offset of the last event the client received.
+
+        Returns:
+            bool: False if some events are no longer available, the client should reload.
+        """
+        events, complete = self.backend.replay(channel, after, self.offset,
+                                               BROADCAST_REPLAY_LIMIT)
+        for event in events:
+            key = (channel, event.coalesce_key) if event.coalesce_key is not None else None
+            connection.put(with_offset(event), key)
+        return complete
+
+    def publish(self, channel: str, event_type: str, data: dict[str, Any],
+                coalesce_key: Hashable | None = None) -> None:
+        """
+        Publish an event to a channel in all processes.
+
+        Args:
+            channel (str): The channel name.
+            event_type (str): The event type, e.g. ``organization.updated``.
+            data (dict[str, Any]): The event data.
+            coalesce_key (Hashable | None): Queued events of the channel with an equal key
+                are replaced by this one.
+        """
+        message = encode_event(channel, event_type, data)
+        key = str(coalesce_key) if coalesce_key is not None else None
+        try:
+            off_loop = asyncio.get_running_loop() is not self._loop
+        except RuntimeError:
+            off_loop = True
+        if self._loop is not None and off_loop:
+            # Called from a thread, the backend is handed the event on the event loop
+            self._loop.call_soon_threadsafe(self._publish, channel, message, key)
+        else:
+            self._publish(channel, message, key)
+
+    def _publish(self, channel: str, message: str, coalesce_key: str | None) -> None:
+        """
+        Hand an encoded event to the backend, from the event loop once started.
+
+        Args:
+            channel (str): The channel name.
+            message (str): The encoded event.
+            coalesce_key (str | None): The coalescing key of the event.
+        """
+        self.published += 1
+        self.backend.publish(channel, message, coalesce_key)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Retrieve the hub metrics.
+
+        Returns:
+            dict[str, int]: The open connections, subscribed channels, delivered offset,
+                published events, queued events and dropped events.
+        """
+        return {
+            "connections": self.connection_count,
+            "offset": self.offset,
+            "channels": len(self._channels),
+            "published": self.published,
+            "queued": sum(len(connection) for connection in self._connections),
+            "dropped": sum(connection.dropped for connection in self._connections),
+        }
+
+
+notification_hub = NotificationHub(get_broadcast_backend())
+
+
+def publish_event(channel: str, event_type: str, data: dict[str, Any],
+                  coalesce_key: Hashable | None = None) -> None:
+    """
+    Publish an event to the WebSocket clients subscribed to a channel.
+
+    Args:
+        channel (str): The channel name, see ``channel_name``.
+        event_type (str): The event type, e.g. ``organization.updated``.
+        data (dict[str, Any]): The event data.
+        coalesce_key (Hashable | None): Queued events of the channel with an equal key
+            are replaced by this one.
+    """
+    notification_hub.publish(channel, event_type, data, coalesce_key)
+
+
+def publish_notifications(notifications: list[NotificationModel]) -> None:
+    """
+    Publish created notifications to the channels of their users.
+
+    Args:
+        notifications (list[NotificationModel]): The notifications.
+    """
+    for notification in notifications:
+        publish_event(channel_name("user", notification.user_id), "notification.created", {
+            "id": notification.id, "type": notification.type, "message": notification.message,
+            "organization_id": notification.organization_id,
+            "created_at": notification.created_at})
+
+
+def publish_cache_invalidation(entity: str, entity_id: str) -> None:
+    """
+    Publish the invalidation of a cached entity to the other processes.
+
+    Registered as listener of the entity caches.
+
+    Args:
+        entity (str): The entity type, the name of its cache.
+        entity_id (str): The ID of the entity.
+    """
+    notification_hub.publish(f"{CACHE_CHANNEL_KIND}:{entity}", "cache.invalidated",
+                             {"id": entity_id})
+
+
+def evict_invalidated_entity(event: EventRow) -> None:
+    """
+    Evict an entity invalidated by any process from the cache of this process.
+
+    Registered as notification hub listener.
+
+    Args:
+        event (EventRow): The delivered event.
+    """
+    kind, _, entity = event.channel.partition(":")
+    cache = _entity_caches.get(entity) if kind == CACHE_CHANNEL_KIND else None
+    if cache is not None:
+        cache.evict(orjson.loads(event.message)["data"]["id"])
+
+
+_entity_caches = {cache.name: cache for cache in ENTITY_CACHES}
+for _cache in ENTITY_CACHES:
+    _cache.listeners.append(publish_cache_invalidation)
+notification_hub.add_listener(evict_invalidated_entity)
@@ -1,4 +1,7 @@
 """ Org Service """
+import asyncio
+from datetime import datetime
+from typing import Iterator
 from uuid import UUID
 from fastapi import HTTPException, status
 from core.logging_conf import Logging
@@ -7,23 +10,35 @@ from db.crud.crud_organization import get_organization_by_name, update_organizat
     get_organizations_by_member_id, get_organization_by_id, create_organization, \
     get_organization_member_count_by_organization_id, delete_organizations_by_id, \
     get_organization_member_by_organization_user_id, get_organization_members_by_organization_id, \
-    update_organization, update_organization_member_role, delete_organization_member_by_id
+    update_organization, update_organization_member_role, delete_organization_member_by_id, \
+    get_organization_version, iter_organization_members
 from db.crud.crud_permission import get_permission_by_name, get_permission_by_id, create_permissions
 from db.crud.crud_user import get_user_by_username, get_user_by_id
 from db.crud.curd_role import get_role_permission, get_role_by_id, create_role, \
     update_role_permission, get_role_by_role_name_org_id, get_all_organization_roles, \
     get_permission_ids_for_role
+from db.read_models import OrganizationMemberRow
 from exceptions import http_exceptions
+from schemas.common import trusted_construct, trusted_from_attributes
 from schemas.organization import CreateOrganization, Organization, OrganizationResponse, \
     AddOrganizationMembersRequest, OrganizationMemberResponse, OrganizationByIDResponse, \
     UpdateOrganization, OrganizationMembersResponse, OrganizationMemberData
 from schemas.role import RoleShort, RoleResponse, CreateCustomRole, CreateRole, Permission, \
     AllRoleResponse, Role, PermissionsResponse
 from schemas.user import UserProfileShort, User
+from services.email_service import queue_emails
+from services.notification_service import publish_event, channel_name
+from utils.exporters import ExportFormat, encode_rows
+from utils.http_cache import CacheValidators, build_cache_validators, verify_if_match
+from utils.single_flight import SingleFlight
 
 
 log = Logging(__name__).log()
 
+# Identical concurrent lookups of the hot organization pages share one query
+organization_lookups = SingleFlight("organization")
+member_count_lookups = SingleFlight("organization_member_count")
+
 async def map_role_permissions(role_id: UUID, permissions: list[str | UUID]) -> None:
     """
     Update the role_permission table.
@@ -45,7 +60,7 @@ async def map_role_permissions(role_id: UUID, permissions: list[str | UUID]) ->
 
     if not permission:
         raise http_exceptions.PERMISSION_NOT_FOUND_EXCEPTION
-    update_role_permission(role_id=role_id, permission_id=permission.id)
+    await asyncio.to_thread(update_role_permission, role_id=role_id, permission_id=permission.id)
     return await map_role_permissions(role_id=role_id, permissions=permissions[1:])
 
 
@@ -59,7 +74,7 @@ async def create_default_organization_role_permissions(organization_id: UUID):
     # Create permissions only if not present
     for perm in ALL_PERMISSIONS:
         if not get_permission_by_name(permission_name=perm['name']):
-            create_permissions(permission_data=perm)
+            await asyncio.to_thread(create_permissions, permission_data=perm)
 
     # Create roles and assign permissions only if role not present
     for role_data in ORGANIZATION_ROLES.values():
@@ -67,7 +82,7 @@ async def create_default_organization_role_permissions(organization_id: UUID):
             role = CreateRole(name=role_data['name'], description=role_data['description'],
                               organization_id=organization_id)
             role = role.model_dump(exclude_unset=True)
-            created_role = create_role(role)
+            created_role = await asyncio.to_thread(create_role, role)
             role_id = created_role.id
             await map_role_permissions(role_id, role_data['permissions'])
 
@@ -96,7 +111,7 @@ async def add_new_organization_member(current_user_id, organization_id, role_nam
         raise role_not_found_exception
     organization_member = {"user_id": current_user_id,
                            "organization_id": organization_id, "role_id": role.id}
-    return update_organization_member(organization_member)
+    return await asyncio.to_thread(update_organization_member, organization_member)
 
 
 async def crate_new_organization(org: CreateOrganization, current_user_id: UUID) -> Organization:
@@ -117,10 +132,10 @@ async def crate_new_organization(org: CreateOrganization, current_user_id: UUID)
         raise http_exceptions.ORGANIZATION_ALREADY_EXISTS_EXCEPTION
     organization_data = org.model_dump(exclude_unset=True)
     organization_data.update({"owner_id": current_user_id})
-    organization = create_organization(organization_data)
+    organization = await asyncio.to_thread(create_organization, organization_data)
     await create_default_organization_role_permissions(organization_id=organization.id)
     await add_new_organization_member(current_user_id, organization.id, "Owner")
-    return Organization.model_validate(organization)
+    return trusted_from_attributes(Organization, organization)
 
 
 async def get_organization_details(user_id: UUID, page: int,
@@ -140,14 +155,14 @@ async def get_organization_details(user_id: UUID, page: int,
     """
     items, total, pages = get_organizations_by_member_id(user_id=user_id, page=page,
                                                          size=size, sort_by=sort_by)
-    organizations = list(map(Organization.model_validate, items))
-    organizations_response = OrganizationResponse(items=organizations, total=total,
-                                                  pages=pages, page=page, size=size)
+    organizations = [trusted_from_attributes(Organization, item) for item in items]
+    organizations_response = trusted_construct(OrganizationResponse, items=organizations,
+                                               total=total, pages=pages, page=page, size=size)
     return organizations_response
 
 
-def update_organization_response(organization_id: UUID, organization: Organization,
-                                 user: User) -> OrganizationByIDResponse:
+async def update_organization_response(organization_id: UUID, organization: Organization,
+                                       user: User) -> OrganizationByIDResponse:
     """
     Update the organization response with additional details.
 
@@ -159,13 +174,12 @@ def update_organization_response(organization_id: UUID, organization: Organizati
     Returns:
         OrganizationByIDResponse: The updated organization response.
     """
-    response = organization.model_dump(exclude_unset=True)
-    response["owner_details"] = UserProfileShort(id=user.id,
-                                                 email=user.email,
-                                                 full_name=f"{user.first_name} {user.last_name}")
-    response["member_count"] = \
-        get_organization_member_count_by_organization_id(org_id=organization_id)
-    return OrganizationByIDResponse.model_validate(response)
+    response = dict(organization)
+    response["owner_details"] = trusted_construct(UserProfileShort, id=user.id, email=user.email,
+                                                  full_name=f"{user.first_name} {user.last_name}")
+    response["member_count"] = await member_count_lookups.do(
+        organization_id, get_organization_member_count_by_organization_id, organization_id)
+    return trusted_construct(OrganizationByIDResponse, **response)
 
 async def get_organization_details_by_id(org_id: UUID, user: User) -> OrganizationByIDResponse:
     """
@@ -181,14 +195,60 @@ async def get_organization_details_by_id(org_id: UUID, user: User) -> Organizati
     Raises:
         HTTPException: If the organization is not found.
     """
-    organization = get_organization_by_id(organization_id=org_id)
+    # Read past the cache, the validators of the response come from the database. The key
+    # is not the one of the cached lookups, whose result may come from the cache
+    organization = await organization_lookups.do(("refresh", org_id),
+                                                 get_organization_by_id.refresh, org_id)
     if not organization:
         raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
 
-    organization_data = Organization.model_validate(organization)
-    return update_organization_response(organization_id=org_id,
-                                        organization=organization_data,
-                                        user=user)
+    organization_data = trusted_from_attributes(Organization, organization)
+    return await update_organization_response(organization_id=org_id,
+                                              organization=organization_data,
+                                              user=user)
+
+async def get_organization_cache_validators(org_id: UUID, user: User) -> CacheValidators:
+    """
+    Retrieve the ETag and Last-Modified of the organization details representation.
+
+    The details embed the member count and the requesting user's profile, so the
+    validators cover the organization row, its membership version and that user.
+
+    Args:
+        org_id (UUID): The ID of the organization.
+        user (User): The user data.
+
+    Returns:
+        CacheValidators: The validators of the organization details.
+
+    Raises:
+        HTTPException: If the organization is not found.
+    """
+    _, validators = get_organization_versioned_validators(org_id=org_id, user=user)
+    return validators
+
+def get_organization_versioned_validators(org_id: UUID, user: User
+                                          ) -> tuple[tuple[datetime, int], CacheValidators]:
+    """
+    Retrieve the version of an organization and the validators computed from it.
+
+    Args:
+        org_id (UUID): The ID of the organization.
+        user (User): The user data.
+
+    Returns:
+        tuple[tuple[datetime, int], CacheValidators]: The updated_at and member_version of
+            the organization, and the validators of its details.
+
+    Raises:
+        HTTPException: If the organization is not found.
+    """
+    version = get_organization_version(organization_id=org_id)
+    if not version:
+        raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
+    updated_at, member_version = version
+    return version, build_cache_validators(org_id, member_version, user.id,
+                                           last_modified=[updated_at, user.updated_at])
 
 async def get_verified_role_permissions(role_id: UUID, permission_names: list[str]):
     """
@@ -242,30 +302,48 @@ async def verify_current_user_role(user_id: UUID, org_id: UUID, permission_names
 
 
 async def update_organization_details(organization_id: UUID, org: UpdateOrganization,
-                                      user: User) -> OrganizationByIDResponse:
+                                      user: User, if_match: str | None = None
+                                      ) -> OrganizationByIDResponse:
     """
     Update the details of an organization.
 
+    With If-Match the update is conditional on the version the matched ETag was computed
+    from, checked by the write itself.
+
     Args:
         organization_id (UUID): The ID of the organization.
         org (UpdateOrganization): The updated organization data.
         user (User): The user data.
+        if_match (str | None): The If-Match header of the request, None if absent.
 
     Returns:
         OrganizationByIDResponse: The updated organization details.
 
     Raises:
-        HTTPException: If the organization is not found.
-    """
+        HTTPException: If the organization is not found, or If-Match does not match its
+            current ETag.
+    """
+    expected_version = None
+    if if_match is not None:
+        version, validators = get_organization_versioned_validators(org_id=organization_id,
+                                                                    user=user)
+        if verify_if_match(if_match, validators):
+            expected_version = version
     organization_data = org.model_dump(exclude_unset=True)
-    organization = update_organization(organization_id=organization_id, org=organization_data)
+    organization = await asyncio.to_thread(update_organization, organization_id=organization_id,
+                                           org=organization_data,
+                                           expected_version=expected_version)
     if not organization:
+        if expected_version is not None:
+            raise http_exceptions.PRECONDITION_FAILED_EXCEPTION
         raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
 
-    organization_data = Organization.model_validate(organization)
-    return update_organization_response(organization_id=organization_id,
-                                        organization=organization_data,
-                                        user=user)
+    organization_data = trusted_from_attributes(Organization, organization)
+    publish_event(channel_name("organization", organization_id), "organization.updated",
+                  organization_data.model_dump(), coalesce_key="organization")
+    return await update_organization_response(organization_id=organization_id,
+                                              organization=organization_data,
+                                              user=user)
 
 async def delete_organizations(organization_id: UUID) -> None:
     """
@@ -277,10 +355,13 @@ async def delete_organizations(organization_id: UUID) -> None:
     Raises:
         HTTPException: If the organization is not found.
     """
-    deleted = delete_organizations_by_id(organization_id=organization_id)
+    deleted = await asyncio.to_thread(delete_organizations_by_id, organization_id=organization_id)
     if not deleted:
         raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
 
+    channel = channel_name("organization", organization_id)
+    publish_event(channel, "organization.deleted", {"organization_id": organization_id})
+
 
 async def add_new_members_to_organization(organization_id: UUID,
                                           user_roles: AddOrganizationMembersRequest
@@ -317,8 +398,9 @@ async def add_new_members_to_organization(organization_id: UUID,
 
     organization_member = \
         {"user_id": user.id, "organization_id": organization_id, "role_id": role.id}
-    created_user = update_organization_member(organization_member)
-    current_response = OrganizationMemberResponse(
+    created_user = await asyncio.to_thread(update_organization_member, organization_member)
+    current_response = trusted_construct(
+        OrganizationMemberResponse,
         user_id=user.id,
         organization_id=organization_id,
         role_id=role.id,
@@ -328,11 +410,33 @@ async def add_new_members_to_organization(organization_id: UUID,
         status="active",
         joined_at=created_user.joined_at
     )
+    publish_event(channel_name("organization", organization_id), "organization.member_added",
+                  {**current_response.model_dump(), "username": user.username,
+                   "first_name": user.first_name, "last_name": user.last_name})
 
     rest_responses = await add_new_members_to_organization(organization_id, remaining_roles)
     return [current_response] + rest_responses
 
 
+async def send_member_invitations(organization_id: UUID,
+                                  members: list[OrganizationMemberResponse]) -> None:
+    """
+    Queue the invitation emails of newly added organization members.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        members (list[OrganizationMemberResponse]): The added members.
+    """
+    if not members:
+        return
+    organization = get_organization_by_id(organization_id=organization_id)
+    await asyncio.to_thread(queue_emails, [
+        (member.user_email, "organization_invite",
+         {"full_name": member.user_full_name, "organization_name": organization.name,
+          "role_name": member.role_name})
+        for member in members])
+
+
 async def get_organization_members_by_id(organization_id: UUID, page: int,
                                          size: int, sort_by: str) -> OrganizationMembersResponse:
     """
@@ -350,7 +454,8 @@ async def get_organization_members_by_id(organization_id: UUID, page: int,
     Raises:
         HTTPException: If the organization is not found.
      """
-    organization = get_organization_by_id(organization_id=organization_id)
+    organization = await organization_lookups.do(organization_id, get_organization_by_id,
+                                                 organization_id)
     if not organization:
         raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
 
@@ -359,22 +464,35 @@ async def get_organization_members_by_id(organization_id: UUID, page: int,
     members = []
     for item in items:
         member = {}
-        user = get_user_by_id(item.user_id)
-        if not user:
-            raise http_exceptions.USER_NOT_FOUND_EXCEPTION
+        member['user'] = trusted_construct(UserProfileShort, id=item.user_id, email=item.email,
+                                           full_name=item.full_name)
+        member['role'] = trusted_construct(RoleShort, id=item.role_id, name=item.role_name)
+        member['joined_at'] = item.joined_at
+        members.append(trusted_construct(OrganizationMemberData, **member))
 
-        role = get_role_by_id(role_id=item.role_id)
-        if not role:
-            raise http_exceptions.ROLE_NOT_FOUND_EXCEPTION
+    return trusted_construct(OrganizationMembersResponse, items=members,
+                             total=total, page=page, size=size, pages=pages)
 
-        member['user'] = UserProfileShort(id=user.id, email=user.email,
-                                          full_name=f"{user.first_name} {user.last_name}")
-        member['role'] = RoleShort(id=role.id, name=role.name)
-        member['joined_at'] = item.joined_at
-        members.append(OrganizationMemberData.model_validate(member))
 
-    return OrganizationMembersResponse(items=members,
-                                          total=total, page=page, size=size, pages=pages)
+async def export_organization_members(organization_id: UUID, export_format: ExportFormat
+                                      ) -> Iterator[bytes]:
+    """
+    Stream all members of an organization as NDJSON or CSV.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        export_format (ExportFormat): "ndjson" or "csv".
+
+    Returns:
+        Iterator[bytes]: The encoded export chunks.
+
+    Raises:
+        HTTPException: If the organization is not found.
+    """
+    if not get_organization_version(organization_id=organization_id):
+        raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
+    members = iter_organization_members(organization_id=organization_id)
+    return encode_rows(members, OrganizationMemberRow, export_format)
 
 
 async def update_organization_member_role_by_id(org_id: UUID, user_id: UUID, role_id: UUID
@@ -393,7 +511,8 @@ async def update_organization_member_role_by_id(org_id: UUID, user_id: UUID, rol
     Raises:
         HTTPException: If the organization member, role, or user is not found.
     """
-    org_member = update_organization_member_role(org_id=org_id, user_id=user_id, role_id=role_id)
+    org_member = await asyncio.to_thread(update_organization_member_role, org_id=org_id,
+                                         user_id=user_id, role_id=role_id)
     if not org_member:
         raise http_exceptions.ORGANIZATION_MEMBER_NOT_FOUND_EXCEPTION
 
@@ -405,17 +524,20 @@ async def update_organization_member_role_by_id(org_id: UUID, user_id: UUID, rol
     if not user:
         raise http_exceptions.USER_NOT_FOUND_EXCEPTION
 
-    current_response = OrganizationMemberResponse(
+    member = trusted_construct(
+        OrganizationMemberResponse,
         user_id=org_member.user_id,
         organization_id=org_member.organization_id,
         role_id=role_id,
         role_name=role.name,
         user_email=user.email,
-        user_full_name=f"{user.first_name} {user.last_name}",
+        user_full_name=user.full_name,
         status="active",
         joined_at=org_member.joined_at
     )
-    return OrganizationMemberResponse.model_validate(current_response)
+    publish_event(channel_name("organization", org_id), "organization.member_updated",
+                  member.model_dump(), coalesce_key=("member", user_id))
+    return member
 
 
 async def delete_member_from_organization(user_id: UUID, organization_id: UUID) -> None:
@@ -429,10 +551,16 @@ async def delete_member_from_organization(user_id: UUID, organization_id: UUID)
     Raises:
         HTTPException: If the organization is not found.
     """
-    deleted = delete_organization_member_by_id(user_id=user_id, organization_id=organization_id)
+    deleted = await asyncio.to_thread(delete_organization_member_by_id, user_id=user_id,
+                                      organization_id=organization_id)
     if not deleted:
         raise http_exceptions.ORGANIZATION_MEMBER_NOT_FOUND_EXCEPTION
 
+    channel = channel_name("organization", organization_id)
+    publish_event(channel, "organization.member_removed",
+                  {"organization_id": organization_id, "user_id": user_id},
+                  coalesce_key=("member", user_id))
+
 
 async def get_permission_response(permission_id: UUID) -> dict:
     """
@@ -466,7 +594,7 @@ async def get_permissions_response(permission_ids: list[UUID]) -> list[dict] | l
     permissions = []
     for permission_id in permission_ids:
         permission = await get_permission_response(permission_id=permission_id)
-        permissions.append(Permission.model_validate(permission))
+        permissions.append(trusted_construct(Permission, **permission))
     return permissions
 
 
@@ -517,11 +645,11 @@ async def create_new_role(organization_id: UUID, new_role: CreateCustomRole
     role_data = CreateRole(name=new_role.name, description=new_role.description,
                            organization_id=organization_id)
     role_dict = role_data.model_dump(exclude_unset=True)
-    created_role = create_role(role=role_dict)
-    role = Role.model_validate(created_role)
+    created_role = await asyncio.to_thread(create_role, role=role_dict)
+    role = trusted_from_attributes(Role, created_role)
     await map_role_permissions(role_id=created_role.id, permissions=new_role.permission_ids)
     response_role = await get_role_response(role=role, permission_ids=new_role.permission_ids)
-    return RoleResponse.model_validate(response_role)
+    return trusted_construct(RoleResponse, **response_role)
 
 
 async def get_organization_roles(organization_id: UUID) -> AllRoleResponse:
@@ -542,9 +670,8 @@ async def get_organization_roles(organization_id: UUID) -> AllRoleResponse:
     for role in roles:
         permission_ids = get_permission_ids_for_role(role_id=role.id)
         response_role = await get_role_response(role=role, permission_ids=permission_ids)
-        response_roles.append(response_role)
-    response = {"items": response_roles}
-    return AllRoleResponse.model_validate(response)
+        response_roles.append(trusted_construct(RoleResponse, **response_role))
+    return trusted_construct(AllRoleResponse, items=response_roles)
 
 
 async def get_all_permissions(organization_id: UUID) -> PermissionsResponse:
@@ -563,5 +690,5 @@ async def get_all_permissions(organization_id: UUID) -> PermissionsResponse:
         permission_ids = list(set(permission_ids))
         response_permission = await get_permissions_response(permission_ids=permission_ids)
         response_permissions.extend(response_permission)
-    response = {"items": response_permissions, "total": len(response_permissions)}
-    return PermissionsResponse.model_validate(response)
+    return trusted_construct(PermissionsResponse, items=response_permissions,
+                             total=len(response_permissions))
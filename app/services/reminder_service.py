@@ -0,0 +1,35 @@
+""" Reminder Service """
+from datetime import datetime, timezone
+from uuid import UUID
+from core.logging_conf import Logging
+from db.crud.crud_reminder import create_reminder
+
+
+log = Logging(__name__).log()
+
+
+def schedule_reminder(user_id: UUID, message: str, due_at: datetime, subject_type: str,  # pylint: disable=too-many-arguments, too-many-positional-arguments
+                      subject_id: UUID | None = None,
+                      organization_id: UUID | None = None) -> UUID:
+    """
+    Schedule a reminder, the worker processes fire it as a notification when it is due.
+
+    Args:
+        user_id (UUID): The ID of the user to remind.
+        message (str): The reminder message.
+        due_at (datetime): When to fire the reminder, naive values are treated as UTC.
+        subject_type (str): The kind of the subject, e.g. task or project.
+        subject_id (UUID | None): The ID of the subject.
+        organization_id (UUID | None): The ID of the organization of the subject.
+
+    Returns:
+        UUID: The ID of the reminder.
+    """
+    if due_at.tzinfo is None:
+        due_at = due_at.replace(tzinfo=timezone.utc)
+    reminder = create_reminder({"user_id": user_id, "message": message,
+                                "due_at": due_at.astimezone(timezone.utc),
+                                "subject_type": subject_type, "subject_id": subject_id,
+                                "organization_id": organization_id})
+    log.info("Scheduled reminder %s for user %s at %s", reminder.id, user_id, due_at)
+    return reminder.id
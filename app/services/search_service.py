@@ -0,0 +1,197 @@
+""" Search Service
+
+Full-text search over the FTS5 indexes of users, organizations and teams. Every word of
+the query is matched as a prefix, so results update while the user types, and results
+are limited to the organizations the caller is a member of.
+
+Member autocomplete is served from in-memory trigram indexes, one per organization. An
+index is built from the database on first use and then kept up to date from the member
+events of the notification hub, which reach every API process.
+"""
+import re
+from typing import Literal
+from uuid import UUID
+import orjson
+from core.config import AUTOCOMPLETE_MAX_ENTRIES, AUTOCOMPLETE_MIN_SCORE
+from core.logging_conf import Logging
+from db.crud.crud_organization import select_member_organization_ids, search_organizations, \
+    get_organization_member_by_organization_user_id
+from db.crud.crud_team import search_teams
+from db.crud.crud_user import search_users, get_organization_users
+from db.read_models import EventRow
+from exceptions import http_exceptions
+from schemas.common import trusted_construct, trusted_from_attributes
+from schemas.organization import Organization
+from schemas.search import SearchResponse, UserSearchResult, TeamSearchResult
+from services.notification_service import notification_hub
+from utils.autocomplete import TrigramIndex, TrigramIndexCache
+
+# pylint: disable=no-member
+
+log = Logging(__name__).log()
+
+SearchKind = Literal["users", "organizations", "teams"]
+SEARCH_KINDS: tuple[SearchKind, ...] = ("users", "organizations", "teams")
+
+# Words of the query used for matching, longer queries add little but cost more
+SEARCH_MAX_TERMS = 8
+_TERM_PATTERN = re.compile(r"\w+")
+
+
+def build_match_query(text: str) -> str:
+    """
+    Convert user input into an FTS5 query matching every word as a prefix.
+
+    Words are quoted, so FTS5 operators and syntax in the input are matched as text.
+
+    Args:
+        text (str): The search text.
+
+    Returns:
+        str: The FTS5 query, empty if the text has no words.
+    """
+    terms = _TERM_PATTERN.findall(text.lower())[:SEARCH_MAX_TERMS]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+async def search(user_id: UUID, query: str, kinds: list[SearchKind],  # pylint: disable=too-many-arguments, too-many-positional-arguments
+                 organization_id: UUID | None, limit: int) -> SearchResponse:
+    """
+    Search users, organizations and teams visible to a user.
+
+    Args:
+        user_id (UUID): The ID of the searching user.
+        query (str): The search text.
+        kinds (list[SearchKind]): The kinds of results to search for.
+        organization_id (UUID | None): Only search within this organization if given.
+        limit (int): The maximum number of results per kind.
+
+    Returns:
+        SearchResponse: The matches of every kind, best first.
+
+    Raises:
+        HTTPException: If the user is not a member of the given organization.
+    """
+    if organization_id is not None and not get_organization_member_by_organization_user_id(
+            org_id=organization_id, user_id=user_id):
+        raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
+
+    match = build_match_query(query)
+    if not match:
+        return trusted_construct(SearchResponse, query=query, users=[], organizations=[],
+                                 teams=[])
+    log.info("Searching %s for %s", kinds, match)
+    organization_ids = select_member_organization_ids(user_id=user_id,
+                                                      organization_id=organization_id)
+    users, organizations, teams = [], [], []
+    if "users" in kinds:
+        users = [trusted_from_attributes(UserSearchResult, row, full_name=row.full_name)
+                 for row in search_users(match, organization_ids, limit)]
+    if "organizations" in kinds:
+        organizations = [trusted_from_attributes(Organization, row)
+                         for row in search_organizations(match, organization_ids, limit)]
+    if "teams" in kinds:
+        teams = [trusted_from_attributes(TeamSearchResult, row)
+                 for row in search_teams(match, organization_ids, limit)]
+    return trusted_construct(SearchResponse, query=query, users=users,
+                             organizations=organizations, teams=teams)
+
+
+_member_indexes = TrigramIndexCache(max_entries=AUTOCOMPLETE_MAX_ENTRIES)
+
+
+def index_organization_member(index: TrigramIndex, user_id: UUID, username: str,  # pylint: disable=too-many-arguments, too-many-positional-arguments
+                              first_name: str, last_name: str, email: str) -> None:
+    """
+    Add or replace a member in an autocomplete index.
+
+    Args:
+        index (TrigramIndex): The index of the organization.
+        user_id (UUID): The ID of the user.
+        username (str): The username.
+        first_name (str): The first name.
+        last_name (str): The last name.
+        email (str): The email address.
+    """
+    member = trusted_construct(UserSearchResult, id=user_id, username=username, email=email,
+                               full_name=f"{first_name} {last_name}")
+    index.add(user_id, (username, first_name, last_name), member)
+
+
+def get_member_index(organization_id: UUID) -> TrigramIndex:
+    """
+    Retrieve the autocomplete index of an organization, building it on first use.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+
+    Returns:
+        TrigramIndex: The index of the active members.
+    """
+    index = _member_indexes.get(organization_id)
+    if index is None:
+        index = TrigramIndex()
+        for user in get_organization_users(organization_id=organization_id):
+            index_organization_member(index, user.id, user.username, user.first_name,
+                                      user.last_name, user.email)
+        if not index:
+            # Not an organization, do not cache
+            return index
+        _member_indexes.put(organization_id, index)
+        log.info("Built the member index of organization %s with %s members",
+                 organization_id, len(index))
+    return index
+
+
+def update_member_index(event: EventRow) -> None:
+    """
+    Apply a member event to the cached index of its organization.
+
+    Registered as notification hub listener, so every process applies the changes made
+    through the others. Indexes that are not cached are left to be built on use.
+
+    Args:
+        event (EventRow): The delivered event.
+    """
+    kind, _, object_id = event.channel.partition(":")
+    if kind != "organization" or _member_indexes.peek(UUID(object_id)) is None:
+        return
+    organization_id = UUID(object_id)
+    message = orjson.loads(event.message)
+    data = message["data"]
+    if message["type"] == "organization.member_added":
+        index_organization_member(_member_indexes.peek(organization_id), UUID(data["user_id"]),
+                                  data["username"], data["first_name"], data["last_name"],
+                                  data["user_email"])
+    elif message["type"] == "organization.member_removed":
+        _member_indexes.peek(organization_id).remove(UUID(data["user_id"]))
+    elif message["type"] == "organization.deleted":
+        _member_indexes.discard(organization_id)
+
+
+notification_hub.add_listener(update_member_index)
+
+
+async def autocomplete_organization_members(organization_id: UUID, user_id: UUID, query: str,
+                                            limit: int) -> list[UserSearchResult]:
+    """
+    Suggest members of an organization for a partially typed username or name.
+
+    Apart from the first use of an organization this never reads the database.
+
+    Args:
+        organization_id (UUID): The ID of the organization.
+        user_id (UUID): The ID of the requesting user, must be a member.
+        query (str): The typed text, typos are tolerated.
+        limit (int): The maximum number of suggestions.
+
+    Returns:
+        list[UserSearchResult]: The suggested members, best first.
+
+    Raises:
+        HTTPException: If the user is not a member of the organization.
+    """
+    index = get_member_index(organization_id)
+    if user_id not in index:
+        raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
+    return index.search(query, limit=limit, min_score=AUTOCOMPLETE_MIN_SCORE)
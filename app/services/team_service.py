@@ -1,25 +1,39 @@
 """ Team Services. """
 
+import asyncio
+from datetime import datetime
 from  pprint import pprint
+from typing import Iterator
 from uuid import UUID
 from core.logging_conf import Logging
 from core.permission_config import TEAM_ROLES
-from db.crud.crud_organization import create_organization_team
+from db.crud.crud_organization import create_organization_team, get_organization_version
 from db.crud.crud_team import get_team_by_name, create_team, get_member_count_by_team_id, \
     get_organization_teams, create_team_member, get_team_by_id, update_team, delete_team, \
-    get_team_member_by_team_user_id, update_member_role
+    get_team_member_by_team_user_id, update_member_role, get_team_version, iter_organization_teams
 from db.crud.crud_user import get_user_by_id
 from db.crud.curd_role import get_role_by_role_name_team_id, create_role, get_role_by_id
 from db.models import TeamModel, TeamMemberModel
+from db.read_models import TeamRow
 from exceptions import http_exceptions
+from schemas.common import trusted_construct, trusted_from_attributes
 from schemas.role import CreateRole
 from schemas.team import CreateTeam, SingleTeamResponse, AllTeamResponse, UpdateTeam, \
     AddMemberResponse, AddTeamMembersRequest
+from schemas.user import UserProfileShort
+from services.notification_service import publish_event, channel_name
 from services.organization_service import map_role_permissions, get_verified_role_permissions
+from utils.exporters import ExportFormat, encode_rows
+from utils.http_cache import CacheValidators, build_cache_validators, verify_if_match
+from utils.single_flight import SingleFlight
 
 
 log = Logging(__name__).log()
 
+# Identical concurrent lookups of the team page share one query
+team_lookups = SingleFlight("team")
+team_member_count_lookups = SingleFlight("team_member_count")
+
 
 async def verify_current_team_role(user_id: UUID, team_id: UUID, permission_names: list[str]):
     """
@@ -59,7 +73,7 @@ async def create_default_team_role_permissions(team_id: UUID):
             role = CreateRole(name=role_data['name'], description=role_data['description'],
                               team_id=team_id)
             role = role.model_dump(exclude_unset=True)
-            created_role = create_role(role)
+            created_role = await asyncio.to_thread(create_role, role)
             role_id = created_role.id
             await map_role_permissions(role_id, role_data['permissions'])
 
@@ -93,25 +107,25 @@ async def add_new_team_member(user_id: UUID, team_id: UUID,
 
     log.info("Create the team members.")
     team_member = {"user_id": user_id, "team_id": team_id, "role_id": role.id}
-    return create_team_member(team_member)
+    return await asyncio.to_thread(create_team_member, team_member)
 
 
-async def get_single_team_response(team: TeamModel | None) -> SingleTeamResponse:
+async def get_single_team_response(team: TeamModel | TeamRow) -> SingleTeamResponse:
     """
-    Generate the single team response from the TeamModel object with member count.
+    Generate the single team response from the team with its current member count.
     TODO: We can further add assigned projects in Response
 
     Args:
-        team (dict): SQLAlchemy model retrieved from db.
+        team (TeamModel | TeamRow): The team retrieved from db.
 
     Returns:
         SingleTeamResponse: The response of created team.
     """
     log.info("Retrieve the count of member of team: %s", team.name)
-    member_count = get_member_count_by_team_id(team_id=team.id)
+    member_count = await team_member_count_lookups.do(team.id, get_member_count_by_team_id,
+                                                      team.id)
     log.debug("Number of members in team %s is %s", team.name, member_count)
-    team.member_count = member_count
-    return SingleTeamResponse.model_validate(team)
+    return trusted_from_attributes(SingleTeamResponse, team, member_count=member_count)
 
 
 async def add_new_team_in_organization(org_id: UUID, user_id: UUID, role_name: str,
@@ -147,13 +161,13 @@ async def add_new_team_in_organization(org_id: UUID, user_id: UUID, role_name: s
     log.debug("Team to be created: %s", pprint(team_data))
 
     log.info("Creating new team '%s' in organization '%s'", team.name, org_id)
-    created_team = create_team(team_data=team_data)
+    created_team = await asyncio.to_thread(create_team, team_data=team_data)
     log.debug("Created Team: %s", created_team)
 
     log.info("Updating the organization team relation.")
     organization_team = \
         {"organization_id": created_team.organization_id, "team_id": created_team.id}
-    create_organization_team(organization_team=organization_team)
+    await asyncio.to_thread(create_organization_team, organization_team=organization_team)
 
     log.info("Creating default role permissions for the team")
     await create_default_team_role_permissions(team_id=created_team.id)
@@ -162,7 +176,10 @@ async def add_new_team_in_organization(org_id: UUID, user_id: UUID, role_name: s
     await add_new_team_member(user_id=user_id, team_id=created_team.id, role_name=role_name)
     created_team = created_team.__dict__.copy()
     log.debug("Created team: %s", created_team)
-    return await get_single_team_response(team=created_team)
+    team_response = await get_single_team_response(team=created_team)
+    publish_event(channel_name("organization", org_id), "team.created",
+                  team_response.model_dump())
+    return team_response
 
 
 async def retrieve_all_team_of_the_organization(organization_id: UUID,  page: int, size: int,
@@ -184,17 +201,36 @@ async def retrieve_all_team_of_the_organization(organization_id: UUID,  page: in
                                       size=size, sort_by=sort_by)
 
     log.info("Updating the team response.")
-    response_team = \
-        {"items": sorted_teams, "total": total, "page": page, "size": size, "pages": pages}
     teams_with_count = []
     for team in sorted_teams:
-        team_dict = team.__dict__.copy()
-        team_dict["member_count"] = get_member_count_by_team_id(team.id)
-        teams_with_count.append(team_dict)
+        teams_with_count.append(trusted_from_attributes(
+            SingleTeamResponse, team, member_count=get_member_count_by_team_id(team.id)))
         # teams_with_count.append(await get_single_team_response(team=team))
 
-    response_team.update({"items": teams_with_count})
-    return AllTeamResponse.model_validate(response_team)
+    return trusted_construct(AllTeamResponse, items=teams_with_count, total=total, page=page,
+                             size=size, pages=pages)
+
+
+async def export_organization_teams(organization_id: UUID, export_format: ExportFormat
+                                    ) -> Iterator[bytes]:
+    """
+    Stream all teams of the organization with their member counts as NDJSON or CSV.
+
+    Args:
+        organization_id (UUID): ID of the organization.
+        export_format (ExportFormat): "ndjson" or "csv".
+
+    Raises:
+        HTTPException: If the organization is not found.
+
+    Returns:
+        Iterator[bytes]: The encoded export chunks.
+    """
+    log.info("Exporting teams of the organization: %s", organization_id)
+    if not get_organization_version(organization_id=organization_id):
+        raise http_exceptions.ORGANIZATION_NOT_FOUND_EXCEPTION
+    teams = iter_organization_teams(organization_id=organization_id)
+    return encode_rows(teams, TeamRow, export_format)
 
 
 async def get_team_by_team_id(team_id: UUID) -> SingleTeamResponse:
@@ -211,36 +247,97 @@ async def get_team_by_team_id(team_id: UUID) -> SingleTeamResponse:
         SingleTeamResponse: The response for a specific ID.
     """
     log.info("Getting the team by team ID: %s", team_id)
-    retrieved_team = get_team_by_id(team_id=team_id)
+    # Read past the cache, the validators of the response come from the database. The key
+    # is not the one of the cached lookups, whose result may come from the cache
+    retrieved_team = await team_lookups.do(("refresh", team_id), get_team_by_id.refresh,
+                                           team_id)
     if not retrieved_team:
         raise http_exceptions.TEAM_NOT_FOUND_EXCEPTION
     return await get_single_team_response(team=retrieved_team)
 
 
-async def update_team_details(team_id: UUID, team_data: UpdateTeam) -> SingleTeamResponse:
+async def get_team_cache_validators(team_id: UUID) -> CacheValidators:
+    """
+    Retrieve the ETag and Last-Modified of the team details representation.
+
+    Args:
+        team_id (UUID): The ID of the team.
+
+    Raises:
+        HTTPException: If team not found.
+
+    Returns:
+        CacheValidators: The validators of the team details.
+    """
+    _, validators = get_team_versioned_validators(team_id=team_id)
+    return validators
+
+
+def get_team_versioned_validators(team_id: UUID
+                                  ) -> tuple[tuple[datetime, int], CacheValidators]:
+    """
+    Retrieve the version of a team and the validators computed from it.
+
+    Args:
+        team_id (UUID): The ID of the team.
+
+    Raises:
+        HTTPException: If team not found.
+
+    Returns:
+        tuple[tuple[datetime, int], CacheValidators]: The updated_at and member_version of
+            the team, and the validators of its details.
+    """
+    version = get_team_version(team_id=team_id)
+    if not version:
+        raise http_exceptions.TEAM_NOT_FOUND_EXCEPTION
+    updated_at, member_version = version
+    return version, build_cache_validators(team_id, member_version, last_modified=[updated_at])
+
+
+async def update_team_details(team_id: UUID, team_data: UpdateTeam,
+                              if_match: str | None = None) -> SingleTeamResponse:
     """
     Update the specific team details.
 
+    With If-Match the update is conditional on the version the matched ETag was computed
+    from, checked by the write itself.
+
     Args:
         team_id (UUID): The ID of the team to be updated.
         team_data (UpdateTeam): The new details of the team.
+        if_match (str | None): The If-Match header of the request, None if absent.
 
     Raises:
-        HTTPException: If team not found.
+        HTTPException: If team not found, or If-Match does not match its current ETag.
 
     Returns:
         SingleTeamResponse: The response for a specific ID.
     """
+    expected_version = None
+    if if_match is not None:
+        version, validators = get_team_versioned_validators(team_id=team_id)
+        if verify_if_match(if_match, validators):
+            expected_version = version
+
     log.info("Validate and converting the team_data")
     team_data = team_data.model_dump(exclude_unset=True)
 
     log.info("Updating team details for team: %s", team_id)
-    updated_team = update_team(team_id=team_id, team_data=team_data)
+    updated_team = await asyncio.to_thread(update_team, team_id=team_id, team_data=team_data,
+                                           expected_version=expected_version)
     if not updated_team:
+        if expected_version is not None:
+            raise http_exceptions.PRECONDITION_FAILED_EXCEPTION
         raise http_exceptions.TEAM_NOT_FOUND_EXCEPTION
 
     log.debug("Updated data: %s", updated_team)
-    return await get_single_team_response(team=updated_team)
+    team_response = await get_single_team_response(team=updated_team)
+    event = team_response.model_dump()
+    publish_event(channel_name("team", team_id), "team.updated", event, coalesce_key="team")
+    publish_event(channel_name("organization", updated_team.organization_id), "team.updated",
+                  event, coalesce_key=("team", team_id))
+    return team_response
 
 
 async def delete_the_team_by_id(team_id: UUID) -> None:
@@ -254,10 +351,13 @@ async def delete_the_team_by_id(team_id: UUID) -> None:
         HTTPException: If team not found
     """
     log.info('Deleting team: %s', team_id)
-    deleted = delete_team(team_id=team_id)
+    deleted = await asyncio.to_thread(delete_team, team_id=team_id)
     if not deleted:
         raise http_exceptions.TEAM_NOT_FOUND_EXCEPTION
 
+    channel = channel_name("team", team_id)
+    publish_event(channel, "team.deleted", {"team_id": team_id})
+
 
 async def add_team_members(org_id: UUID, team_id: UUID, user_roles: AddTeamMembersRequest
                            ) -> list[AddMemberResponse]:
@@ -287,20 +387,19 @@ async def add_team_members(org_id: UUID, team_id: UUID, user_roles: AddTeamMembe
                                                team_id=team_id, role_name=user_role.role_name)
 
         log.info("Generating the response for user: %s", user.id)
-        team_member = {
-            "id": user.id,  # changed from "user_id": user.id
-            "email": user.email,
-            "full_name": f"{user.first_name} {user.last_name}"
-        }
-        response = {
-          "team_id": added_member.team_id,
-          "organization_id": org_id,
-          "role_id": added_member.role_id,
-          "role_name": user_role.role_name,
-          "user_details": team_member,
-          "added_at": added_member.joined_at
-        }
-        members_response.append(AddMemberResponse.model_validate(response))
+        team_member = trusted_construct(UserProfileShort, id=user.id, email=user.email,
+                                        full_name=user.full_name)
+        members_response.append(trusted_construct(
+            AddMemberResponse,
+            team_id=added_member.team_id,
+            organization_id=org_id,
+            role_id=added_member.role_id,
+            role_name=user_role.role_name,
+            user_details=team_member,
+            added_at=added_member.joined_at
+        ))
+        publish_event(channel_name("team", team_id), "team.member_added",
+                      members_response[-1].model_dump())
 
     return members_response
 
@@ -337,22 +436,23 @@ async def update_team_member_role(org_id: UUID, team_id: UUID, user_id: UUID,
     log.debug("Role name: %s", role.name)
 
     log.info("Updating user role.")
-    updated_member = update_member_role(team_id=team_id, user_id=user_id, role_id=role_id)
+    updated_member = await asyncio.to_thread(update_member_role, team_id=team_id, user_id=user_id,
+                                             role_id=role_id)
     if not updated_member:
         raise http_exceptions.USER_NOT_FOUND_EXCEPTION
 
     log.info("Generating the response for user: %s", user.id)
-    team_member = {
-        "id": user.id,  # changed from "user_id": user.id
-        "email": user.email,
-        "full_name": f"{user.first_name} {user.last_name}"
-    }
-    response = {
-        "team_id": updated_member.team_id,
-        "organization_id": org_id,
-        "role_id": updated_member.role_id,
-        "role_name": role.name,
-        "user_details": team_member,
-        "added_at": updated_member.joined_at
-    }
-    return  AddMemberResponse.model_validate(response)
+    team_member = trusted_construct(UserProfileShort, id=user.id, email=user.email,
+                                    full_name=user.full_name)
+    member = trusted_construct(
+        AddMemberResponse,
+        team_id=updated_member.team_id,
+        organization_id=org_id,
+        role_id=updated_member.role_id,
+        role_name=role.name,
+        user_details=team_member,
+        added_at=updated_member.joined_at
+    )
+    publish_event(channel_name("team", team_id), "team.member_updated", member.model_dump(),
+                  coalesce_key=("member", user_id))
+    return member
@@ -1,5 +1,6 @@
 """ User Service """
 
+import asyncio
 from uuid import UUID
 from typing import Annotated
 import jwt
@@ -11,6 +12,7 @@ from core.security import oauth2_scheme, get_hashed_password, verify_hash_passwo
 from db.crud.crud_user import get_user_by_username, create_user, update_user_password, \
     update_user, get_user_by_id, get_user_by_email
 from exceptions import http_exceptions
+from schemas.common import trusted_from_attributes
 from schemas.token import TokenData
 from schemas.user import User, CreateUser, UpdateUser, UserPasswordUpdate, UserProfile, \
     UserMessageResponse
@@ -55,7 +57,7 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Use
         user = get_user_by_username(username=token_data.username)
         if not user:
             raise http_exceptions.USER_NOT_FOUND_EXCEPTION
-        response_user = User.model_validate(user)
+        response_user = trusted_from_attributes(User, user)
         return response_user
     except InvalidTokenError as exc:
         raise http_exceptions.CREDENTIALS_EXCEPTION from exc
@@ -76,6 +78,38 @@ async def get_current_active_user(current_user: Annotated[User, Depends(get_curr
     is_active_user(current_user.is_active)
     return current_user
 
+async def get_current_active_user_id(token: Annotated[str, Depends(oauth2_scheme)]) -> UUID:
+    """
+    Retrieve the ID of the current active user, for routes on every keypress.
+
+    The user is looked up by the ID carried in the token through the user cache, so the
+    database is only read on a cache miss. Tokens issued without the ID fall back to the
+    lookup by username.
+
+    Args:
+        token (str): The authentication token.
+
+    Returns:
+        UUID: The ID of the user.
+
+    Raises:
+        HTTPException: If the token is invalid, or the user is not found or inactive.
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username = payload.get("sub")
+        if not username:
+            raise http_exceptions.CREDENTIALS_EXCEPTION
+        user_id = payload.get("uid")
+        user = get_user_by_id(UUID(user_id)) if user_id else \
+            get_user_by_username(username=username)
+    except (InvalidTokenError, ValueError) as exc:
+        raise http_exceptions.CREDENTIALS_EXCEPTION from exc
+    if not user or user.username != username:
+        raise http_exceptions.USER_NOT_FOUND_EXCEPTION
+    is_active_user(user.is_active)
+    return user.id
+
 async def create_new_user(create_data: CreateUser, is_superuser: bool = False) -> User:
     """
     Create/Register a new user.
@@ -101,8 +135,8 @@ async def create_new_user(create_data: CreateUser, is_superuser: bool = False) -
     if is_superuser:
         user_data.update({"is_superuser": True})
 
-    user = create_user(user_data)
-    user_response = User.model_validate(user)
+    user = await asyncio.to_thread(create_user, user_data)
+    user_response = trusted_from_attributes(User, user)
     return user_response
 
 async def update_current_active_user(current_user_id: UUID, user_update: UpdateUser):
@@ -120,10 +154,10 @@ async def update_current_active_user(current_user_id: UUID, user_update: UpdateU
         HTTPException: If the user is not found.
     """
     user_data = user_update.model_dump(exclude_unset=True)
-    user = update_user(current_user_id, user_data)
+    user = await asyncio.to_thread(update_user, current_user_id, user_data)
     if not user:
         raise http_exceptions.USER_NOT_FOUND_EXCEPTION
-    user_response = User.model_validate(user)
+    user_response = trusted_from_attributes(User, user)
     return user_response
 
 async def update_current_active_user_password(
@@ -158,7 +192,7 @@ async def update_current_active_user_password(
     )
     log.debug("user id: %s, type: %s", user.id, type(user.id))
     hashed_password_update = get_hashed_password(user_password.new_password)
-    update_user_password(hashed_password_update, user_id=user.id)
+    await asyncio.to_thread(update_user_password, hashed_password_update, user_id=user.id)
     return UserMessageResponse(message = "Password updated successfully.")
 
 async def get_user_profile_by_id(user_id: UUID) -> UserProfile:
@@ -177,5 +211,5 @@ async def get_user_profile_by_id(user_id: UUID) -> UserProfile:
     user = get_user_by_id(user_id)
     if not user:
         raise http_exceptions.USER_NOT_FOUND_EXCEPTION
-    user_response = UserProfile.model_validate(user)
+    user_response = trusted_from_attributes(UserProfile, user)
     return user_response
@@ -0,0 +1,275 @@
+""" Admission control and load shedding.
+
+Every policy has a pool of concurrent requests and a bounded FIFO queue of requests
+waiting for a slot. A request waiting longer than the queue timeout is answered with
+503 instead of being processed after its client gave up. Low priority requests, e.g.
+lists and exports, never wait: they are rejected as soon as their pool is full or any
+other request is queued, so the capacity goes to logins and writes first.
+"""
+import asyncio
+import re
+from collections import deque
+from dataclasses import dataclass, field
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+from core.logging_conf import Logging
+
+# pylint: disable=no-member
+
+log = Logging(__name__).log()
+
+
+@dataclass(slots=True, frozen=True)
+class AdmissionPolicy:  # pylint: disable=too-many-instance-attributes
+    """
+    The concurrency limit of the routes matching a path pattern.
+
+    Attributes:
+        name (str): The name of the pool in the metrics.
+        pattern (str): The regular expression matched against the start of the path.
+        max_concurrency (int): The requests processed at once.
+        max_queue (int): The requests waiting for a slot.
+        queue_timeout (float): Seconds a request waits before it is rejected.
+        methods (tuple[str, ...] | None): The HTTP methods, all if None.
+        low_priority (bool): Reject instead of queueing while any request is queued.
+    """
+    name: str
+    pattern: str
+    max_concurrency: int
+    max_queue: int = 0
+    queue_timeout: float = 0.0
+    methods: tuple[str, ...] | None = None
+    low_priority: bool = False
+    regex: re.Pattern = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        """ Compile the path pattern. """
+        object.__setattr__(self, "regex", re.compile(self.pattern))
+
+    def matches(self, method: str, path: str) -> bool:
+        """
+        Check if the policy applies to a request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path.
+
+        Returns:
+            bool: True if the policy applies.
+        """
+        return (self.methods is None or method in self.methods) and \
+            self.regex.match(path) is not None
+
+
+class AdmissionPool:
+    """
+    The slots and the wait queue of a policy, used from the event loop only.
+
+    Attributes:
+        policy (AdmissionPolicy): The policy.
+        in_flight (int): The requests being processed.
+        admitted (int): The requests admitted since the start.
+        rejected (int): The requests rejected because the queue was full or they were
+            shed.
+        timed_out (int): The requests rejected after waiting for the queue timeout.
+    """
+
+    def __init__(self, policy: AdmissionPolicy):
+        """
+        Initialize an idle pool.
+
+        Args:
+            policy (AdmissionPolicy): The policy.
+        """
+        self.policy = policy
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        """ The requests waiting for a slot. """
+        return len(self._waiters)
+
+    async def acquire(self, shed: bool = False) -> bool:
+        """
+        Take a slot, waiting in the queue up to the queue timeout.
+
+        Args:
+            shed (bool): Reject the request right away, e.g. because other pools are
+                backed up.
+
+        Returns:
+            bool: True if a slot was taken, it must be released with ``release``.
+        """
+        if shed:
+            self.rejected += 1
+            return False
+        if self.in_flight < self.policy.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.policy.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.policy.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                self.timed_out += 1
+                return False
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release()
+            raise
+        self.admitted += 1
+        return True
+
+    def _abandon(self, waiter: asyncio.Future) -> bool:
+        """
+        Leave the queue, keeping a slot handed over in the meantime.
+
+        Args:
+            waiter (asyncio.Future): The future of the waiting request.
+
+        Returns:
+            bool: True if the slot was handed over before the request gave up.
+        """
+        if waiter.done():
+            return True
+        waiter.cancel()
+        self._waiters.remove(waiter)
+        return False
+
+    def release(self) -> None:
+        """ Free a slot, handing it over to the longest waiting request. """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict[str, int]:
+        """
+        Retrieve the pool metrics.
+
+        Returns:
+            dict[str, int]: The limit, in flight, queued, admitted, rejected and timed out
+                requests.
+        """
+        return {"limit": self.policy.max_concurrency, "in_flight": self.in_flight,
+                "queued": self.queued, "admitted": self.admitted, "rejected": self.rejected,
+                "timed_out": self.timed_out}
+
+
+class AdmissionController:
+    """
+    The pools of the policies.
+
+    Attributes:
+        pools (list[AdmissionPool]): The pools, in policy order.
+    """
+
+    def __init__(self, policies: tuple[AdmissionPolicy, ...]):
+        """
+        Initialize a pool per policy.
+
+        Args:
+            policies (tuple[AdmissionPolicy, ...]): The policies, most specific first.
+        """
+        self.pools = [AdmissionPool(policy) for policy in policies]
+
+    def match(self, method: str, path: str) -> AdmissionPool | None:
+        """
+        Find the pool of a request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path.
+
+        Returns:
+            AdmissionPool | None: The pool of the first matching policy, None if none does.
+        """
+        return next((pool for pool in self.pools if pool.policy.matches(method, path)), None)
+
+    @property
+    def backed_up(self) -> bool:
+        """ True while any request is waiting for a slot. """
+        return any(pool.queued for pool in self.pools)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Retrieve the metrics of every pool.
+
+        Returns:
+            dict[str, dict[str, int]]: The metrics by pool name.
+        """
+        return {pool.policy.name: pool.stats() for pool in self.pools}
+
+
+class AdmissionMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    Limits the concurrent HTTP requests per policy and answers shed requests with 503.
+
+    Attributes:
+        app (ASGIApp): The wrapped application.
+        controller (AdmissionController): The pools.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        """
+        Initialize the middleware.
+
+        Args:
+            app (ASGIApp): The wrapped application.
+            controller (AdmissionController): The pools.
+        """
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Process an HTTP request once its pool has a slot.
+
+        Args:
+            scope (Scope): The ASGI scope.
+            receive (Receive): The ASGI receive channel.
+            send (Send): The ASGI send channel.
+        """
+        pool = self.controller.match(scope["method"], scope["path"]) \
+            if scope["type"] == "http" else None
+        if pool is None:
+            await self.app(scope, receive, send)
+            return
+        shed = pool.policy.low_priority and self.controller.backed_up
+        if not await pool.acquire(shed=shed):
+            log.warning("Request to %s rejected by the %s pool, %s in flight, %s queued",
+                        scope["path"], pool.policy.name, pool.in_flight, pool.queued)
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release()
+
+    @staticmethod
+    async def _reject(send: Send) -> None:
+        """
+        Answer a shed request with 503.
+
+        Args:
+            send (Send): The ASGI send channel.
+        """
+        body = orjson.dumps({"detail": "The server is busy, please retry shortly."})
+        await send({"type": "http.response.start", "status": 503, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", b"1"),
+        ]})
+        await send({"type": "http.response.body", "body": body})
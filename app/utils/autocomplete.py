@@ -0,0 +1,193 @@
+""" In-memory trigram indexes for typo tolerant autocomplete. """
+import heapq
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Hashable, Iterable
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase a text and strip its accents.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The normalized text.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def trigrams(word: str, prefix: bool = False) -> set[str]:
+    """
+    Split a normalized word into trigrams, padded like pg_trgm.
+
+    Args:
+        word (str): The word.
+        prefix (bool): The word is a prefix being typed, its end is not padded.
+
+    Returns:
+        set[str]: The trigrams.
+    """
+    padded = f"  {word}" if prefix else f"  {word} "
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Index of entries by the trigrams of their terms, e.g. username and names.
+
+    A query matches an entry when most of its trigrams occur in the entry terms, so a
+    prefix with a typo still finds the entry.
+    """
+
+    def __init__(self):
+        """ Initialize an empty index. """
+        self._entries: dict[Hashable, tuple[tuple[str, ...], Any]] = {}
+        self._postings: dict[str, set[Hashable]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        """ Return the number of entries. """
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """ Check if an entry is indexed. """
+        return key in self._entries
+
+    def add(self, key: Hashable, terms: Iterable[str], value: Any) -> None:
+        """
+        Index an entry, replacing the entry with the same key.
+
+        Args:
+            key (Hashable): The key of the entry.
+            terms (Iterable[str]): The searchable terms of the entry.
+            value (Any): The value returned by ``search``.
+        """
+        self.remove(key)
+        words = tuple(word for term in terms for word in normalize(term).split())
+        self._entries[key] = (words, value)
+        for word in words:
+            for trigram in trigrams(word):
+                self._postings[trigram].add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Remove an entry if it is indexed.
+
+        Args:
+            key (Hashable): The key of the entry.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for word in entry[0]:
+            for trigram in trigrams(word):
+                postings = self._postings.get(trigram)
+                if postings is None:
+                    continue
+                postings.discard(key)
+                if not postings:
+                    del self._postings[trigram]
+
+    def search(self, query: str, limit: int, min_score: float = 0.5) -> list[Any]:
+        """
+        Find the entries best matching a query being typed.
+
+        Entries with a term starting with the query come first, then entries by the
+        share of query trigrams they contain.
+
+        Args:
+            query (str): The typed text.
+            limit (int): The maximum number of values.
+            min_score (float): The minimum share of query trigrams an entry must contain.
+
+        Returns:
+            list[Any]: The values of the matching entries, best first.
+        """
+        words = normalize(query).split()
+        if not words:
+            return []
+        query_trigrams = set().union(*(trigrams(word, prefix=True) for word in words))
+        counts = Counter()
+        for trigram in query_trigrams:
+            counts.update(self._postings.get(trigram, ()))
+
+        def rank(key: Hashable) -> tuple:
+            terms = self._entries[key][0]
+            prefixes = sum(any(term.startswith(word) for term in terms) for word in words)
+            return -prefixes, -counts[key], terms
+
+        threshold = min_score * len(query_trigrams)
+        matches = [key for key, count in counts.items() if count >= threshold]
+        return [self._entries[key][1] for key in heapq.nsmallest(limit, matches, key=rank)]
+
+
+class TrigramIndexCache:
+    """
+    Least recently used trigram indexes, bounded by their total number of entries.
+
+    Attributes:
+        max_entries (int): The total number of entries kept before evicting indexes.
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): The total number of entries kept before evicting indexes.
+        """
+        self.max_entries = max_entries
+        self._indexes: OrderedDict[Hashable, TrigramIndex] = OrderedDict()
+
+    def get(self, key: Hashable) -> TrigramIndex | None:
+        """
+        Retrieve an index and mark it as recently used.
+
+        Args:
+            key (Hashable): The key of the index.
+
+        Returns:
+            TrigramIndex | None: The index, None if it is not cached.
+        """
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+        return index
+
+    def peek(self, key: Hashable) -> TrigramIndex | None:
+        """
+        Retrieve an index without marking it as used, e.g. to update it.
+
+        Args:
+            key (Hashable): The key of the index.
+
+        Returns:
+            TrigramIndex | None: The index, None if it is not cached.
+        """
+        return self._indexes.get(key)
+
+    def put(self, key: Hashable, index: TrigramIndex) -> None:
+        """
+        Cache an index, evicting the least recently used ones over the entry budget.
+
+        Args:
+            key (Hashable): The key of the index.
+            index (TrigramIndex): The index.
+        """
+        self._indexes[key] = index
+        self._indexes.move_to_end(key)
+        total = sum(len(cached) for cached in self._indexes.values())
+        while total > self.max_entries and len(self._indexes) > 1:
+            _, evicted = self._indexes.popitem(last=False)
+            total -= len(evicted)
+
+    def discard(self, key: Hashable) -> None:
+        """
+        Remove an index from the cache.
+
+        Args:
+            key (Hashable): The key of the index.
+        """
+        self._indexes.pop(key, None)
@@ -0,0 +1,147 @@
+""" Request deadlines carried to the database queries.
+
+The deadline of the current request is kept in a context variable, which the route, the
+services and the CRUD functions share, also in the threads FastAPI runs sync code in.
+The database layer checks it before every statement and, on SQLite, from a progress
+handler while a statement runs, so a runaway query is interrupted when the client stops
+waiting for it.
+"""
+import math
+import re
+import time
+from contextvars import ContextVar
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from core.logging_conf import Logging
+
+log = Logging(__name__).log()
+
+REQUEST_TIMEOUT_HEADER = b"x-request-timeout"
+
+# The monotonic time the current request must be answered by, None without a deadline
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """ The deadline of the request passed while it was waiting for the database. """
+
+
+def remaining_seconds() -> float | None:
+    """
+    Retrieve the time left until the deadline of the current request.
+
+    Returns:
+        float | None: The seconds left, negative once passed, None without a deadline.
+    """
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_deadline_exceeded() -> bool:
+    """
+    Check if the deadline of the current request has passed.
+
+    Returns:
+        bool: True if the request has a deadline and it has passed.
+    """
+    deadline = request_deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def check_deadline() -> None:
+    """
+    Stop the current request if its deadline has passed.
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed.
+    """
+    if is_deadline_exceeded():
+        raise DeadlineExceeded()
+
+
+def sqlite_progress_handler() -> int:
+    """
+    Interrupt the running SQLite statement once the deadline has passed.
+
+    Returns:
+        int: Non-zero to interrupt the statement.
+    """
+    return int(is_deadline_exceeded())
+
+
+class DeadlineMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    Sets the deadline of every HTTP request.
+
+    The timeout is the one of the first matching route pattern. Clients may ask for a
+    shorter one in seconds with the ``X-Request-Timeout`` header. The deadline bounds the
+    time to the first byte: once the response has started it can no longer be answered
+    with 504, so a streamed body, e.g. an export, runs without it.
+
+    Attributes:
+        app (ASGIApp): The wrapped application.
+        timeouts (tuple[tuple[re.Pattern, float], ...]): The compiled path patterns and
+            their timeouts in seconds.
+    """
+
+    def __init__(self, app: ASGIApp, timeouts: tuple[tuple[str, float], ...]):
+        """
+        Initialize the middleware.
+
+        Args:
+            app (ASGIApp): The wrapped application.
+            timeouts (tuple[tuple[str, float], ...]): The path patterns, matched against
+                the start of the path, and their timeouts in seconds, most specific first.
+        """
+        self.app = app
+        self.timeouts = tuple((re.compile(pattern), seconds) for pattern, seconds in timeouts)
+
+    def _get_timeout(self, scope: Scope) -> float | None:
+        """
+        Retrieve the timeout of a request.
+
+        Args:
+            scope (Scope): The ASGI scope.
+
+        Returns:
+            float | None: The timeout in seconds, None if no pattern matches.
+        """
+        timeout = next((seconds for pattern, seconds in self.timeouts
+                        if pattern.match(scope["path"])), None)
+        if timeout is None:
+            return None
+        for name, value in scope["headers"]:
+            if name == REQUEST_TIMEOUT_HEADER:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if math.isfinite(requested) and requested > 0:
+                    timeout = min(timeout, requested)
+                break
+        return timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Process an HTTP request with its deadline set.
+
+        Args:
+            scope (Scope): The ASGI scope.
+            receive (Receive): The ASGI receive channel.
+            send (Send): The ASGI send channel.
+        """
+        timeout = self._get_timeout(scope) if scope["type"] == "http" else None
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+        async def send_started(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Set in the context of the task sending the response, the one iterating
+                # a streamed body
+                request_deadline.set(None)
+            await send(message)
+
+        token = request_deadline.set(time.monotonic() + timeout)
+        try:
+            await self.app(scope, receive, send_started)
+        finally:
+            request_deadline.reset(token)
@@ -0,0 +1,418 @@
+""" Read-through caches of entities looked up by ID.
+
+A cached lookup returns the entity stored under its ID until the TTL of the entity type
+passes, and remembers missing IDs for a shorter negative TTL. The helpers changing or
+deleting an entity invalidate its key after they commit, in this process and, through
+the invalidation listeners, in the others. Every invalidation bumps the generation of
+the key, a lookup only caches what it loaded if the generation did not change meanwhile,
+so a row read before a write is never cached after it. The entities are kept by a
+backend: ``LRUCacheBackend`` in the memory of each process, or ``FileCacheBackend``
+shared by the processes of a host through a directory, e.g. on ``/dev/shm``, the local
+stand-in for an external cache server.
+"""
+import fcntl
+import functools
+import hashlib
+import itertools
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Protocol, TypeVar
+from core.logging_conf import Logging
+
+log = Logging(__name__).log()
+
+R = TypeVar("R")
+
+
+class CacheBackend(Protocol):
+    """ Storage of cached values with an expiry, and of the generation of every key. """
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """ Return whether the key is cached and its value. """
+
+    def generation(self, key: str) -> int:
+        """ Return the generation of a key, changed by every ``delete``. """
+
+    def set(self, key: str, value: Any, ttl: float, generation: int | None = None) -> None:
+        """ Store a value for ``ttl`` seconds, if the key is still at ``generation``. """
+
+    def delete(self, key: str) -> None:
+        """ Remove a key and bump its generation. """
+
+
+class LRUCacheBackend:
+    """
+    Values kept in the memory of the process, the least recently used are evicted.
+
+    Attributes:
+        max_entries (int): The number of keys kept, and of generations of deleted keys.
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): The number of keys kept.
+        """
+        self.max_entries = max_entries
+        # Key -> (expiry on the monotonic clock, value)
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        # Key -> generation of its last delete, the oldest are forgotten over the limit
+        self._generations: OrderedDict[str, int] = OrderedDict()
+        # The generation of forgotten keys, above every generation forgotten so far
+        self._forgotten_generation = 0
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """ Return the number of cached keys, expired ones included. """
+        return len(self._entries)
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """
+        Retrieve a value, marking it as recently used.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            tuple[bool, Any]: True and the value if cached and not expired, else False.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def generation(self, key: str) -> int:
+        """
+        Retrieve the generation of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            int: The generation, changed by every delete of the key.
+        """
+        with self._lock:
+            return self._generations.get(key, self._forgotten_generation)
+
+    def set(self, key: str, value: Any, ttl: float, generation: int | None = None) -> None:
+        """
+        Store a value, evicting the least recently used keys over the limit.
+
+        Args:
+            key (str): The key.
+            value (Any): The value.
+            ttl (float): Seconds the value is kept.
+            generation (int | None): The generation the key must still have, None to
+                store the value anyway.
+        """
+        with self._lock:
+            if generation is not None and \
+                    self._generations.get(key, self._forgotten_generation) != generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a key and bump its generation.
+
+        Args:
+            key (str): The key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations.pop(key, None)
+            self._generations[key] = next(self._counter)
+            while len(self._generations) > self.max_entries:
+                _, forgotten = self._generations.popitem(last=False)
+                self._forgotten_generation = max(self._forgotten_generation, forgotten)
+
+
+class FileCacheBackend:
+    """
+    Values pickled to one file per key in a directory private to the user of the
+    processes, so an invalidation in one process is seen by all of them. A deleted key
+    leaves an expired file carrying its generation, stores and deletes hold a lock on the
+    directory so a store never overwrites a newer generation.
+
+    Attributes:
+        directory (Path): The directory of the cache files.
+    """
+
+    def __init__(self, directory: Path):
+        """
+        Open the cache, creating its directory if it does not exist.
+
+        Args:
+            directory (Path): The directory, e.g. on ``/dev/shm``.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._lock_path = self.directory / ".lock"
+
+    def _path(self, key: str) -> Path:
+        """
+        Build the file of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Path: The file holding the value of the key.
+        """
+        return self.directory / hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """ Hold the lock of the directory, shared by the processes of the host. """
+        with open(self._lock_path, "ab") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self, key: str) -> tuple[float, Any, int] | None:
+        """
+        Read the file of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            tuple[float, Any, int] | None: The expiry on the wall clock, the value and the
+                generation, None if there is no readable file of the key.
+        """
+        try:
+            with open(self._path(key), "rb") as file:
+                stored_key, expires_at, value, generation = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as exc:
+            log.warning("Unreadable cache entry of %s: %s", key, exc)
+            return None
+        if stored_key != key:
+            return None
+        return expires_at, value, generation
+
+    def _write(self, key: str, expires_at: float, value: Any, generation: int) -> None:
+        """
+        Replace the file of a key atomically.
+
+        Args:
+            key (str): The key.
+            expires_at (float): The expiry on the wall clock.
+            value (Any): The value, it must be picklable.
+            generation (int): The generation of the key.
+        """
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                pickle.dump((key, expires_at, value, generation), file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """
+        Retrieve a value.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            tuple[bool, Any]: True and the value if cached and not expired, else False.
+        """
+        entry = self._read(key)
+        if entry is None or entry[0] <= time.time():
+            return False, None
+        return True, entry[1]
+
+    def generation(self, key: str) -> int:
+        """
+        Retrieve the generation of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            int: The generation, changed by every delete of the key.
+        """
+        entry = self._read(key)
+        return 0 if entry is None else entry[2]
+
+    def set(self, key: str, value: Any, ttl: float, generation: int | None = None) -> None:
+        """
+        Store a value, replacing the file of the key atomically.
+
+        Args:
+            key (str): The key.
+            value (Any): The value, it must be picklable.
+            ttl (float): Seconds the value is kept.
+            generation (int | None): The generation the key must still have, None to
+                store the value anyway.
+        """
+        with self._locked():
+            current = self.generation(key)
+            if generation is None or current == generation:
+                self._write(key, time.time() + ttl, value, current)
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a key, leaving an expired file with its next generation.
+
+        Args:
+            key (str): The key.
+        """
+        with self._locked():
+            self._write(key, 0.0, None, self.generation(key) + 1)
+
+
+class EntityCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Read-through cache of one entity type.
+
+    Attributes:
+        name (str): The entity type, the prefix of the keys.
+        backend (CacheBackend): The storage of the entities.
+        ttl (float): Seconds an entity is cached, 0 to disable the cache.
+        negative_ttl (float): Seconds a missing ID is cached, 0 to look it up every time.
+        hits (int): Lookups answered from the cache, negative ones included.
+        misses (int): Lookups loaded from the database.
+        invalidations (int): Keys invalidated by writes.
+        listeners (list[Callable[[str, str], None]]): Called with the entity type and the
+            ID of every invalidated entity, e.g. to evict it in the other processes.
+    """
+
+    def __init__(self, name: str, backend: CacheBackend, ttl: float, negative_ttl: float):
+        """
+        Initialize the cache of an entity type.
+
+        Args:
+            name (str): The entity type, the prefix of the keys.
+            backend (CacheBackend): The storage of the entities.
+            ttl (float): Seconds an entity is cached.
+            negative_ttl (float): Seconds a missing ID is cached.
+        """
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.listeners: list[Callable[[str, str], None]] = []
+        # The lookups run in the threads of asyncio.to_thread as well
+        self._lock = threading.Lock()
+
+    def _key(self, entity_id: Any) -> str:
+        """
+        Build the key of an entity.
+
+        Args:
+            entity_id (Any): The ID of the entity.
+
+        Returns:
+            str: The key.
+        """
+        return f"{self.name}:{entity_id}"
+
+    def cached(self, function: Callable[[Any], R | None]) -> Callable[[Any], R | None]:
+        """
+        Cache a lookup by ID, called with the ID as its only argument.
+
+        Args:
+            function (Callable[[Any], R | None]): The lookup, returning None for a missing
+                ID. The entities it returns must be immutable, they are shared.
+
+        Returns:
+            Callable[[Any], R | None]: The cached lookup. Its ``refresh`` attribute loads
+                the entity from the database and caches it, for responses whose
+                validators are read from the database as well.
+        """
+        def load(key: str, *args: Any, **kwargs: Any) -> R | None:
+            with self._lock:
+                self.misses += 1
+            # An invalidation while the entity is read bumps the generation, the entity
+            # read may then predate the write and is not cached
+            generation = self.backend.generation(key)
+            entity = function(*args, **kwargs)
+            if entity is not None:
+                self.backend.set(key, entity, self.ttl, generation)
+            elif self.negative_ttl > 0:
+                self.backend.set(key, None, self.negative_ttl, generation)
+            return entity
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> R | None:
+            if self.ttl <= 0:
+                return function(*args, **kwargs)
+            key = self._key(args[0] if args else next(iter(kwargs.values())))
+            found, entity = self.backend.get(key)
+            if found:
+                with self._lock:
+                    self.hits += 1
+                return entity
+            return load(key, *args, **kwargs)
+
+        @functools.wraps(function)
+        def refresh(*args: Any, **kwargs: Any) -> R | None:
+            if self.ttl <= 0:
+                return function(*args, **kwargs)
+            return load(self._key(args[0] if args else next(iter(kwargs.values()))),
+                        *args, **kwargs)
+
+        wrapper.refresh = refresh
+        return wrapper
+
+    def invalidate(self, entity_id: Any) -> None:
+        """
+        Drop the cached entity of an ID, after a write to it was committed.
+
+        Args:
+            entity_id (Any): The ID of the entity.
+        """
+        with self._lock:
+            self.invalidations += 1
+        self.evict(entity_id)
+        for listener in self.listeners:
+            listener(self.name, str(entity_id))
+
+    def evict(self, entity_id: Any) -> None:
+        """
+        Drop the cached entity of an ID and bump its generation without notifying the
+        listeners, e.g. when the invalidation of another process is delivered.
+
+        Args:
+            entity_id (Any): The ID of the entity.
+        """
+        self.backend.delete(self._key(entity_id))
+
+    def stats(self) -> dict[str, int]:
+        """
+        Retrieve the cache metrics of this process.
+
+        Returns:
+            dict[str, int]: The hits, misses and invalidations.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "invalidations": self.invalidations}
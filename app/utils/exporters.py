@@ -0,0 +1,171 @@
+""" Row encoders for NDJSON and CSV exports. """
+import csv
+import io
+import zlib
+from dataclasses import fields
+from typing import Annotated, Any, Iterable, Iterator, Literal
+import orjson
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+
+# pylint: disable=no-member
+
+ExportFormat = Literal["ndjson", "csv"]
+ExportFormatQuery = Annotated[ExportFormat, Query(alias="format")]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Rows encoded before a chunk is handed to the response
+EXPORT_CHUNK_ROWS = 500
+
+
+def _csv_value(value: Any) -> Any:
+    """
+    Convert a row value into its CSV cell representation.
+
+    Args:
+        value (Any): The value.
+
+    Returns:
+        Any: The cell value, datetimes in ISO 8601.
+    """
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def encode_ndjson(rows: Iterable[Any], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Encode dataclass rows as newline delimited JSON.
+
+    Args:
+        rows (Iterable[Any]): The dataclass rows, orjson encodes them natively.
+        chunk_rows (int): The number of rows per yielded chunk.
+
+    Yields:
+        bytes: Chunks of NDJSON lines.
+    """
+    buffer = []
+    for row in rows:
+        buffer.append(orjson.dumps(row))
+        if len(buffer) >= chunk_rows:
+            yield b"\n".join(buffer) + b"\n"
+            buffer.clear()
+    if buffer:
+        yield b"\n".join(buffer) + b"\n"
+
+
+def encode_csv(rows: Iterable[Any], row_type: type, chunk_rows: int = EXPORT_CHUNK_ROWS,
+               header: bool = True) -> Iterator[bytes]:
+    """
+    Encode dataclass rows as CSV with a header line.
+
+    Args:
+        rows (Iterable[Any]): The dataclass rows.
+        row_type (type): The dataclass of the rows, its fields are the CSV columns.
+        chunk_rows (int): The number of rows per yielded chunk.
+        header (bool): Write the header line, False when appending to an existing file.
+
+    Yields:
+        bytes: Chunks of CSV lines.
+    """
+    columns = [field.name for field in fields(row_type)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([_csv_value(getattr(row, column)) for column in columns])
+        count += 1
+        if count >= chunk_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def encode_rows(rows: Iterable[Any], row_type: type, export_format: ExportFormat,
+                header: bool = True) -> Iterator[bytes]:
+    """
+    Encode dataclass rows in the requested export format.
+
+    Args:
+        rows (Iterable[Any]): The dataclass rows.
+        row_type (type): The dataclass of the rows.
+        export_format (ExportFormat): "ndjson" or "csv".
+        header (bool): Write the CSV header line.
+
+    Returns:
+        Iterator[bytes]: The encoded chunks.
+    """
+    if export_format == "csv":
+        return encode_csv(rows, row_type, header=header)
+    return encode_ndjson(rows)
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Compress a stream of chunks into a single gzip stream.
+
+    Args:
+        chunks (Iterable[bytes]): The uncompressed chunks.
+        level (int): The compression level.
+
+    Yields:
+        bytes: The compressed chunks.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(request: Request) -> bool:
+    """
+    Check whether the client accepts a gzip encoded response.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        bool: True if gzip is listed in Accept-Encoding and not refused with q=0.
+    """
+    for encoding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = encoding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def export_response(request: Request, chunks: Iterable[bytes], export_format: ExportFormat,
+                    filename: str) -> StreamingResponse:
+    """
+    Build the streaming download response of an export.
+
+    The body is gzip encoded on the fly when the client accepts it.
+
+    Args:
+        request (Request): The incoming request.
+        chunks (Iterable[bytes]): The encoded export chunks.
+        export_format (ExportFormat): "ndjson" or "csv".
+        filename (str): The download file name without extension.
+
+    Returns:
+        StreamingResponse: The streaming response.
+    """
+    extension = "csv" if export_format == "csv" else "ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{extension}"',
+               "Vary": "Accept-Encoding"}
+    if accepts_gzip(request):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=EXPORT_MEDIA_TYPES[export_format],
+                             headers=headers)
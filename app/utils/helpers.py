@@ -1,4 +1,8 @@
 """ The Helpers file."""
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
 from typing import Annotated
 from uuid import UUID
 from fastapi import Path
@@ -7,6 +11,11 @@ from core.logging_conf import Logging
 
 log = Logging(__name__).log()
 
+# State shared by generate_uuid7 to keep ids monotonic within a process
+_UUID7_LOCK = threading.Lock()
+_UUID7_STATE = {"timestamp_ms": 0, "counter": 0}
+_UUID7_COUNTER_MAX = 0xFFF
+
 # from google.cloud import secretmanager
 #
 #
@@ -89,3 +98,51 @@ def  get_user_id(user_id: Annotated[str, Path(...)]) -> UUID:
         UUID: user_id in UUID.
     """
     return UUID(user_id)
+
+
+def generate_uuid7() -> UUID:
+    """
+    Generate a time-ordered UUID version 7 (RFC 9562).
+
+    The first 48 bits hold the Unix timestamp in milliseconds, so ids created later sort
+    after ids created earlier and new rows are appended to the end of primary key indexes.
+    The 12-bit ``rand_a`` field is used as a counter seeded with random bits, which keeps
+    ids generated within the same millisecond (or after a backwards clock step) increasing.
+
+    Returns:
+        UUID: A new UUIDv7 value, usable anywhere a uuid4 was used before.
+    """
+    with _UUID7_LOCK:
+        timestamp_ms = time.time_ns() // 1_000_000
+        if timestamp_ms <= _UUID7_STATE["timestamp_ms"]:
+            timestamp_ms = _UUID7_STATE["timestamp_ms"]
+            counter = _UUID7_STATE["counter"] + 1
+            if counter > _UUID7_COUNTER_MAX:
+                # Counter exhausted, borrow the next millisecond
+                timestamp_ms += 1
+                counter = secrets.randbits(11)
+        else:
+            # Leave headroom in the counter for ids generated in the same millisecond
+            counter = secrets.randbits(11)
+        _UUID7_STATE["timestamp_ms"] = timestamp_ms
+        _UUID7_STATE["counter"] = counter
+
+    value = ((timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+             | 0x7 << 76
+             | counter << 64
+             | 0b10 << 62
+             | secrets.randbits(62))
+    return UUID(int=value)
+
+
+def utc_now() -> datetime:
+    """
+    Current time in UTC with microsecond precision.
+
+    Used as the Python side ``onupdate`` of ``updated_at`` columns, SQLite's ``now()``
+    only has second precision which is too coarse to tell two quick updates apart.
+
+    Returns:
+        datetime: The aware current UTC time.
+    """
+    return datetime.now(timezone.utc)
@@ -0,0 +1,148 @@
+""" HTTP conditional request helpers (ETag / Last-Modified). """
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response, status
+from exceptions import http_exceptions
+
+
+@dataclass(slots=True, frozen=True)
+class CacheValidators:
+    """
+    Validators describing the current version of a resource representation.
+
+    Attributes:
+        etag (str): The strong entity tag, including the surrounding quotes.
+        last_modified (datetime): The time the representation last changed.
+    """
+    etag: str
+    last_modified: datetime
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """
+        The ETag and Last-Modified response headers.
+
+        Returns:
+            dict[str, str]: The headers.
+        """
+        return {"ETag": self.etag,
+                "Last-Modified": format_datetime(self.last_modified, usegmt=True)}
+
+
+def _as_utc(value: datetime) -> datetime:
+    """
+    Convert a datetime to an aware UTC datetime truncated to whole seconds.
+
+    Args:
+        value (datetime): The datetime, naive values are treated as UTC.
+
+    Returns:
+        datetime: The aware UTC datetime.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def build_cache_validators(*parts, last_modified: list[datetime]) -> CacheValidators:
+    """
+    Build the validators of a representation from the values it depends on.
+
+    Args:
+        *parts: The values that identify the representation version (ids, versions, ...).
+        last_modified (list[datetime]): The modification times of the involved records.
+
+    Returns:
+        CacheValidators: The ETag and Last-Modified of the representation.
+    """
+    # The ETag uses the full timestamp precision, Last-Modified only has whole seconds
+    fingerprint = ":".join(str(part) for part in (*parts, *last_modified))
+    etag = f'"{hashlib.sha256(fingerprint.encode()).hexdigest()[:32]}"'
+    return CacheValidators(etag=etag,
+                           last_modified=max(_as_utc(value) for value in last_modified))
+
+
+def _parse_etags(header: str) -> list[str]:
+    """
+    Split an If-None-Match / If-Match header into entity tags.
+
+    Args:
+        header (str): The header value.
+
+    Returns:
+        list[str]: The entity tags, weak tags without their W/ prefix.
+    """
+    tags = [tag.strip() for tag in header.split(",")]
+    return [tag[2:] if tag.startswith("W/") else tag for tag in tags if tag]
+
+
+def is_not_modified(request: Request, validators: CacheValidators) -> bool:
+    """
+    Evaluate If-None-Match and If-Modified-Since for a GET request.
+
+    If-None-Match takes precedence; If-Modified-Since is only used without it.
+
+    Args:
+        request (Request): The incoming request.
+        validators (CacheValidators): The validators of the current representation.
+
+    Returns:
+        bool: True if the client copy is current and 304 should be returned.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _parse_etags(if_none_match)
+        return "*" in tags or validators.etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return validators.last_modified <= _as_utc(since)
+    return False
+
+
+def not_modified_response(validators: CacheValidators) -> Response:
+    """
+    Build the 304 Not Modified response.
+
+    Args:
+        validators (CacheValidators): The validators of the current representation.
+
+    Returns:
+        Response: The empty 304 response carrying the validators.
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+
+
+def verify_if_match(if_match: str | None, validators: CacheValidators) -> bool:
+    """
+    Evaluate If-Match for a state changing request.
+
+    A matching ETag only holds while the resource keeps the version it was computed from,
+    the write must then be conditional on that version.
+
+    Args:
+        if_match (str | None): The If-Match header, None if absent.
+        validators (CacheValidators): The validators of the current representation.
+
+    Returns:
+        bool: True if the write must only happen while the resource has the version of
+            the validators, False if If-Match is absent or ``*``.
+
+    Raises:
+        HTTPException: If If-Match is present and does not match the current ETag.
+    """
+    if if_match is None:
+        return False
+    # If-Match uses the strong comparison, weak tags never match
+    tags = [tag.strip() for tag in if_match.split(",")]
+    if "*" in tags:
+        return False
+    if validators.etag not in tags:
+        raise http_exceptions.PRECONDITION_FAILED_EXCEPTION
+    return True
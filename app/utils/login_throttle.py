@@ -0,0 +1,161 @@
+""" Throttling of failed logins per username and per client IP address.
+
+Every failed login adds to a failure score of the username and of the IP address that
+decays by half every ``half_life`` seconds. Once a score reaches its threshold, each
+further failure locks the key out for twice as long as the previous one. Locked out
+attempts are rejected before the user lookup and the password hash verification.
+
+An accepted attempt is reserved until it ends and counts as a failure in the meantime,
+so a burst of concurrent attempts cannot run more password verifications than the
+threshold allows before the first failure is recorded.
+"""
+import threading
+import time
+from collections import OrderedDict
+from core.config import LOGIN_THROTTLE_USER_THRESHOLD, LOGIN_THROTTLE_IP_THRESHOLD, \
+    LOGIN_THROTTLE_BASE_SECONDS, LOGIN_THROTTLE_MAX_SECONDS, LOGIN_THROTTLE_HALF_LIFE_SECONDS, \
+    LOGIN_THROTTLE_MAX_ENTRIES
+
+
+class LoginThrottle:  # pylint: disable=too-many-instance-attributes
+    """
+    Failure scores and lockouts of the most recently failing usernames and addresses.
+
+    Attributes:
+        user_threshold (float): The failures of a username before it is locked out.
+        ip_threshold (float): The failures of an address before it is locked out.
+        base_lockout (float): Seconds of the first lockout.
+        max_lockout (float): The longest lockout in seconds.
+        half_life (float): Seconds after which a failure counts half.
+        max_entries (int): The number of keys kept, the least recently failed are evicted.
+    """
+
+    def __init__(self, user_threshold: float = LOGIN_THROTTLE_USER_THRESHOLD,  # pylint: disable=too-many-arguments, too-many-positional-arguments
+                 ip_threshold: float = LOGIN_THROTTLE_IP_THRESHOLD,
+                 base_lockout: float = LOGIN_THROTTLE_BASE_SECONDS,
+                 max_lockout: float = LOGIN_THROTTLE_MAX_SECONDS,
+                 half_life: float = LOGIN_THROTTLE_HALF_LIFE_SECONDS,
+                 max_entries: int = LOGIN_THROTTLE_MAX_ENTRIES):
+        """
+        Initialize an empty throttle.
+
+        Args:
+            user_threshold (float): The failures of a username before it is locked out.
+            ip_threshold (float): The failures of an address before it is locked out.
+            base_lockout (float): Seconds of the first lockout.
+            max_lockout (float): The longest lockout in seconds.
+            half_life (float): Seconds after which a failure counts half.
+            max_entries (int): The number of keys kept.
+        """
+        self.user_threshold = user_threshold
+        self.ip_threshold = ip_threshold
+        self.base_lockout = base_lockout
+        self.max_lockout = max_lockout
+        self.half_life = half_life
+        self.max_entries = max_entries
+        # Key -> [failure score, score time, locked until]
+        self._entries: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        # Key -> attempts started and not ended yet
+        self._pending: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """ Return the number of tracked keys. """
+        return len(self._entries)
+
+    @staticmethod
+    def _keys(username: str, client_ip: str) -> tuple[tuple[str, str], tuple[str, str]]:
+        """
+        Build the keys of a login attempt.
+
+        Args:
+            username (str): The submitted username.
+            client_ip (str): The address of the client.
+
+        Returns:
+            tuple[tuple[str, str], tuple[str, str]]: The username and the address key.
+        """
+        return ("user", username.strip().lower()), ("ip", client_ip)
+
+    def start_attempt(self, username: str, client_ip: str, now: float | None = None) -> float:
+        """
+        Check if a login attempt is locked out, and reserve it if not.
+
+        An accepted attempt must be ended with ``end_attempt``. The attempts in progress
+        count as failures: an attempt is rejected if they would reach a threshold.
+
+        Args:
+            username (str): The submitted username.
+            client_ip (str): The address of the client.
+            now (float | None): The monotonic time, the current time if None.
+
+        Returns:
+            float: Seconds until attempts are accepted again, 0 if the attempt is accepted.
+        """
+        now = time.monotonic() if now is None else now
+        keys = self._keys(username, client_ip)
+        with self._lock:
+            locked_until = max((self._entries[key][2] for key in keys if key in self._entries),
+                               default=0.0)
+            if locked_until > now:
+                return locked_until - now
+            for key, threshold in zip(keys, (self.user_threshold, self.ip_threshold)):
+                score, scored_at, _ = self._entries.get(key, (0.0, now, 0.0))
+                score *= 0.5 ** ((now - scored_at) / self.half_life)
+                if score + self._pending.get(key, 0) >= threshold:
+                    return self.base_lockout
+            for key in keys:
+                self._pending[key] = self._pending.get(key, 0) + 1
+        return 0.0
+
+    def end_attempt(self, username: str, client_ip: str) -> None:
+        """
+        Release the reservation of an attempt accepted by ``start_attempt``.
+
+        Args:
+            username (str): The submitted username.
+            client_ip (str): The address of the client.
+        """
+        with self._lock:
+            for key in self._keys(username, client_ip):
+                pending = self._pending.pop(key, 0) - 1
+                if pending > 0:
+                    self._pending[key] = pending
+
+    def record_failure(self, username: str, client_ip: str, now: float | None = None) -> None:
+        """
+        Count a failed login, locking out the username or address over its threshold.
+
+        Args:
+            username (str): The submitted username.
+            client_ip (str): The address of the client.
+            now (float | None): The monotonic time, the current time if None.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for key, threshold in zip(self._keys(username, client_ip),
+                                      (self.user_threshold, self.ip_threshold)):
+                score, scored_at, locked_until = self._entries.pop(key, (0.0, now, 0.0))
+                score = score * 0.5 ** ((now - scored_at) / self.half_life) + 1
+                if score >= threshold:
+                    lockout = self.base_lockout * 2 ** (score - threshold)
+                    locked_until = now + min(lockout, self.max_lockout)
+                self._entries[key] = [score, now, locked_until]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_success(self, username: str) -> None:
+        """
+        Forget the failures of a username after a successful login.
+
+        The failures of the address are kept, one valid account must not clear a
+        credential stuffing run from the same address.
+
+        Args:
+            username (str): The username.
+        """
+        with self._lock:
+            self._entries.pop(self._keys(username, "")[0], None)
+
+
+login_throttle = LoginThrottle()
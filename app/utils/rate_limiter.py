@@ -0,0 +1,426 @@
+""" Rate limiting with the generic cell rate algorithm (GCRA).
+
+GCRA is a token bucket that stores a single timestamp per key, the theoretical arrival
+time (TAT) of the next request. A key whose TAT has passed has a full bucket, so it can be
+forgotten without changing any decision, which keeps the idle keys cheap to evict.
+"""
+import math
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Literal, Sequence
+import jwt
+from jwt.exceptions import InvalidTokenError
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+from core.config import SECRET_KEY, ALGORITHM, RATE_LIMIT_SHARDS, RATE_LIMIT_SWEEP_SECONDS, \
+    RATE_LIMIT_TRUST_FORWARDED_FOR, RATE_LIMIT_BACKEND, SHARED_COUNTERS_PATH, \
+    SHARED_COUNTERS_SLOTS, SHARED_COUNTERS_STRIPES
+from core.logging_conf import Logging
+from utils.shared_counters import SharedCounterTable, now_us
+
+# pylint: disable=no-member
+
+log = Logging(__name__).log()
+
+RateLimitKey = Literal["user", "ip", "route"]
+
+
+@dataclass(slots=True, frozen=True)
+class RateLimit:
+    """
+    A limit of requests per period.
+
+    Attributes:
+        limit (int): The requests allowed per period.
+        period (float): The period in seconds.
+        key (RateLimitKey): Count the requests per user (falling back to the IP address
+            for anonymous requests), per IP address or of all clients together.
+        burst (int | None): The requests allowed at once, ``limit`` if None.
+    """
+    limit: int
+    period: float
+    key: RateLimitKey = "user"
+    burst: int | None = None
+
+    @property
+    def interval(self) -> float:
+        """ The seconds one request uses up. """
+        return self.period / self.limit
+
+    @property
+    def tolerance(self) -> float:
+        """ The seconds the TAT may run ahead of now, i.e. the bucket size. """
+        return self.interval * (self.burst or self.limit)
+
+
+@dataclass(slots=True, frozen=True)
+class RateLimitResult:
+    """
+    The decision on a request.
+
+    Attributes:
+        allowed (bool): The request may proceed.
+        remaining (int): The requests still allowed right now.
+        retry_after (float): Seconds until the request would be allowed, 0 if allowed.
+    """
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+
+def check_limits(hits: Sequence[tuple[str, RateLimit]], tats: Sequence[float], now: float,
+                 scale: int = 1) -> tuple[list[float], list[RateLimitResult]]:
+    """
+    Decide on a request against several limits at once, all or none are counted.
+
+    Args:
+        hits (Sequence[tuple[str, RateLimit]]): The key and limit of every check.
+        tats (Sequence[float]): The stored TAT of every key, ``now`` or earlier if none.
+        now (float): The current time.
+        scale (int): The units of the times per second.
+
+    Returns:
+        tuple[list[float], list[RateLimitResult]]: The TAT to store for every key, the
+            stored ones unless every limit allows the request, and the decision of every
+            limit.
+    """
+    pending: dict[str, float] = {}
+    results = []
+    for (key, limit), stored_tat in zip(hits, tats):
+        interval = limit.interval * scale
+        # A key checked twice sees the TAT the first check would store
+        tat = max(pending.get(key, stored_tat), now) + interval
+        allowed_at = tat - limit.tolerance * scale
+        if now < allowed_at:
+            results.append(RateLimitResult(allowed=False, remaining=0,
+                                           retry_after=(allowed_at - now) / scale))
+        else:
+            pending[key] = tat
+            results.append(RateLimitResult(allowed=True, retry_after=0.0,
+                                           remaining=int((now - allowed_at) / interval)))
+    if not all(result.allowed for result in results):
+        return list(tats), results
+    return [pending[key] for key, _ in hits], results
+
+
+class GCRALimiter:
+    """
+    In-memory GCRA state of the process, sharded by key.
+
+    Each shard has its own lock, so concurrent threads rarely wait on each other. Idle
+    keys are swept from a shard when it is next used after ``sweep_interval``.
+
+    Attributes:
+        sweep_interval (float): Seconds between the sweeps of a shard.
+    """
+
+    def __init__(self, shards: int = RATE_LIMIT_SHARDS,
+                 sweep_interval: float = RATE_LIMIT_SWEEP_SECONDS):
+        """
+        Initialize an empty limiter.
+
+        Args:
+            shards (int): The number of shards.
+            sweep_interval (float): Seconds between the sweeps of a shard.
+        """
+        self.sweep_interval = sweep_interval
+        self._shards: list[dict[str, float]] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._swept_at = [time.monotonic()] * shards
+
+    def __len__(self) -> int:
+        """ Return the number of tracked keys. """
+        return sum(len(shard) for shard in self._shards)
+
+    def hit(self, key: str, limit: RateLimit, now: float | None = None) -> RateLimitResult:
+        """
+        Count a request against a limit, unless it is over the limit.
+
+        Args:
+            key (str): The key the requests are counted by.
+            limit (RateLimit): The limit.
+            now (float | None): The monotonic time, the current time if None.
+
+        Returns:
+            RateLimitResult: The decision.
+        """
+        return self.hit_all([(key, limit)], now)[0]
+
+    def hit_all(self, hits: Sequence[tuple[str, RateLimit]],
+                now: float | None = None) -> list[RateLimitResult]:
+        """
+        Count a request against several limits, unless it is over any of them.
+
+        Args:
+            hits (Sequence[tuple[str, RateLimit]]): The key and limit of every check.
+            now (float | None): The monotonic time, the current time if None.
+
+        Returns:
+            list[RateLimitResult]: The decision of every limit.
+        """
+        now = time.monotonic() if now is None else now
+        indexes = [hash(key) % len(self._shards) for key, _ in hits]
+        with ExitStack() as stack:
+            for index in sorted(set(indexes)):
+                stack.enter_context(self._locks[index])
+                if now - self._swept_at[index] > self.sweep_interval:
+                    self._sweep(index, now)
+            tats, results = check_limits(hits, [self._shards[index].get(key, now) for index,
+                                                (key, _) in zip(indexes, hits)], now)
+            if all(result.allowed for result in results):
+                for index, (key, _), tat in zip(indexes, hits, tats):
+                    self._shards[index][key] = tat
+        return results
+
+    def _sweep(self, index: int, now: float) -> None:
+        """
+        Forget the keys of a shard whose bucket is full again, the shard lock is held.
+
+        Args:
+            index (int): The index of the shard.
+            now (float): The monotonic time.
+        """
+        shard = self._shards[index]
+        for key in [key for key, tat in shard.items() if tat <= now]:
+            del shard[key]
+        self._swept_at[index] = now
+
+
+class SharedGCRALimiter:
+    """
+    GCRA state shared by the processes of a host, the TAT of a key is kept in a slot of a
+    ``SharedCounterTable`` and expires when the bucket is full again.
+
+    Attributes:
+        table (SharedCounterTable): The shared table.
+    """
+
+    def __init__(self, table: SharedCounterTable):
+        """
+        Initialize the limiter.
+
+        Args:
+            table (SharedCounterTable): The shared table.
+        """
+        self.table = table
+
+    def hit(self, key: str, limit: RateLimit, now: float | None = None) -> RateLimitResult:
+        """
+        Count a request against a limit, unless it is over the limit.
+
+        Args:
+            key (str): The key the requests are counted by.
+            limit (RateLimit): The limit.
+            now (float | None): The wall clock time, the current time if None.
+
+        Returns:
+            RateLimitResult: The decision.
+        """
+        return self.hit_all([(key, limit)], now)[0]
+
+    def hit_all(self, hits: Sequence[tuple[str, RateLimit]],
+                now: float | None = None) -> list[RateLimitResult]:
+        """
+        Count a request against several limits, unless it is over any of them.
+
+        Args:
+            hits (Sequence[tuple[str, RateLimit]]): The key and limit of every check.
+            now (float | None): The wall clock time, the current time if None.
+
+        Returns:
+            list[RateLimitResult]: The decision of every limit.
+        """
+        now = now_us() if now is None else int(now * 1_000_000)
+        results: list[RateLimitResult] = []
+
+        def gcra(stored: list[tuple[int, int]]) -> list[tuple[int, int, int]]:
+            tats, decisions = check_limits(hits, [tat for _, tat in stored], now,
+                                           scale=1_000_000)
+            results[:] = decisions
+            return [(0, round(tat), round(tat)) for tat in tats]
+
+        self.table.update_many([f"rate:{key}" for key, _ in hits], gcra, now=now)
+        return results
+
+
+def get_rate_limiter(backend: str = RATE_LIMIT_BACKEND) -> GCRALimiter | SharedGCRALimiter:
+    """
+    Create the configured rate limiter.
+
+    Args:
+        backend (str): "memory" for a limiter per process, "shared" for one per host.
+
+    Returns:
+        GCRALimiter | SharedGCRALimiter: The limiter.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == "memory":
+        return GCRALimiter()
+    if backend == "shared":
+        return SharedGCRALimiter(SharedCounterTable(SHARED_COUNTERS_PATH,
+                                                    slots=SHARED_COUNTERS_SLOTS,
+                                                    stripes=SHARED_COUNTERS_STRIPES))
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+@dataclass(slots=True, frozen=True)
+class RatePolicy:
+    """
+    The limits of the routes under a path prefix.
+
+    Attributes:
+        path (str): The path prefix, e.g. ``/api/v1/auth/token``.
+        limits (tuple[RateLimit, ...]): The limits, a request must pass all of them.
+        methods (tuple[str, ...] | None): The HTTP methods, all if None.
+    """
+    path: str
+    limits: tuple[RateLimit, ...]
+    methods: tuple[str, ...] | None = None
+
+    def matches(self, method: str, path: str) -> bool:
+        """
+        Check if the policy applies to a request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path.
+
+        Returns:
+            bool: True if the policy applies.
+        """
+        return path.startswith(self.path) and (self.methods is None or method in self.methods)
+
+
+def get_client_ip(scope: Scope) -> str:
+    """
+    Retrieve the IP address of the client of a request.
+
+    Args:
+        scope (Scope): The ASGI scope.
+
+    Returns:
+        str: The address, the last ``X-Forwarded-For`` entry behind a trusted proxy.
+    """
+    if RATE_LIMIT_TRUST_FORWARDED_FOR:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                # The entries before the one appended by the proxy come from the client
+                return value.decode("latin-1").split(",")[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def get_token_subject(scope: Scope) -> str | None:
+    """
+    Retrieve the username of the bearer token of a request, without a database lookup.
+
+    Args:
+        scope (Scope): The ASGI scope.
+
+    Returns:
+        str | None: The token subject, None if the request has no valid token.
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+            except InvalidTokenError:
+                return None
+    return None
+
+
+class RateLimitMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    Rejects the HTTP requests over the limits of the first matching policy with 429.
+
+    Attributes:
+        app (ASGIApp): The wrapped application.
+        policies (tuple[RatePolicy, ...]): The policies, most specific first.
+        limiter (GCRALimiter | SharedGCRALimiter): The rate limit state.
+    """
+
+    def __init__(self, app: ASGIApp, policies: tuple[RatePolicy, ...],
+                 limiter: GCRALimiter | SharedGCRALimiter | None = None):
+        """
+        Initialize the middleware.
+
+        Args:
+            app (ASGIApp): The wrapped application.
+            policies (tuple[RatePolicy, ...]): The policies, most specific first.
+            limiter (GCRALimiter | SharedGCRALimiter | None): The rate limit state, the
+                configured one if None.
+        """
+        self.app = app
+        self.policies = policies
+        self.limiter = limiter if limiter is not None else get_rate_limiter()
+
+    def _get_key(self, scope: Scope, policy: RatePolicy, limit: RateLimit) -> str:
+        """
+        Build the key a request is counted by for a limit.
+
+        Args:
+            scope (Scope): The ASGI scope.
+            policy (RatePolicy): The matched policy.
+            limit (RateLimit): The limit.
+
+        Returns:
+            str: The key.
+        """
+        if limit.key == "route":
+            return f"route:{policy.path}"
+        if limit.key == "user":
+            subject = get_token_subject(scope)
+            if subject is not None:
+                return f"user:{policy.path}:{subject}"
+        return f"ip:{policy.path}:{get_client_ip(scope)}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Check the limits of an HTTP request before passing it on.
+
+        Args:
+            scope (Scope): The ASGI scope.
+            receive (Receive): The ASGI receive channel.
+            send (Send): The ASGI send channel.
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        policy = next((policy for policy in self.policies
+                       if policy.matches(scope["method"], scope["path"])), None)
+        if policy is not None:
+            hits = [(self._get_key(scope, policy, limit), limit) for limit in policy.limits]
+            # No limit is counted unless all of them allow the request
+            for (key, limit), result in zip(hits, self.limiter.hit_all(hits)):
+                if not result.allowed:
+                    log.warning("Rate limit of %s exceeded by %s", policy.path, key)
+                    await self._reject(send, limit, result)
+                    return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send: Send, limit: RateLimit, result: RateLimitResult) -> None:
+        """
+        Answer a request over a limit with 429 and the seconds to wait.
+
+        Args:
+            send (Send): The ASGI send channel.
+            limit (RateLimit): The exceeded limit.
+            result (RateLimitResult): The decision.
+        """
+        body = orjson.dumps({"detail": "Too many requests"})
+        await send({"type": "http.response.start", "status": 429, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(result.retry_after)).encode()),
+            (b"x-ratelimit-limit", str(limit.limit).encode()),
+            (b"x-ratelimit-remaining", b"0"),
+        ]})
+        await send({"type": "http.response.body", "body": body})
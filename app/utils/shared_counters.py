@@ -0,0 +1,242 @@
+""" Counters shared by the worker processes of a host through a memory-mapped file.
+
+The file holds a fixed number of slots split into stripes. A key hashes to one stripe
+and is looked up in a short run of slots from its home slot, so an update touches a
+single stripe, which is locked with an ``fcntl`` byte-range lock between processes and a
+``threading.Lock`` between the threads of a process. Every slot has an expiry, expired
+slots are reused and, when the run of a key is full, the slot expiring first is evicted.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+from core.logging_conf import Logging
+
+log = Logging(__name__).log()
+
+MAGIC = b"THCNT001"
+HEADER = struct.Struct("<8sQQ")
+HEADER_SIZE = 64
+# Key hash, value, auxiliary value and expiry (microseconds since the epoch)
+SLOT = struct.Struct("<Qqqq")
+EMPTY = 0
+# Locks cover bytes past the end of the file, so they never overlap the data
+LOCK_BASE = 1 << 40
+INIT_LOCK = LOCK_BASE - 1
+
+Update = Callable[[int, int], tuple[int, int, int]]
+UpdateMany = Callable[[list[tuple[int, int]]], list[tuple[int, int, int]]]
+
+
+def hash_key(key: str) -> int:
+    """
+    Hash a key identically in every process, unlike ``hash``.
+
+    Args:
+        key (str): The key.
+
+    Returns:
+        int: The non-zero 64 bit hash.
+    """
+    digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+    return digest or 1
+
+
+def now_us() -> int:
+    """
+    Current wall clock time shared by the processes.
+
+    Returns:
+        int: Microseconds since the epoch.
+    """
+    return time.time_ns() // 1000
+
+
+class SharedCounterTable:  # pylint: disable=too-many-instance-attributes
+    """
+    Fixed-slot hash table of counters in a file mapped by every process.
+
+    Attributes:
+        path (Path): The mapped file.
+        slots (int): The number of slots.
+        stripes (int): The number of independently locked stripes.
+        probe (int): The number of slots a key may occupy from its home slot.
+    """
+
+    def __init__(self, path: Path, slots: int = 65536, stripes: int = 64, probe: int = 16):
+        """
+        Open the table, creating the file if it does not exist.
+
+        Args:
+            path (Path): The file, e.g. in ``/dev/shm``.
+            slots (int): The number of slots, a multiple of ``stripes``.
+            stripes (int): The number of independently locked stripes.
+            probe (int): The number of slots a key may occupy from its home slot.
+
+        Raises:
+            ValueError: If the sizes are invalid or the file has another layout.
+        """
+        if slots % stripes or slots // stripes < probe:
+            raise ValueError("slots must be a multiple of stripes of at least probe slots")
+        self.path = Path(path)
+        self.slots = slots
+        self.stripes = stripes
+        self.probe = probe
+        self._stripe_slots = slots // stripes
+        self._thread_locks = [threading.Lock() for _ in range(stripes)]
+        size = HEADER_SIZE + slots * SLOT.size
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, INIT_LOCK)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, slots, stripes), 0)
+            magic, file_slots, file_stripes = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, INIT_LOCK)
+        if (magic, file_slots, file_stripes) != (MAGIC, slots, stripes):
+            os.close(self._fd)
+            raise ValueError(f"{self.path} holds a table with another layout")
+        self._map = mmap.mmap(self._fd, size)
+
+    def close(self) -> None:
+        """ Unmap the file, the counters stay in it for the other processes. """
+        self._map.close()
+        os.close(self._fd)
+
+    @contextmanager
+    def _locked(self, stripe: int) -> Iterator[None]:
+        """
+        Hold the lock of a stripe in this thread and process.
+
+        Args:
+            stripe (int): The index of the stripe.
+        """
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, LOCK_BASE + stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, LOCK_BASE + stripe)
+
+    def _find_slot(self, stripe: int, key_hash: int, now: int) -> tuple[int | None, int]:
+        """
+        Find the slot of a key within its run, or the slot to store it in.
+
+        Args:
+            stripe (int): The stripe of the key, locked by the caller.
+            key_hash (int): The hash of the key.
+            now (int): The current time in microseconds.
+
+        Returns:
+            tuple[int | None, int]: The byte offset of the slot of the key, None if it is
+                missing or expired, and the offset of the slot to store it in.
+        """
+        first = stripe * self._stripe_slots
+        home = (key_hash // self.stripes) % self._stripe_slots
+        free = evict = None
+        evict_at = None
+        for step in range(self.probe):
+            offset = HEADER_SIZE + (first + (home + step) % self._stripe_slots) * SLOT.size
+            slot_hash, _, _, expires_at = SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return (offset if expires_at > now else None), offset
+            if slot_hash == EMPTY or expires_at <= now:
+                if free is None:
+                    free = offset
+            elif evict_at is None or expires_at < evict_at:
+                evict, evict_at = offset, expires_at
+        return None, free if free is not None else evict
+
+    def update(self, key: str, function: Update, now: int | None = None) -> tuple[int, int]:
+        """
+        Atomically replace the value of a key across all processes.
+
+        Args:
+            key (str): The key.
+            function (Update): Called with the current value and auxiliary value (0, 0 for
+                a missing or expired key), returns the new value, auxiliary value and
+                expiry in microseconds since the epoch.
+            now (int | None): The current time in microseconds, the clock if None.
+
+        Returns:
+            tuple[int, int]: The new value and auxiliary value.
+        """
+        return self.update_many([key], lambda values: [function(*values[0])], now=now)[0]
+
+    def update_many(self, keys: Sequence[str], function: UpdateMany,
+                    now: int | None = None) -> list[tuple[int, int]]:
+        """
+        Atomically replace the values of several keys together across all processes.
+
+        The stripes of all keys are locked in order, so no other update sees some of the
+        new values without the others.
+
+        Args:
+            keys (Sequence[str]): The keys.
+            function (UpdateMany): Called with the current value and auxiliary value of
+                every key (0, 0 for a missing or expired key), returns the new value,
+                auxiliary value and expiry of every key. A key given twice gets the values
+                returned last for it.
+            now (int | None): The current time in microseconds, the clock if None.
+
+        Returns:
+            list[tuple[int, int]]: The new value and auxiliary value of every key.
+        """
+        now = now_us() if now is None else now
+        key_hashes = [hash_key(key) for key in keys]
+        with ExitStack() as stack:
+            for stripe in sorted({key_hash % self.stripes for key_hash in key_hashes}):
+                stack.enter_context(self._locked(stripe))
+            found = [self._find_slot(key_hash % self.stripes, key_hash, now)[0]
+                     for key_hash in key_hashes]
+            updated = function([SLOT.unpack_from(self._map, offset)[1:3]
+                                if offset is not None else (0, 0) for offset in found])
+            # The slots are found again one by one, so new keys do not claim the same one
+            for key_hash, (value, aux, expires_at) in zip(key_hashes, updated):
+                stripe = key_hash % self.stripes
+                offset, free = self._find_slot(stripe, key_hash, now)
+                if offset is None and expires_at <= now:
+                    # An expired value is a missing one, it needs no slot
+                    continue
+                if offset is None and SLOT.unpack_from(self._map, free)[3] > now:
+                    log.warning("Shared counter stripe %s is full, evicting a live counter",
+                                stripe)
+                SLOT.pack_into(self._map, free if offset is None else offset, key_hash, value,
+                               aux, expires_at)
+        return [(value, aux) for value, aux, _ in updated]
+
+    def incr(self, key: str, amount: int = 1, ttl: float = 60.0) -> int:
+        """
+        Add to a counter, e.g. the hits of a fixed window keyed by its start.
+
+        Args:
+            key (str): The key.
+            amount (int): The amount to add.
+            ttl (float): Seconds the counter is kept after this update.
+
+        Returns:
+            int: The new value.
+        """
+        expires_at = now_us() + int(ttl * 1_000_000)
+        return self.update(key, lambda value, aux: (value + amount, aux, expires_at))[0]
+
+    def get(self, key: str) -> int:
+        """
+        Read a counter without locking, the value may be a moment old.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            int: The value, 0 if the key is missing or expired.
+        """
+        key_hash = hash_key(key)
+        found, _ = self._find_slot(key_hash % self.stripes, key_hash, now_us())
+        return SLOT.unpack_from(self._map, found)[1] if found is not None else 0
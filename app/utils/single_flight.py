@@ -0,0 +1,86 @@
+""" Coalescing of identical concurrent lookups.
+
+While a lookup of a key runs, callers asking for the same key wait for its result
+instead of running it again, so a burst of requests for a popular page, e.g. right
+after its cache entry expired, costs one query. The lookup runs in its own task: a
+caller that gives up does not cancel it for the others.
+"""
+import asyncio
+import inspect
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    The running lookups of one kind, used from the event loop only.
+
+    Attributes:
+        name (str): The name of the lookups in the metrics.
+        calls (int): The lookups asked for.
+        executions (int): The lookups run, the others shared a running one.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize with no running lookup.
+
+        Args:
+            name (str): The name of the lookups in the metrics.
+        """
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self._flights: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a lookup, or wait for the running lookup of the same key.
+
+        Args:
+            key (Hashable): The key identifying identical lookups.
+            function (Callable[..., Any]): The lookup, a coroutine function or a blocking
+                function run in a thread.
+            *args (Any): The arguments of the lookup.
+
+        Returns:
+            Any: The result of the lookup, shared by all its callers.
+
+        Raises:
+            Exception: The exception of the lookup, raised to all its callers.
+        """
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self.executions += 1
+            flight = asyncio.ensure_future(function(*args) if inspect.iscoroutinefunction(function)
+                                           else asyncio.to_thread(function, *args))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: asyncio.Future) -> None:
+        """
+        Forget a finished lookup, later callers run it again.
+
+        Args:
+            key (Hashable): The key of the lookup.
+            flight (asyncio.Future): The finished lookup.
+        """
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Retrieve the exception, every caller may have given up waiting for it
+            flight.exception()
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Retrieve the lookup metrics.
+
+        Returns:
+            dict[str, int | float]: The calls, executions, collapsed calls, the share of
+                collapsed calls and the running lookups.
+        """
+        collapsed = self.calls - self.executions
+        return {"calls": self.calls, "executions": self.executions, "collapsed": collapsed,
+                "collapse_ratio": round(collapsed / self.calls, 4) if self.calls else 0.0,
+                "in_flight": len(self._flights)}
@@ -0,0 +1,137 @@
+""" Pool of persistent SMTP connections. """
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from core.logging_conf import Logging
+
+
+log = Logging(__name__).log()
+
+
+class SMTPConnectionPool:  # pylint: disable=too-many-instance-attributes
+    """
+    Thread safe pool of logged in SMTP connections.
+
+    Connections are reused across batches, so a burst of emails pays the TCP, TLS and
+    AUTH handshakes once per pooled connection instead of once per message.
+
+    Attributes:
+        host (str): The SMTP server host.
+        port (int): The SMTP server port.
+        size (int): The maximum number of open connections.
+        idle_timeout (int): Seconds after which an idle connection is closed.
+    """
+
+    def __init__(self, host: str, port: int, username: str | None = None,  # pylint: disable=too-many-arguments, too-many-positional-arguments
+                 password: str | None = None, starttls: bool = False, use_ssl: bool = False,
+                 size: int = 4, idle_timeout: int = 60):
+        """
+        Initialize the pool, connections are opened on demand.
+
+        Args:
+            host (str): The SMTP server host.
+            port (int): The SMTP server port.
+            username (str | None): The login user, no AUTH if None.
+            password (str | None): The login password.
+            starttls (bool): Upgrade plain connections with STARTTLS.
+            use_ssl (bool): Connect with implicit TLS.
+            size (int): The maximum number of open connections.
+            idle_timeout (int): Seconds after which an idle connection is closed.
+        """
+        self.host = host
+        self.port = port
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._username = username
+        self._password = password
+        self._starttls = starttls
+        self._use_ssl = use_ssl
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: list[tuple[smtplib.SMTP, float]] = []
+
+    def _connect(self) -> smtplib.SMTP:
+        """
+        Open and log in a new connection.
+
+        Returns:
+            smtplib.SMTP: The connection.
+        """
+        log.info("Opening SMTP connection to %s:%s", self.host, self.port)
+        if self._use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        smtp.ehlo()
+        if self._starttls and not self._use_ssl:
+            smtp.starttls()
+            smtp.ehlo()
+        if self._username:
+            smtp.login(self._username, self._password or "")
+        return smtp
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP) -> None:
+        """
+        Close a connection, ignoring errors of an already broken connection.
+
+        Args:
+            smtp (smtplib.SMTP): The connection.
+        """
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        """
+        Take the most recently used live connection or open a new one.
+
+        Returns:
+            smtplib.SMTP: The connection.
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, last_used = self._idle.pop()
+            if time.monotonic() - last_used > self.idle_timeout:
+                self._close(smtp)
+                continue
+            try:
+                # The server may have dropped the connection while it was idle
+                if smtp.noop()[0] == 250:
+                    return smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            smtp.close()
+        return self._connect()
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        """
+        Borrow a connection, waiting while all connections are in use.
+
+        A connection that raised is closed instead of being returned to the pool.
+
+        Yields:
+            smtplib.SMTP: The connection.
+        """
+        with self._slots:
+            smtp = self._checkout()
+            try:
+                yield smtp
+            except BaseException:
+                smtp.close()
+                raise
+            with self._lock:
+                self._idle.append((smtp, time.monotonic()))
+
+    def close(self) -> None:
+        """ Close all idle connections. """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            self._close(smtp)
@@ -0,0 +1,108 @@
+""" Background job queue persisted in the database.
+
+Tasks register under a name with ``@task`` and are enqueued with ``enqueue``; the
+``workers.worker`` entry point leases and runs them outside of the API processes.
+"""
+import random
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Any, Callable
+from uuid import UUID
+from core.config import JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS
+from core.logging_conf import Logging
+from db.crud.crud_job import create_job, update_job_progress
+from db.read_models import JobRow
+from utils.helpers import utc_now
+
+
+log = Logging(__name__).log()
+
+DEFAULT_QUEUE = "default"
+
+# Registered task functions keyed by task name
+TASKS: dict[str, Callable[..., Any]] = {}
+
+# The job executed by the current worker task, set by the worker around every run
+current_job: ContextVar[JobRow | None] = ContextVar("current_job", default=None)
+
+
+def task(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Register a function as a background task.
+
+    The function may be synchronous (run in a worker thread) or a coroutine function. It
+    receives the job payload as keyword arguments.
+
+    Args:
+        name (str): The unique task name used when enqueueing.
+
+    Returns:
+        Callable: The decorator registering the function.
+
+    Raises:
+        ValueError: If another function is already registered under the name.
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        if name in TASKS and TASKS[name] is not func:
+            raise ValueError(f"Task {name} is already registered")
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(task_name: str, payload: dict[str, Any] | None = None,  # pylint: disable=too-many-arguments, too-many-positional-arguments
+            queue: str = DEFAULT_QUEUE, priority: int = 0, delay_seconds: float = 0,
+            max_attempts: int = JOB_MAX_ATTEMPTS, job_id: UUID | None = None) -> UUID:
+    """
+    Persist a job so a worker runs it in the background.
+
+    Args:
+        task_name (str): The registered name of the task.
+        payload (dict[str, Any] | None): The keyword arguments of the task.
+        queue (str): The name of the queue.
+        priority (int): Jobs with a higher priority are leased first.
+        delay_seconds (float): Seconds to wait before the job may run.
+        max_attempts (int): The number of attempts before the job is marked failed.
+        job_id (UUID | None): The ID of the job, generated if None.
+
+    Returns:
+        UUID: The ID of the job.
+    """
+    run_at = utc_now() + timedelta(seconds=delay_seconds)
+    job_id = create_job(task_name=task_name, payload=payload or {}, queue=queue,
+                        priority=priority, max_attempts=max_attempts, run_at=run_at,
+                        job_id=job_id)
+    log.info("Enqueued job %s (%s) on queue %s", job_id, task_name, queue)
+    return job_id
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Compute the backoff before the next attempt of a failed job.
+
+    The delay doubles with every attempt up to ``JOB_RETRY_MAX_SECONDS``; half of it is
+    randomized so jobs failing together do not retry together.
+
+    Args:
+        attempts (int): The number of attempts made so far.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    delay = min(JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+    return random.uniform(delay / 2, delay)
+
+
+def report_progress(progress: int) -> None:
+    """
+    Store the progress of the job running in the current context.
+
+    Does nothing when called outside a worker, so task functions can also be called
+    directly.
+
+    Args:
+        progress (int): The progress in percent.
+    """
+    job = current_job.get()
+    if job is not None:
+        update_job_progress(job_id=job.id, progress=max(0, min(progress, 100)))
@@ -0,0 +1,2 @@
+""" Background tasks, importing the package registers every task with the job queue. """
+from . import analytics_tasks, email_tasks, export_tasks, reminder_tasks
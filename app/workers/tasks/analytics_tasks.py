@@ -0,0 +1,9 @@
+""" Analytics Tasks """
+from services.analytics_service import ANALYTICS_REBUILD_TASK_NAME, rebuild_analytics_rollups
+from workers.queue import task
+
+
+@task(ANALYTICS_REBUILD_TASK_NAME)
+def rebuild_rollups() -> None:
+    """ Recompute the analytics rollups from the raw tables. """
+    rebuild_analytics_rollups()
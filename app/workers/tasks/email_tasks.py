@@ -0,0 +1,16 @@
+""" Email Tasks """
+from services.email_service import EMAIL_TASK_NAME, deliver_email_batch
+from workers.queue import task
+
+
+@task(EMAIL_TASK_NAME)
+def send_email_batch(domain: str, messages: list[dict[str, str]], attempt: int = 1) -> None:
+    """
+    Deliver a batch of rendered emails to one recipient domain.
+
+    Args:
+        domain (str): The recipient domain of the batch.
+        messages (list[dict[str, str]]): The recipient, subject and body of every email.
+        attempt (int): The delivery attempt of the batch.
+    """
+    deliver_email_batch(domain=domain, messages=messages, attempt=attempt)
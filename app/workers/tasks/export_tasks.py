@@ -0,0 +1,20 @@
+""" Export Tasks """
+from uuid import UUID
+from services.export_service import EXPORT_TASK_NAME, run_organization_export
+from utils.exporters import ExportFormat
+from workers.queue import task
+
+
+@task(EXPORT_TASK_NAME)
+def export_organization_data(export_id: str, organization_id: str,
+                             export_format: ExportFormat) -> None:
+    """
+    Write the export files of an organization, resuming an interrupted run.
+
+    Args:
+        export_id (str): The ID of the export.
+        organization_id (str): The ID of the exported organization.
+        export_format (ExportFormat): "ndjson" or "csv".
+    """
+    run_organization_export(export_id=UUID(export_id), organization_id=UUID(organization_id),
+                            export_format=export_format)
@@ -0,0 +1,129 @@
+""" Reminder Tasks
+
+The reminder scheduler runs in every worker process. It periodically leases the reminders
+due within a short look-ahead window, keeps them in a heap ordered by due time and sleeps
+until the earliest one is due, so the reminders table is only read one window at a time.
+"""
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+from uuid import UUID
+from core.config import REMINDER_WINDOW_SECONDS, REMINDER_BATCH_SIZE, \
+    REMINDER_LEASE_GRACE_SECONDS
+from core.logging_conf import Logging
+from db.crud.crud_reminder import lease_due_reminders, fire_reminder, release_reminders
+from db.models import NotificationModel
+from services.email_service import queue_reminder_emails
+from services.notification_service import publish_notifications
+from utils.helpers import utc_now
+
+
+log = Logging(__name__).log()
+
+
+class ReminderScheduler:
+    """
+    Fires leased reminders from an in-memory heap.
+
+    Attributes:
+        worker_id (str): The ID recorded on leased reminders.
+        window (timedelta): How far ahead reminders are leased.
+        batch_size (int): The maximum number of reminders leased at once.
+    """
+
+    def __init__(self, worker_id: str, window_seconds: int = REMINDER_WINDOW_SECONDS,
+                 batch_size: int = REMINDER_BATCH_SIZE):
+        """
+        Initialize the scheduler.
+
+        Args:
+            worker_id (str): The ID recorded on leased reminders.
+            window_seconds (int): How far ahead reminders are leased.
+            batch_size (int): The maximum number of reminders leased at once.
+        """
+        self.worker_id = worker_id
+        self.window = timedelta(seconds=window_seconds)
+        self.batch_size = batch_size
+        self._heap: list[tuple] = []
+        self._stopping: asyncio.Event | None = None
+
+    def stop(self) -> None:
+        """ Stop the scheduler, unfired reminders are released to the other processes. """
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self) -> None:
+        """ Lease and fire reminders until ``stop`` is called. """
+        self._stopping = asyncio.Event()
+        next_load = utc_now()
+        try:
+            while not self._stopping.is_set():
+                now = utc_now()
+                if now >= next_load:
+                    next_load = await self._load(now)
+                await self._fire_due()
+                wake_at = min(self._heap[0][0], next_load) if self._heap else next_load
+                timeout = max((wake_at - utc_now()).total_seconds(), 0)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            released = await asyncio.to_thread(release_reminders, worker_id=self.worker_id)
+            log.info("Reminder scheduler %s stopped, released %s reminders",
+                     self.worker_id, released)
+
+    async def _load(self, now: datetime) -> datetime:
+        """
+        Lease the reminders due within the window into the heap.
+
+        Args:
+            now (datetime): The current time.
+
+        Returns:
+            datetime: When to load the next batch.
+        """
+        due_before = now + self.window
+        reminders = await asyncio.to_thread(
+            lease_due_reminders, worker_id=self.worker_id, due_before=due_before,
+            lease_expires_at=due_before + timedelta(seconds=REMINDER_LEASE_GRACE_SECONDS),
+            limit=self.batch_size)
+        for reminder in reminders:
+            heapq.heappush(self._heap, (reminder.due_at, reminder.id))
+        if reminders:
+            log.info("Reminder scheduler %s leased %s reminders", self.worker_id, len(reminders))
+        if len(reminders) == self.batch_size:
+            # More reminders are due in this window, load them once the heap drains
+            return reminders[-1].due_at
+        return now + self.window / 2
+
+    async def _fire_due(self) -> None:
+        """ Fire every reminder in the heap whose due time has passed, push and email them. """
+        now = utc_now()
+        notifications = []
+        while self._heap and self._heap[0][0] <= now:
+            _, reminder_id = heapq.heappop(self._heap)
+            notification = await self._fire(reminder_id)
+            if notification is not None:
+                notifications.append(notification)
+        if notifications:
+            await asyncio.to_thread(publish_notifications, notifications)
+            await asyncio.to_thread(queue_reminder_emails, notifications)
+
+    async def _fire(self, reminder_id: UUID) -> NotificationModel | None:
+        """
+        Fire a single reminder.
+
+        Args:
+            reminder_id (UUID): The ID of the reminder.
+
+        Returns:
+            NotificationModel | None: The notification, None if the lease was lost.
+        """
+        notification = await asyncio.to_thread(fire_reminder, reminder_id=reminder_id,
+                                               worker_id=self.worker_id)
+        if notification is None:
+            log.warning("Reminder %s lease lost, skipped", reminder_id)
+            return None
+        log.info("Reminder %s fired for user %s", reminder_id, notification.user_id)
+        return notification
@@ -0,0 +1,257 @@
+""" Background job worker.
+
+Usage:
+    PYTHONPATH=app python -m workers.worker [--processes 2] [--concurrency 4] [--queues default]
+        [--no-reminders]
+"""
+import argparse
+import asyncio
+import inspect
+import multiprocessing
+import os
+import signal
+import socket
+from datetime import timedelta
+from uuid import uuid4
+from core.config import JOB_WORKER_CONCURRENCY, JOB_POLL_INTERVAL_SECONDS, \
+    JOB_VISIBILITY_TIMEOUT_SECONDS
+from core.logging_conf import Logging
+from db.base import create_db_and_tables
+from db.crud.crud_job import lease_jobs, extend_job_lease, complete_job, retry_job, fail_job
+from db.read_models import JobRow
+from utils.helpers import utc_now
+from workers.queue import TASKS, DEFAULT_QUEUE, current_job, retry_delay
+from workers.tasks.reminder_tasks import ReminderScheduler
+import workers.tasks  # pylint: disable=unused-import  # registers all tasks
+
+
+log = Logging(__name__).log()
+
+
+class JobWorker:  # pylint: disable=too-many-instance-attributes
+    """
+    Runs leased jobs on an asyncio event loop.
+
+    Coroutine tasks run on the loop, synchronous tasks in threads; at most ``concurrency``
+    jobs run at once. Leases are extended while a job runs, so only jobs of a dead worker
+    become visible to other workers again.
+
+    Attributes:
+        queues (list[str]): The queues the worker consumes.
+        concurrency (int): The maximum number of jobs running at once.
+        poll_interval (float): Seconds to wait before polling an empty queue again.
+        visibility_timeout (int): Seconds before the lease of an unfinished job expires.
+        worker_id (str): The unique ID of the worker recorded on leased jobs.
+    """
+
+    def __init__(self, queues: list[str] | None = None,
+                 concurrency: int = JOB_WORKER_CONCURRENCY,
+                 poll_interval: float = JOB_POLL_INTERVAL_SECONDS,
+                 visibility_timeout: int = JOB_VISIBILITY_TIMEOUT_SECONDS):
+        """
+        Initialize the worker.
+
+        Args:
+            queues (list[str] | None): The queues to consume, the default queue if None.
+            concurrency (int): The maximum number of jobs running at once.
+            poll_interval (float): Seconds to wait before polling an empty queue again.
+            visibility_timeout (int): Seconds before the lease of an unfinished job expires.
+        """
+        self.queues = queues or [DEFAULT_QUEUE]
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._running: set[asyncio.Task] = set()
+        self._stopping = False
+        self._wakeup: asyncio.Event | None = None
+
+    def stop(self) -> None:
+        """ Stop leasing new jobs, running jobs are finished before ``run`` returns. """
+        log.info("Worker %s stopping", self.worker_id)
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        """ Lease and run jobs until ``stop`` is called. """
+        self._wakeup = asyncio.Event()
+        log.info("Worker %s consuming %s", self.worker_id, self.queues)
+        while not self._stopping:
+            free_slots = self.concurrency - len(self._running)
+            jobs = []
+            if free_slots > 0:
+                jobs = await asyncio.to_thread(lease_jobs, worker_id=self.worker_id,
+                                               queues=self.queues, limit=free_slots,
+                                               visibility_timeout=self.visibility_timeout)
+            for job in jobs:
+                job_task = asyncio.create_task(self._execute(job))
+                self._running.add(job_task)
+                job_task.add_done_callback(self._job_done)
+            # Sleep until a slot frees up, the poll interval passes or stop is called
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        log.info("Worker %s stopped", self.worker_id)
+
+    def _job_done(self, job_task: asyncio.Task) -> None:
+        """
+        Release the slot of a finished job and wake up the lease loop.
+
+        Args:
+            job_task (asyncio.Task): The finished job task.
+        """
+        self._running.discard(job_task)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _heartbeat(self, job: JobRow) -> None:
+        """
+        Extend the lease of a running job every half visibility timeout.
+
+        Args:
+            job (JobRow): The running job.
+        """
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 2)
+            if not await asyncio.to_thread(extend_job_lease, job_id=job.id,
+                                           worker_id=self.worker_id,
+                                           visibility_timeout=self.visibility_timeout):
+                log.warning("Worker %s lost the lease of job %s", self.worker_id, job.id)
+                return
+
+    async def _execute(self, job: JobRow) -> None:
+        """
+        Run a leased job and record its outcome.
+
+        Args:
+            job (JobRow): The leased job.
+        """
+        handler = TASKS.get(job.task_name)
+        if handler is None:
+            log.error("Job %s has unknown task %s", job.id, job.task_name)
+            await asyncio.to_thread(fail_job, job_id=job.id, worker_id=self.worker_id,
+                                    error=f"Unknown task {job.task_name}")
+            return
+
+        token = current_job.set(job)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            if inspect.iscoroutinefunction(handler):
+                await handler(**job.payload)
+            else:
+                await asyncio.to_thread(handler, **job.payload)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            await self._handle_failure(job, error)
+        else:
+            log.info("Job %s (%s) succeeded", job.id, job.task_name)
+            await asyncio.to_thread(complete_job, job_id=job.id, worker_id=self.worker_id)
+        finally:
+            heartbeat.cancel()
+            current_job.reset(token)
+
+    async def _handle_failure(self, job: JobRow, error: Exception) -> None:
+        """
+        Retry a failed job with backoff, or mark it failed after its last attempt.
+
+        Args:
+            job (JobRow): The failed job.
+            error (Exception): The error raised by the task.
+        """
+        message = f"{type(error).__name__}: {error}"
+        if job.attempts >= job.max_attempts:
+            log.error("Job %s (%s) failed after %s attempts: %s",
+                      job.id, job.task_name, job.attempts, message)
+            await asyncio.to_thread(fail_job, job_id=job.id, worker_id=self.worker_id,
+                                    error=message)
+            return
+        delay = retry_delay(job.attempts)
+        log.warning("Job %s (%s) attempt %s failed, retrying in %.1fs: %s",
+                    job.id, job.task_name, job.attempts, delay, message)
+        await asyncio.to_thread(retry_job, job_id=job.id, worker_id=self.worker_id,
+                                error=message, run_at=utc_now() + timedelta(seconds=delay))
+
+
+async def serve(queues: list[str], concurrency: int, reminders: bool) -> None:
+    """
+    Run the job worker and the reminder scheduler until SIGINT or SIGTERM.
+
+    Args:
+        queues (list[str]): The queues to consume.
+        concurrency (int): The maximum number of jobs running at once.
+        reminders (bool): Also run the reminder scheduler.
+    """
+    worker = JobWorker(queues=queues, concurrency=concurrency)
+    runners = [worker]
+    if reminders:
+        runners.append(ReminderScheduler(worker_id=worker.worker_id))
+
+    def stop():
+        for runner in runners:
+            runner.stop()
+
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop)
+        except (NotImplementedError, RuntimeError):
+            pass
+    await asyncio.gather(*(runner.run() for runner in runners))
+
+
+def run_worker(queues: list[str], concurrency: int, reminders: bool) -> None:
+    """
+    Run a single worker process.
+
+    Args:
+        queues (list[str]): The queues to consume.
+        concurrency (int): The maximum number of jobs running at once.
+        reminders (bool): Also run the reminder scheduler.
+    """
+    asyncio.run(serve(queues, concurrency, reminders))
+
+
+def main():
+    """ Command line entry point starting one or more worker processes. """
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Number of worker processes.")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY,
+                        help="Jobs running at once per process.")
+    parser.add_argument("--queues", default=DEFAULT_QUEUE,
+                        help="Comma separated queues to consume.")
+    parser.add_argument("--reminders", action=argparse.BooleanOptionalAction, default=True,
+                        help="Run the reminder scheduler in every worker process.")
+    args = parser.parse_args()
+    queues = [queue.strip() for queue in args.queues.split(",") if queue.strip()]
+
+    create_db_and_tables()
+    if args.processes <= 1:
+        run_worker(queues, args.concurrency, args.reminders)
+        return
+
+    processes = [multiprocessing.Process(target=run_worker,
+                                         args=(queues, args.concurrency, args.reminders),
+                                         name=f"job-worker-{index}")
+                 for index in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def forward_signal(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGINT, forward_signal)
+    signal.signal(signal.SIGTERM, forward_signal)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
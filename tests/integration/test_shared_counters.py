@@ -0,0 +1,78 @@
+""" Integration tests of the counters and rate limits shared between forked processes. """
+import multiprocessing
+
+import pytest
+
+from utils.rate_limiter import RateLimit, SharedGCRALimiter
+from utils.shared_counters import SharedCounterTable
+
+PROCESSES = 8
+KEYS = 4
+SLOTS = 1024
+STRIPES = 8
+# A request per hour does not refill during the test, only the burst is allowed
+BURST_LIMIT = RateLimit(limit=1, period=3600, burst=50)
+STRICT_LIMIT = RateLimit(limit=1, period=3600, burst=20)
+
+fork = multiprocessing.get_context("fork")
+
+
+def increment(path, worker, ops):
+    """ Increment the shared keys from one process. """
+    table = SharedCounterTable(path, slots=SLOTS, stripes=STRIPES)
+    for index in range(ops):
+        table.incr(f"key:{(worker + index) % KEYS}", ttl=600)
+    table.close()
+
+
+def hit(path, hits, attempts, allowed):
+    """ Hit shared rate limits from one process, counting the allowed requests. """
+    limiter = SharedGCRALimiter(SharedCounterTable(path, slots=SLOTS, stripes=STRIPES))
+    count = sum(all(result.allowed for result in limiter.hit_all(hits))
+                for _ in range(attempts))
+    with allowed.get_lock():
+        allowed.value += count
+    limiter.table.close()
+
+
+def run_all(target, arguments):
+    """ Run a function in one forked process per argument tuple, all at once. """
+    workers = [fork.Process(target=target, args=args) for args in arguments]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+
+@pytest.fixture(name="path")
+def fixture_path(tmp_path):
+    """ The file of a new shared table. """
+    return tmp_path / "counters"
+
+
+def test_no_increment_is_lost(path):
+    """ Concurrent increments from every process add up exactly. """
+    run_all(increment, [(path, worker, 2000) for worker in range(PROCESSES)])
+    table = SharedCounterTable(path, slots=SLOTS, stripes=STRIPES)
+    assert sum(table.get(f"key:{index}") for index in range(KEYS)) == PROCESSES * 2000
+    table.close()
+
+
+def test_burst_is_admitted_exactly_once(path):
+    """ A limit shared by all processes admits exactly its burst. """
+    allowed = fork.Value("i", 0)
+    run_all(hit, [(path, [("login", BURST_LIMIT)], 30, allowed)] * PROCESSES)
+    assert allowed.value == 50
+
+
+def test_rejected_requests_spend_no_tokens(path):
+    """ A request over one limit is not counted against the other limits. """
+    allowed = fork.Value("i", 0)
+    hits = [("ip", BURST_LIMIT), ("route", STRICT_LIMIT)]
+    run_all(hit, [(path, hits, 10, allowed)] * PROCESSES)
+    assert allowed.value == 20
+    limiter = SharedGCRALimiter(SharedCounterTable(path, slots=SLOTS, stripes=STRIPES))
+    # The burst limit counted only the 20 admitted requests, 30 are left
+    assert sum(limiter.hit("ip", BURST_LIMIT).allowed for _ in range(40)) == 30
+    limiter.table.close()
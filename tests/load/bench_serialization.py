@@ -0,0 +1,111 @@
+""" Benchmark of the response encoding for large list pages.
+
+Compares the default FastAPI path (response_model validation, dict serialization and
+json.dumps) with orjson and with the prebuilt serializers used by ModelJSONResponse.
+
+Usage:
+    PYTHONPATH=app python tests/load/bench_serialization.py [--rows 1000] [--repeat 50]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timezone
+from functools import partial
+
+import orjson
+from core.responses import ModelJSONResponse, get_type_adapter
+from schemas.organization import OrganizationMembersResponse, OrganizationMemberData
+from schemas.role import RoleShort, AllRoleResponse, RoleResponse, Permission
+from schemas.user import UserProfileShort
+from utils.helpers import generate_uuid7
+
+
+def build_members_page(rows: int) -> OrganizationMembersResponse:
+    """
+    Build an organization members page with the given number of rows.
+
+    Args:
+        rows (int): The number of members in the page.
+
+    Returns:
+        OrganizationMembersResponse: The members page.
+    """
+    role = RoleShort(id=generate_uuid7(), name="Member")
+    items = [
+        OrganizationMemberData(
+            user=UserProfileShort(id=generate_uuid7(), full_name=f"User {index}",
+                                  email=f"user{index}@example.com"),
+            role=role,
+            joined_at=datetime.now(timezone.utc))
+        for index in range(rows)
+    ]
+    return OrganizationMembersResponse(items=items, total=rows, page=1, size=rows, pages=1)
+
+
+def build_roles_page(rows: int) -> AllRoleResponse:
+    """
+    Build a roles page with the given number of roles, each with five permissions.
+
+    Args:
+        rows (int): The number of roles in the page.
+
+    Returns:
+        AllRoleResponse: The roles page.
+    """
+    permissions = [Permission(id=generate_uuid7(), name=f"perm:{index}", description="desc")
+                   for index in range(5)]
+    items = [
+        RoleResponse(id=generate_uuid7(), name=f"Role {index}", description=None,
+                     organization_id=generate_uuid7(), is_system_role=False,
+                     permissions=permissions)
+        for index in range(rows)
+    ]
+    return AllRoleResponse(items=items)
+
+
+def encode_default(page, response_type) -> bytes:
+    """ FastAPI with JSONResponse: re-validate, dump to JSON-able python and json.dumps. """
+    adapter = get_type_adapter(response_type)
+    value = adapter.validate_python(page)
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def encode_orjson(page, response_type) -> bytes:
+    """ FastAPI with ORJSONResponse: re-validate, dump to JSON-able python and orjson.dumps. """
+    adapter = get_type_adapter(response_type)
+    value = adapter.validate_python(page)
+    return orjson.dumps(adapter.dump_python(value, mode="json"))  # pylint: disable=no-member
+
+
+def encode_prebuilt(page, response_type) -> bytes:
+    """ ModelJSONResponse: the prebuilt serializer writes JSON bytes directly. """
+    return ModelJSONResponse(page, response_type).body
+
+
+def main():
+    """ Run the benchmark and print the time per page for each encoder. """
+    parser = argparse.ArgumentParser(description="Benchmark list response encoding.")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per page.")
+    parser.add_argument("--repeat", type=int, default=50, help="Encodings per measurement.")
+    args = parser.parse_args()
+
+    pages = {
+        "OrganizationMembersResponse": (build_members_page(args.rows),
+                                        OrganizationMembersResponse),
+        "AllRoleResponse": (build_roles_page(args.rows), AllRoleResponse),
+    }
+    encoders = {"default": encode_default, "orjson": encode_orjson, "prebuilt": encode_prebuilt}
+    for name, (page, response_type) in pages.items():
+        assert json.loads(encode_default(page, response_type)) == \
+               json.loads(encode_prebuilt(page, response_type))
+        print(f"{name} ({args.rows} rows)")
+        for encoder_name, encoder in encoders.items():
+            seconds = min(timeit.repeat(partial(encoder, page, response_type),
+                                        number=args.repeat, repeat=3)) / args.repeat
+            print(f"  {encoder_name:<10} {seconds * 1000:8.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
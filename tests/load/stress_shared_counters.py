@@ -0,0 +1,102 @@
+""" Stress test of the counters shared between processes.
+
+Many processes update the same memory-mapped table at once and the totals are checked
+afterwards: no increment may be lost, and a GCRA limit shared by all processes must
+allow exactly its burst however the processes interleave.
+
+Usage:
+    PYTHONPATH=app python tests/load/stress_shared_counters.py [--processes 16] [--ops 5000]
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from utils.rate_limiter import RateLimit, SharedGCRALimiter
+from utils.shared_counters import SharedCounterTable
+
+KEYS = 8
+
+
+def hammer_counters(path: Path, worker: int, ops: int) -> None:
+    """
+    Increment the shared keys from one process.
+
+    Args:
+        path (Path): The table file.
+        worker (int): The index of the process.
+        ops (int): The number of increments.
+    """
+    table = SharedCounterTable(path, slots=1024, stripes=8)
+    for index in range(ops):
+        table.incr(f"key:{(worker + index) % KEYS}", ttl=600)
+    table.close()
+
+
+def hammer_limit(path: Path, attempts: int, allowed) -> None:
+    """
+    Hit one shared rate limit from one process, counting the allowed requests.
+
+    Args:
+        path (Path): The table file.
+        attempts (int): The number of requests.
+        allowed (multiprocessing.Value): The total of allowed requests.
+    """
+    limiter = SharedGCRALimiter(SharedCounterTable(path, slots=1024, stripes=8))
+    # A period of an hour does not refill during the test, only the burst is allowed
+    limit = RateLimit(limit=3600, period=3600, burst=100)
+    count = sum(limiter.hit("login", limit).allowed for _ in range(attempts))
+    with allowed.get_lock():
+        allowed.value += count
+    limiter.table.close()
+
+
+def run(target, arguments: list[tuple]) -> float:
+    """
+    Run a function in one process per argument tuple, all at once.
+
+    Args:
+        target (Callable): The function.
+        arguments (list[tuple]): The arguments of every process.
+
+    Returns:
+        float: The seconds until all processes finished.
+    """
+    workers = [multiprocessing.Process(target=target, args=args) for args in arguments]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0, f"worker failed with {worker.exitcode}"
+    return time.perf_counter() - started
+
+
+def main():
+    """ Hammer the table from many processes and check the totals. """
+    parser = argparse.ArgumentParser(description="Stress the shared counter table.")
+    parser.add_argument("--processes", type=int, default=16, help="Concurrent processes.")
+    parser.add_argument("--ops", type=int, default=5000, help="Increments per process.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "counters"
+        seconds = run(hammer_counters, [(path, worker, args.ops)
+                                         for worker in range(args.processes)])
+        table = SharedCounterTable(path, slots=1024, stripes=8)
+        total = sum(table.get(f"key:{index}") for index in range(KEYS))
+        assert total == args.processes * args.ops, f"lost {args.processes * args.ops - total}"
+        print(f"counters: {total} increments from {args.processes} processes in "
+              f"{seconds:.2f} s ({total / seconds:,.0f}/s), none lost")
+
+        allowed = multiprocessing.Value("i", 0)
+        run(hammer_limit, [(path, 50, allowed)] * args.processes)
+        assert allowed.value == 100, f"{allowed.value} requests allowed, expected 100"
+        print(f"rate limit: {allowed.value} of {args.processes * 50} requests allowed "
+              "across the processes, the burst")
+        table.close()
+
+
+if __name__ == "__main__":
+    main()